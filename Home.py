@@ -1,11 +1,27 @@
 import streamlit as st
+from invoice_pipeline import model_status, start_model_warmup
+
+# Mulai memuat model OCR sejak halaman pertama dibuka (tidak memblokir UI)
+@st.cache_resource
+def load_ocr_model():
+    return start_model_warmup()
 
 st.set_page_config(page_title="Menu Utama", layout="wide")
 
+load_ocr_model()
+
 st.title("📊 Aplikasi OCR CV & INVOICE")
 
 st.markdown("____")
 container = st.container(border=True)
 container.write('''Selamat datang di aplikasi OCR CV & Invoice Analyzer – solusi cerdas untuk mengubah dokumen cetak menjadi data digital yang mudah diproses! 
                 Aplikasi ini dirancang untuk membantu perusahaan, tim HR, dan bagian keuangan dalam memproses dokumen seperti Curriculum Vitae (CV) dan Invoice (faktur) 
-                secara otomatis menggunakan teknologi Optical Character Recognition (OCR).''')
\ No newline at end of file
+                secara otomatis menggunakan teknologi Optical Character Recognition (OCR).''')
+
+status = model_status()
+if status["status"] == "ready":
+    st.caption("🟢 Model OCR siap")
+elif status["status"] == "error":
+    st.caption(f"🔴 Model OCR gagal dimuat: {status['error']}")
+else:
+    st.caption("🟡 Model OCR sedang dimuat...")
@@ -0,0 +1,395 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from archive_ingest import iter_zip_documents
+from cancellation import CancelToken, Cancelled, DeadlineExceeded
+from invoice_pipeline import model_status, process_invoice, start_model_warmup
+from page_render import count_pages, detect_kind
+from results_store import get_results_store
+import metrics
+from profiling import profile_run
+
+# HTTP API ekstraksi invoice untuk integrasi ERP.
+#
+#   POST /v1/jobs            body = PDF/JPEG/PNG/TIFF mentah -> 202 {"job_id": ...}
+#                            (?profile=1 merekam profil CPU/memori job ini)
+#                            Content-Type: application/zip -> satu job untuk semua
+#                            PDF/gambar di arsip (?name=nama.zip), result = {"documents": [...]}
+#                            (?reprocess=1 memproses ulang dokumen yang sudah pernah diproses;
+#                            berlaku juga untuk /v1/extract)
+#   GET  /v1/jobs/<job_id>   status + hasil structure_invoice_data/calculate_invoice_fields
+#   GET  /v1/jobs/<job_id>/profile   zip profil bila job dikirim dengan ?profile=1
+#   DELETE /v1/jobs/<job_id> batalkan job (antre atau berjalan) -> status "cancelled"
+#                            Dokumen yang melewati deadline -> status "timeout"
+#   POST /v1/extract         jalur sinkron, hanya untuk dokumen 1 halaman
+#   GET  /v1/invoices?invoice_no=&seller=&npwp=&date_from=&date_to=
+#   GET  /v1/invoices/<id>   hasil tersimpan dari results_store
+#   GET  /metrics            metrik format Prometheus
+#   GET  /healthz            status + kesiapan model OCR (loading/ready/error)
+#
+# Semua request berbagi satu pool PaddleOCR (OCR_POOL_SIZE) milik invoice_pipeline.
+
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8600"))
+API_WORKERS = int(os.getenv("API_WORKERS", "4"))
+API_MAX_UPLOAD_MB = int(os.getenv("API_MAX_UPLOAD_MB", "25"))
+API_JOB_TTL = int(os.getenv("API_JOB_TTL", "3600"))
+API_MAX_ARCHIVE_MB = int(os.getenv("API_MAX_ARCHIVE_MB", "1024"))
+# Arsip di atas ukuran ini ditampung di file sementara, bukan memori
+ARCHIVE_SPOOL_BYTES = 16 * 1024 * 1024
+SYNC_MAX_PAGES = 1
+
+executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="invoice-job")
+jobs = {}
+job_profiles = {}
+job_tokens = {}
+jobs_lock = threading.Lock()
+
+
+def _count_jobs(status):
+    with jobs_lock:
+        return sum(1 for job in jobs.values() if job["status"] == status)
+
+
+metrics.set_gauge("api_jobs", lambda: _count_jobs("queued"), status="queued")
+metrics.set_gauge("api_jobs", lambda: _count_jobs("running"), status="running")
+
+
+# --- Manajemen Job ---
+def _purge_expired_jobs():
+    now = time.time()
+    with jobs_lock:
+        expired = [
+            job_id for job_id, job in jobs.items()
+            if job["finished_at"] and now - job["finished_at"] > API_JOB_TTL
+        ]
+        for job_id in expired:
+            del jobs[job_id]
+            job_profiles.pop(job_id, None)
+            job_tokens.pop(job_id, None)
+
+
+def _start_job(job_id):
+    # False bila job sudah dibatalkan selagi antre
+    with jobs_lock:
+        if job_tokens[job_id].cancelled:
+            jobs[job_id].update(status="cancelled", error="Job dibatalkan.", finished_at=time.time())
+            return False
+        jobs[job_id]["status"] = "running"
+        return True
+
+
+def _finish_job(job_id, update, profiler):
+    update["finished_at"] = time.time()
+    with jobs_lock:
+        jobs[job_id].update(update)
+        if profiler:
+            job_profiles[job_id] = profiler.to_zip()
+
+
+def _run_job(job_id, doc_bytes, profile=False, reprocess=False):
+    if not _start_job(job_id):
+        return
+    with profile_run(profile) as profiler:
+        try:
+            result = process_invoice(doc_bytes, skip_duplicates=not reprocess, cancel_token=job_tokens[job_id])
+            update = {"status": "done", "result": _result_payload(result)}
+        except DeadlineExceeded as e:
+            update = {"status": "timeout", "error": str(e), "stage": e.stage}
+        except Cancelled as e:
+            update = {"status": "cancelled", "error": str(e)}
+        except Exception as e:
+            update = {"status": "error", "error": str(e)}
+    _finish_job(job_id, update, profiler)
+
+
+def _run_archive_job(job_id, archive_file, archive_name, profile=False, reprocess=False):
+    # Entri diproses berurutan langsung dari arsip, satu dokumen di memori sekaligus
+    if not _start_job(job_id):
+        archive_file.close()
+        return
+    token = job_tokens[job_id]
+    documents = []
+    with profile_run(profile) as profiler:
+        try:
+            for file_name, doc_bytes, skip_reason in iter_zip_documents(archive_file, archive_name=archive_name):
+                if skip_reason:
+                    documents.append({"file_name": file_name, "status": "skipped", "error": skip_reason})
+                else:
+                    try:
+                        result = process_invoice(
+                            doc_bytes, file_name=file_name, skip_duplicates=not reprocess, cancel_token=token
+                        )
+                        documents.append({"file_name": file_name, "status": "done", **_result_payload(result)})
+                    except DeadlineExceeded as e:
+                        # Dokumen yang macet dilaporkan, sisa arsip tetap diproses
+                        documents.append({"file_name": file_name, "status": "timeout", "error": str(e), "stage": e.stage})
+                    except Cancelled:
+                        raise
+                    except Exception as e:
+                        documents.append({"file_name": file_name, "status": "error", "error": str(e)})
+                    del doc_bytes
+                with jobs_lock:
+                    jobs[job_id]["processed"] = len(documents)
+            update = {"status": "done", "result": {"documents": documents}}
+        except Cancelled as e:
+            update = {"status": "cancelled", "error": str(e), "result": {"documents": documents}}
+        except Exception as e:
+            update = {"status": "error", "error": str(e)}
+        finally:
+            archive_file.close()
+    _finish_job(job_id, update, profiler)
+
+
+def cancel_job(job_id):
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job is None:
+            return None
+        if job["status"] in ("queued", "running"):
+            job_tokens[job_id].cancel("Job dibatalkan.")
+            job["cancel_requested"] = True
+        return dict(job)
+
+
+def submit_job(doc_bytes, profile=False, archive_name=None, reprocess=False):
+    # doc_bytes berupa bytes dokumen, atau file arsip ZIP bila archive_name di-set
+    _purge_expired_jobs()
+    job_id = uuid.uuid4().hex
+    with jobs_lock:
+        jobs[job_id] = {
+            "job_id": job_id,
+            "status": "queued",
+            "submitted_at": time.time(),
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "profile": profile,
+        }
+        job_tokens[job_id] = CancelToken()
+        if archive_name:
+            jobs[job_id]["processed"] = 0
+    if archive_name:
+        executor.submit(_run_archive_job, job_id, doc_bytes, archive_name, profile, reprocess)
+    else:
+        executor.submit(_run_job, job_id, doc_bytes, profile, reprocess)
+    return job_id
+
+
+def get_job(job_id):
+    with jobs_lock:
+        job = jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def _result_payload(result):
+    return {
+        "data": result["data"],
+        "calculation": result["calculation"],
+        "duplicate_of": result["duplicate_of"],
+        "limits": result["limits"],
+    }
+
+
+class _LimitedReader:
+    # rfile socket tidak punya EOF per request; baca tepat Content-Length byte
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        chunk = self.stream.read(size)
+        self.remaining -= len(chunk)
+        if not chunk:
+            self.remaining = 0
+        return chunk
+
+
+# --- HTTP Handler ---
+class InvoiceAPIHandler(BaseHTTPRequestHandler):
+    server_version = "InvoiceOCR/1.0"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_document_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length <= 0:
+            self._send_json(400, {"error": "Body kosong, kirim file PDF/JPEG/PNG/TIFF sebagai request body."})
+            return None
+        if length > API_MAX_UPLOAD_MB * 1024 * 1024:
+            self._send_json(413, {"error": f"File melebihi batas {API_MAX_UPLOAD_MB} MB."})
+            return None
+        doc_bytes = self.rfile.read(length)
+        if detect_kind(doc_bytes) is None:
+            self._send_json(415, {"error": "Body bukan file PDF, JPEG, PNG atau TIFF."})
+            return None
+        return doc_bytes
+
+    def _read_archive_body(self):
+        # Body ZIP disalin per chunk ke file sementara (spool), tidak pernah utuh di memori
+        length = int(self.headers.get("Content-Length", 0))
+        if length <= 0:
+            self._send_json(400, {"error": "Body kosong, kirim arsip ZIP sebagai request body."})
+            return None
+        if length > API_MAX_ARCHIVE_MB * 1024 * 1024:
+            self._send_json(413, {"error": f"Arsip melebihi batas {API_MAX_ARCHIVE_MB} MB."})
+            return None
+        archive_file = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_BYTES)
+        shutil.copyfileobj(_LimitedReader(self.rfile, length), archive_file)
+        archive_file.seek(0)
+        if archive_file.read(4) != b"PK\x03\x04":
+            archive_file.close()
+            self._send_json(415, {"error": "Body bukan arsip ZIP."})
+            return None
+        archive_file.seek(0)
+        return archive_file
+
+    def _search_invoices(self, query):
+        params = {key: values[0] for key, values in parse_qs(query).items()}
+        try:
+            limit = int(params.get("limit", 50))
+        except ValueError:
+            self._send_json(400, {"error": "Parameter limit harus angka."})
+            return
+        invoices = get_results_store().search(
+            invoice_no=params.get("invoice_no"),
+            seller=params.get("seller"),
+            npwp=params.get("npwp"),
+            date_from=params.get("date_from"),
+            date_to=params.get("date_to"),
+            limit=min(limit, 200),
+        )
+        self._send_json(200, {"count": len(invoices), "invoices": invoices})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/v1/invoices":
+            self._search_invoices(url.query)
+        elif url.path.startswith("/v1/invoices/"):
+            invoice_id = url.path[len("/v1/invoices/"):]
+            invoice = get_results_store().get(int(invoice_id)) if invoice_id.isdigit() else None
+            if invoice is None:
+                self._send_json(404, {"error": "Invoice tidak ditemukan."})
+            else:
+                self._send_json(200, invoice)
+        elif url.path == "/metrics":
+            body = metrics.registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif url.path == "/healthz":
+            self._send_json(200, {"status": "ok", "model": model_status()})
+        elif url.path.startswith("/v1/jobs/") and url.path.endswith("/profile"):
+            with jobs_lock:
+                profile_zip = job_profiles.get(url.path[len("/v1/jobs/"):-len("/profile")])
+            if profile_zip is None:
+                self._send_json(404, {"error": "Profil tidak ada (job belum selesai atau tanpa ?profile=1)."})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/zip")
+            self.send_header("Content-Length", str(len(profile_zip)))
+            self.end_headers()
+            self.wfile.write(profile_zip)
+        elif url.path.startswith("/v1/jobs/"):
+            job = get_job(url.path[len("/v1/jobs/"):])
+            if job is None:
+                self._send_json(404, {"error": "Job tidak ditemukan."})
+            else:
+                self._send_json(200, job)
+        else:
+            self._send_json(404, {"error": "Endpoint tidak ditemukan."})
+
+    def do_DELETE(self):
+        url = urlsplit(self.path)
+        if not url.path.startswith("/v1/jobs/"):
+            self._send_json(404, {"error": "Endpoint tidak ditemukan."})
+            return
+        job = cancel_job(url.path[len("/v1/jobs/"):])
+        if job is None:
+            self._send_json(404, {"error": "Job tidak ditemukan."})
+        else:
+            # Job berjalan berhenti di titik aman berikutnya (antar halaman / sebelum LLM)
+            self._send_json(202 if job["status"] in ("queued", "running") else 200, job)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path not in ("/v1/jobs", "/v1/extract"):
+            self._send_json(404, {"error": "Endpoint tidak ditemukan."})
+            return
+        profile = parse_qs(url.query).get("profile", ["0"])[0] in ("1", "true")
+        reprocess = parse_qs(url.query).get("reprocess", ["0"])[0] in ("1", "true")
+        if url.path == "/v1/jobs" and self.headers.get("Content-Type", "").startswith("application/zip"):
+            archive_file = self._read_archive_body()
+            if archive_file is None:
+                return
+            archive_name = parse_qs(url.query).get("name", ["archive.zip"])[0]
+            job_id = submit_job(archive_file, profile=profile, archive_name=archive_name, reprocess=reprocess)
+            self._send_json(202, {"job_id": job_id, "status": "queued"})
+            return
+
+        doc_bytes = self._read_document_body()
+        if doc_bytes is None:
+            return
+
+        if url.path == "/v1/jobs":
+            job_id = submit_job(doc_bytes, profile=profile, reprocess=reprocess)
+            self._send_json(202, {"job_id": job_id, "status": "queued"})
+            return
+
+        # Jalur cepat sinkron: dokumen multi-halaman diarahkan ke /v1/jobs
+        try:
+            pages = count_pages(doc_bytes)
+        except Exception as e:
+            self._send_json(422, {"error": f"Dokumen tidak bisa dibaca: {e}"})
+            return
+        if pages > SYNC_MAX_PAGES:
+            self._send_json(422, {"error": f"Dokumen {pages} halaman, gunakan POST /v1/jobs."})
+            return
+        try:
+            result = process_invoice(doc_bytes, skip_duplicates=not reprocess)
+        except DeadlineExceeded as e:
+            self._send_json(504, {"error": str(e), "stage": e.stage})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, _result_payload(result))
+
+    def log_message(self, format, *args):
+        print(f"[api] {self.address_string()} - {format % args}")
+
+
+def main():
+    # Model dimuat di background; request yang datang lebih dulu menunggu pool
+    start_model_warmup()
+    server = ThreadingHTTPServer((API_HOST, API_PORT), InvoiceAPIHandler)
+    print(f"Invoice API berjalan di http://{API_HOST}:{API_PORT}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import os
+import zipfile
+import posixpath
+from page_render import detect_kind
+import metrics
+
+# Ingest arsip ZIP dari supplier: entri dibaca satu per satu langsung dari
+# arsip (tanpa ekstrak ke disk dan tanpa memuat seluruh arsip), hanya entri
+# PDF/JPEG/PNG/TIFF yang diteruskan ke pipeline. Proteksi zip bomb:
+#   - ukuran entri (sesudah dekompresi) dibatasi ZIP_MAX_ENTRY_MB, dicek dari
+#     header dan sekali lagi saat membaca (header bisa berbohong)
+#   - total byte yang didekompresi per arsip dibatasi ZIP_MAX_TOTAL_MB
+#   - rasio kompresi di atas ZIP_MAX_RATIO dan jumlah entri di atas
+#     ZIP_MAX_ENTRIES ditolak
+# Memori ingest maksimal satu entri (<= ZIP_MAX_ENTRY_MB) berapa pun ukuran arsipnya.
+
+ZIP_MAX_ENTRY_MB = int(os.getenv("ZIP_MAX_ENTRY_MB", "25"))
+ZIP_MAX_TOTAL_MB = int(os.getenv("ZIP_MAX_TOTAL_MB", "1024"))
+ZIP_MAX_ENTRIES = int(os.getenv("ZIP_MAX_ENTRIES", "2000"))
+ZIP_MAX_RATIO = int(os.getenv("ZIP_MAX_RATIO", "200"))
+ZIP_READ_CHUNK = 1024 * 1024
+DOCUMENT_EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png", ".tif", ".tiff")
+
+
+class ArchiveLimitError(ValueError):
+    pass
+
+
+def is_zip(name, head=b""):
+    return name.lower().endswith(".zip") or head[:4] == b"PK\x03\x04"
+
+
+def _document_entries(archive):
+    infos = archive.infolist()
+    if len(infos) > ZIP_MAX_ENTRIES:
+        raise ArchiveLimitError(f"arsip berisi {len(infos)} entri (maks. {ZIP_MAX_ENTRIES})")
+    for info in infos:
+        name = info.filename
+        base = posixpath.basename(name)
+        # Folder, metadata macOS dan file tersembunyi bukan dokumen
+        if info.is_dir() or name.startswith("__MACOSX/") or base.startswith("."):
+            continue
+        if base.lower().endswith(DOCUMENT_EXTENSIONS):
+            yield info
+
+
+def count_zip_documents(fileobj):
+    with zipfile.ZipFile(fileobj) as archive:
+        return sum(1 for _ in _document_entries(archive))
+
+
+def _read_entry(archive, info, limit):
+    # Baca per chunk dan berhenti begitu lewat batas, apa pun yang diklaim header
+    chunks = []
+    size = 0
+    with archive.open(info) as entry:
+        while True:
+            chunk = entry.read(min(ZIP_READ_CHUNK, limit + 1 - size))
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > limit:
+                return None
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def iter_zip_documents(fileobj, archive_name="archive.zip"):
+    # Yield (nama, bytes, None) per dokumen atau (nama, None, alasan) bila dilewati
+    max_entry = ZIP_MAX_ENTRY_MB * 1024 * 1024
+    remaining = ZIP_MAX_TOTAL_MB * 1024 * 1024
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as e:
+        yield archive_name, None, f"ZIP tidak valid: {e}"
+        return
+    with archive:
+        try:
+            entries = list(_document_entries(archive))
+        except ArchiveLimitError as e:
+            yield archive_name, None, str(e)
+            return
+        for info in entries:
+            name = f"{archive_name}/{info.filename}"
+            if info.flag_bits & 0x1:
+                reason = "entri terenkripsi"
+            elif info.file_size > max_entry:
+                reason = f"entri {info.file_size / 1024 / 1024:.1f} MB (maks. {ZIP_MAX_ENTRY_MB} MB)"
+            elif info.compress_size and info.file_size / info.compress_size > ZIP_MAX_RATIO:
+                reason = f"rasio kompresi {info.file_size / info.compress_size:.0f}x (maks. {ZIP_MAX_RATIO}x)"
+            elif remaining <= 0:
+                reason = f"total isi arsip melebihi {ZIP_MAX_TOTAL_MB} MB"
+            else:
+                reason = None
+            if reason is None:
+                try:
+                    doc_bytes = _read_entry(archive, info, min(max_entry, remaining))
+                except (zipfile.BadZipFile, NotImplementedError, EOFError, OSError) as e:
+                    doc_bytes, reason = None, f"entri rusak: {e}"
+                else:
+                    if doc_bytes is None:
+                        # Header berbohong tentang ukuran: hentikan entri ini
+                        reason = f"isi entri melebihi batas ({ZIP_MAX_ENTRY_MB} MB per entri, {ZIP_MAX_TOTAL_MB} MB total)"
+                    else:
+                        remaining -= len(doc_bytes)
+                        if detect_kind(doc_bytes) is None:
+                            doc_bytes, reason = None, "bukan file PDF, JPEG, PNG atau TIFF"
+            if reason:
+                metrics.inc("archive_entries_skipped")
+                yield name, None, reason
+            else:
+                metrics.inc("archive_entries")
+                yield name, doc_bytes, None
+
+
+def iter_uploaded_documents(uploaded_files):
+    # File biasa diteruskan apa adanya, arsip ZIP dibuka per entri
+    for uploaded in uploaded_files:
+        if is_zip(uploaded.name):
+            yield from iter_zip_documents(uploaded, archive_name=uploaded.name)
+        else:
+            yield uploaded.name, uploaded.getvalue(), None
+
+
+def count_uploaded_documents(uploaded_files):
+    total = 0
+    for uploaded in uploaded_files:
+        if is_zip(uploaded.name):
+            try:
+                total += count_zip_documents(uploaded)
+            except (zipfile.BadZipFile, ArchiveLimitError):
+                total += 1
+            uploaded.seek(0)
+        else:
+            total += 1
+    return total
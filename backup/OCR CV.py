@@ -3,9 +3,12 @@ import pytesseract
 import json
 import pandas as pd
 from io import BytesIO
-from pdf2image import convert_from_bytes
+from pdf2image import convert_from_bytes, pdfinfo_from_bytes
 from openai import OpenAI
 import os
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from streamlit_pdf_viewer import pdf_viewer
 from streamlit import session_state as ss
 from dotenv import load_dotenv
@@ -19,16 +22,67 @@ if api_key:
 
 poppler_path = r"C:\Program Files\poppler-24.07.0\Library\bin"
 
+# OCR CV: halaman dirender per potongan ke folder sementara (hanya path, bukan
+# gambar di memori), lalu setiap potongan diproses satu proses tesseract
+# (data bahasa dimuat sekali per potongan). Potongan berjalan paralel.
+CV_OCR_WORKERS = int(os.getenv("CV_OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+CV_OCR_CHUNK_PAGES = int(os.getenv("CV_OCR_CHUNK_PAGES", "4"))
+CV_OCR_LANG = os.getenv("CV_OCR_LANG", "eng")
+CV_OCR_DPI = 200
+# Jumlah CV yang diproses bersamaan (OCR + strukturisasi LLM). OCR tetap dibatasi
+# CV_OCR_WORKERS proses tesseract untuk seluruh batch; sisanya menunggu LLM.
+CV_BATCH_WORKERS = int(os.getenv("CV_BATCH_WORKERS", "8"))
+
 # # Fungsi OCR untuk ekstraksi teks dari PDF (multi-halaman)
 # def extract_text_from_pdf(pdf_file):
 #     images = convert_from_bytes(pdf_file.read())
 #     extracted_text = "\n".join([pytesseract.image_to_string(img) for img in images])
 #     return extracted_text
 
-def extract_text_from_pdf(pdf_file):
-    images = convert_from_bytes(pdf_file.read())
-    text = "\n".join([pytesseract.image_to_string(img) for img in images])
-    return text
+def tesseract_pages(image_paths, workdir):
+    # Satu proses tesseract untuk daftar gambar; output per halaman dipisah form feed
+    list_path = os.path.join(workdir, "pages.txt")
+    with open(list_path, "w") as f:
+        f.write("\n".join(image_paths) + "\n")
+    # Paralelisme sudah di level proses, jadi OpenMP di dalam tesseract dimatikan
+    env = dict(os.environ, OMP_THREAD_LIMIT="1")
+    result = subprocess.run(
+        [pytesseract.pytesseract.tesseract_cmd, list_path, "stdout", "-l", CV_OCR_LANG],
+        capture_output=True, env=env
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Tesseract gagal: {result.stderr.decode('utf-8', 'ignore')}")
+    return result.stdout.decode("utf-8").split("\f")[:len(image_paths)]
+
+
+def ocr_page_range(pdf_bytes, first_page, last_page):
+    with tempfile.TemporaryDirectory() as workdir:
+        image_paths = convert_from_bytes(
+            pdf_bytes, dpi=CV_OCR_DPI, first_page=first_page, last_page=last_page,
+            output_folder=workdir, paths_only=True, grayscale=True
+        )
+        return tesseract_pages(sorted(image_paths), workdir)
+
+
+# Pool tesseract dibagi semua CV dan semua sesi, supaya batch besar tidak
+# menjalankan CV_BATCH_WORKERS x CV_OCR_WORKERS proses sekaligus
+@st.cache_resource
+def get_page_executor():
+    return ThreadPoolExecutor(max_workers=CV_OCR_WORKERS, thread_name_prefix="cv-ocr")
+
+
+@st.cache_resource
+def get_cv_executor():
+    return ThreadPoolExecutor(max_workers=CV_BATCH_WORKERS, thread_name_prefix="cv-batch")
+
+
+def extract_text_from_pdf(pdf_bytes):
+    page_count = pdfinfo_from_bytes(pdf_bytes)["Pages"]
+    # CV pendek tetap dibagi ke semua worker; dokumen panjang dibatasi CV_OCR_CHUNK_PAGES per potongan
+    chunk = max(1, min(CV_OCR_CHUNK_PAGES, -(-page_count // CV_OCR_WORKERS)))
+    ranges = [(first, min(first + chunk - 1, page_count)) for first in range(1, page_count + 1, chunk)]
+    chunks = get_page_executor().map(lambda page_range: ocr_page_range(pdf_bytes, *page_range), ranges)
+    return "\n".join(page_text for chunk_texts in chunks for page_text in chunk_texts)
 
 # # Fungsi untuk menyusun data CV dengan OpenAI
 # def structure_cv_data(extracted_text):
@@ -96,59 +150,102 @@ def structure_cv_data(extracted_text):
         return {"error": "Failed to properly structure the data."}
 
 
-# Fungsi untuk menyimpan hasil ke dalam Excel
-def save_to_excel(data):
-    df = pd.DataFrame([{k: v for k, v in data.items()}])
+def process_cv(pdf_bytes):
+    extracted_text = extract_text_from_pdf(pdf_bytes)
+    return structure_cv_data(extracted_text)
+
+
+# --- Tabel kandidat ---
+def _cell_text(value):
+    if isinstance(value, dict):
+        return ", ".join(f"{k}: {_cell_text(v)}" for k, v in value.items() if v not in (None, "", [], {}))
+    if isinstance(value, list):
+        return "; ".join(_cell_text(item) for item in value)
+    return "" if value is None else str(value)
+
+
+def candidate_row(file_name, data):
+    # Satu baris per kandidat: field bertingkat satu level (mis. Contact) jadi
+    # kolom "Contact Email", list (Education, Work Experience, ...) digabung jadi teks
+    row = {"File": file_name}
+    if "error" in data:
+        row["Error"] = data["error"]
+        return row
+    for key, value in data.items():
+        if isinstance(value, dict) and not any(isinstance(v, (dict, list)) for v in value.values()):
+            for sub_key, sub_value in value.items():
+                row[f"{key} {sub_key}"] = _cell_text(sub_value)
+        else:
+            row[key] = _cell_text(value)
+    return row
+
+
+def candidate_table(rows):
+    columns = []
+    for row in rows:
+        columns += [column for column in row if column not in columns]
+    # Kolom Error paling akhir supaya kolom data kandidat tetap berurutan
+    if "Error" in columns:
+        columns.remove("Error")
+        columns.append("Error")
+    return pd.DataFrame(rows, columns=columns)
+
+
+# Fungsi untuk menyimpan semua kandidat ke satu file Excel
+def save_candidates_to_excel(rows):
+    df = candidate_table(rows)
     excel_file = BytesIO()
     df.to_excel(excel_file, index=False)
     excel_file.seek(0)
     return excel_file
 
 # Declare variable.
-if 'pdf_ref' not in ss:
-    ss.pdf_ref = None
+if 'cv_results' not in ss:
+    ss.cv_results = []
 
 # Streamlit UI
 st.title("WiratekAI - Smart OCR")
-st.caption("Upload CV PDF file for information extraction.")
+st.caption("Upload CV PDF files for information extraction.")
 
-uploaded_file = st.file_uploader("Select PDF file", type=["pdf"])
+uploaded_files = st.file_uploader("Select PDF files", type=["pdf"], accept_multiple_files=True)
 
-if uploaded_file:
+if uploaded_files:
     if st.button("Run Modeling"):
+        progress = st.progress(0.0, text=f"Processing 0/{len(uploaded_files)} CVs...")
+        executor = get_cv_executor()
+        futures = {executor.submit(process_cv, uploaded.getvalue()): idx for idx, uploaded in enumerate(uploaded_files)}
+        results = [None] * len(uploaded_files)
+        for done, future in enumerate(as_completed(futures), start=1):
+            idx = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                # Satu CV rusak tidak menghentikan seluruh batch
+                data = {"error": str(e)}
+            results[idx] = {"file_name": uploaded_files[idx].name, "pdf": uploaded_files[idx].getvalue(), "data": data}
+            progress.progress(done / len(uploaded_files), text=f"Processing {done}/{len(uploaded_files)} CVs... ({uploaded_files[idx].name})")
+        progress.empty()
+        ss.cv_results = results
+
+if ss.cv_results:
+    rows = [candidate_row(result["file_name"], result["data"]) for result in ss.cv_results]
+    failed = sum(1 for row in rows if "Error" in row)
+    st.subheader(f"Candidates ({len(rows) - failed} extracted, {failed} failed)")
+    st.dataframe(candidate_table(rows), use_container_width=True, hide_index=True)
+
+    st.download_button(
+        label="Download Candidates Excel",
+        data=save_candidates_to_excel(rows),
+        file_name="cv_candidates.xlsx",
+        mime="application/vnd.ms-excel"
+    )
 
-        pdf_bytes = uploaded_file.getvalue()
-
-        # Simpan ke session_state agar bisa diakses ulang
-        ss.pdf_ref = pdf_bytes
-
-        # Tampilkan PDF Viewer
-        pdf_viewer(input=pdf_bytes, width=700)
-
-        # st.write("Mengekstrak teks dari CV...") #Nanti coba pake st.spiner
-        extracted_text = extract_text_from_pdf(uploaded_file)
-        
-        # st.write("Menyusun data CV...")
-        structured_cv_data = structure_cv_data(extracted_text)
-        
-        # Menampilkan hasil dalam JSON
-        st.subheader("OCR Extraction Result (JSON):")
-        st.json(structured_cv_data)
-        
-        # # Menampilkan hasil dalam tabel
-        # if isinstance(structured_cv_data, dict) and "error" not in structured_cv_data:
-        #     df_main = pd.DataFrame([structured_cv_data])
-        #     st.subheader("Hasil Ekstraksi dalam Tabel:")
-        #     st.table(df_main)
-        # else:
-        #     st.warning("Gagal menampilkan data dalam tabel.")
-        
-        # Simpan ke Excel
-        if structured_cv_data:
-            excel_file = save_to_excel(structured_cv_data)
-            st.download_button(
-                label="Download File Excel",
-                data=excel_file,
-                file_name="cv_data.xlsx",
-                mime="application/vnd.ms-excel"
-            )
+    # Detail satu CV: PDF + JSON hasil ekstraksi
+    selected = st.selectbox(
+        "Candidate detail",
+        range(len(ss.cv_results)),
+        format_func=lambda i: ss.cv_results[i]["file_name"]
+    )
+    pdf_viewer(input=ss.cv_results[selected]["pdf"], width=700)
+    st.subheader("OCR Extraction Result (JSON):")
+    st.json(ss.cv_results[selected]["data"])
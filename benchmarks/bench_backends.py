@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+# Benchmark backend inference OCR (paddle vs onnx) pada CPU ini: waktu muat
+# model, ms/halaman untuk deteksi dan rekognisi, dan halaman/detik. Halaman
+# adalah invoice sintetis yang dirender langsung ke gambar (tanpa poppler/LLM).
+#
+#   python benchmarks/bench_backends.py --pages 20 --onnx-threads 1,2,4
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from synth_invoice import page_images  # noqa: E402
+from invoice_pipeline import DET_MODEL_DIR, REC_MODEL_DIR  # noqa: E402
+import ocr_backends  # noqa: E402
+from ocr_engine import detect_boxes, crop_boxes, recognize_crops  # noqa: E402
+
+
+def bench_model(model, pages, repeat):
+    # Pemanasan satu halaman (alokasi graph/arena pertama tidak dihitung)
+    detect_boxes(model, pages[0][0])
+    det_seconds = rec_seconds = 0.0
+    lines = 0
+    for _ in range(repeat):
+        for image, _ in pages:
+            start = time.perf_counter()
+            boxes = detect_boxes(model, image)
+            det_seconds += time.perf_counter() - start
+            crops = crop_boxes(image, boxes)
+            start = time.perf_counter()
+            recognize_crops(model, crops)
+            rec_seconds += time.perf_counter() - start
+            lines += len(crops)
+    count = len(pages) * repeat
+    return {
+        "det_ms": 1000 * det_seconds / count,
+        "rec_ms": 1000 * rec_seconds / count,
+        "pages_per_sec": count / (det_seconds + rec_seconds),
+        "lines_per_page": lines / count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend inference OCR")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--dpi", type=int, default=100, help="setara skala OCR 0.5 pada render 200 DPI")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backends", default="paddle,onnx")
+    parser.add_argument("--onnx-threads", default="0", help="daftar intra-op threads ONNX Runtime (0 = otomatis)")
+    args = parser.parse_args()
+
+    pages = page_images(random.Random(args.seed), args.pages, dpi=args.dpi)
+    configs = []
+    for backend in args.backends.split(","):
+        if backend == "onnx":
+            configs += [(backend, int(threads)) for threads in args.onnx_threads.split(",")]
+        else:
+            configs.append((backend, None))
+
+    print(f"{args.pages} halaman x{args.repeat}, {args.dpi} DPI, {os.cpu_count()} CPU")
+    print(f"{'backend':<16} {'muat (s)':>9} {'det ms':>9} {'rec ms':>9} {'hal/s':>8} {'baris/hal':>10}")
+    for backend, threads in configs:
+        # Thread eksplisit dari --onnx-threads: hasil kalibrasi thread_tuning.py tidak dipakai
+        options = {} if threads is None else {"cpu_threads": threads}
+        start = time.perf_counter()
+        model = ocr_backends.create_model(DET_MODEL_DIR, REC_MODEL_DIR, backend=backend, **options)
+        load_seconds = time.perf_counter() - start
+        row = bench_model(model, pages, args.repeat)
+        name = backend if threads is None else f"{backend} t={threads or 'auto'}"
+        print(
+            f"{name:<16} {load_seconds:>9.2f} {row['det_ms']:>9.1f} {row['rec_ms']:>9.1f} "
+            f"{row['pages_per_sec']:>8.2f} {row['lines_per_page']:>10.1f}"
+        )
+        del model
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import difflib
+
+# Laporan akurasi vs kecepatan tier model (fp32 paddle/onnx vs int8 onnx) pada
+# halaman invoice sintetis berlabel. Akurasi dihitung per baris label dan khusus
+# baris field penting (nomor invoice, tanggal, NPWP, rekening, nominal).
+#
+#   python export_onnx.py && python quantize_models.py
+#   python benchmarks/bench_int8.py --pages 30
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from synth_invoice import page_images  # noqa: E402
+from invoice_pipeline import DET_MODEL_DIR, REC_MODEL_DIR  # noqa: E402
+from ocr_backends import create_model  # noqa: E402
+import ocr_engine  # noqa: E402
+
+CONFIGS = [("fp32", "paddle"), ("fp32", "onnx"), ("int8", "onnx")]
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "int8_report.json")
+FIELD_PATTERN = re.compile(r"^(Invoice No|Date|Due|PO|Account No):|^NPWP |^\d{1,3}(\.\d{3})+$")
+
+
+def normalize(text):
+    # Spasi sering hilang/bertambah di OCR; tidak dihitung sebagai salah
+    return re.sub(r"\s+", "", text)
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def score_page(labels, ocr_lines):
+    found = [normalize(text) for text in ocr_lines]
+    rows = []
+    for label in labels:
+        target = normalize(label)
+        hit = any(target in line for line in found)
+        best = max(found, key=lambda line: difflib.SequenceMatcher(None, target, line).ratio(), default="")
+        rows.append({
+            "field": bool(FIELD_PATTERN.search(label)),
+            "hit": hit,
+            "errors": 0 if hit else min(len(target), edit_distance(target, best)),
+            "chars": len(target),
+        })
+    return rows
+
+
+def run_config(tier, backend, pages):
+    start = time.perf_counter()
+    model = create_model(DET_MODEL_DIR, REC_MODEL_DIR, backend=backend, tier=tier)
+    load_seconds = time.perf_counter() - start
+    ocr_engine.run_ocr_batch(model, [pages[0][0]])
+    rows = []
+    seconds = 0.0
+    for image, labels in pages:
+        start = time.perf_counter()
+        result = ocr_engine.run_ocr_batch(model, [image])[0]
+        seconds += time.perf_counter() - start
+        rows.extend(score_page(labels, [line[1][0] for line in result[0] or []]))
+    fields = [row for row in rows if row["field"]]
+    return {
+        "tier": tier,
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "ms_per_page": round(1000 * seconds / len(pages), 1),
+        "line_accuracy": round(sum(row["hit"] for row in rows) / len(rows), 4),
+        "field_accuracy": round(sum(row["hit"] for row in fields) / len(fields), 4) if fields else None,
+        "cer": round(sum(row["errors"] for row in rows) / max(1, sum(row["chars"] for row in rows)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Akurasi vs kecepatan tier model OCR")
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--dpi", type=int, default=100, help="setara skala OCR 0.5 pada render 200 DPI")
+    parser.add_argument("--seed", type=int, default=1, help="beda dari seed kalibrasi quantize_models.py")
+    parser.add_argument("--max-field-drop", type=float, default=0.005, help="batas turunnya akurasi field")
+    parser.add_argument("--out", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    # Ukur model saja, tanpa cascade ke model berat
+    ocr_engine.OCR_CASCADE = False
+    pages = page_images(random.Random(args.seed), args.pages, dpi=args.dpi)
+    results = []
+    for tier, backend in CONFIGS:
+        try:
+            results.append(run_config(tier, backend, pages))
+        except (FileNotFoundError, RuntimeError) as e:
+            print(f"Lewati {tier}/{backend}: {e}")
+
+    print(f"{args.pages} halaman, {args.dpi} DPI, {os.cpu_count()} CPU")
+    print(f"{'tier':<6} {'backend':<8} {'ms/hal':>8} {'speedup':>8} {'baris':>8} {'field':>8} {'CER':>7}")
+    reference = next((r for r in results if r["tier"] == "fp32" and r["backend"] == "onnx"), results[0] if results else None)
+    for row in results:
+        row["speedup"] = round(reference["ms_per_page"] / row["ms_per_page"], 2)
+        field = f"{100 * row['field_accuracy']:.1f}%" if row["field_accuracy"] is not None else "-"
+        print(
+            f"{row['tier']:<6} {row['backend']:<8} {row['ms_per_page']:>8.1f} {row['speedup']:>7.2f}x "
+            f"{100 * row['line_accuracy']:>7.1f}% {field:>8} {100 * row['cer']:>6.2f}%"
+        )
+
+    int8 = next((r for r in results if r["tier"] == "int8"), None)
+    if int8 and reference and reference is not int8:
+        drop = (reference["field_accuracy"] or 0) - (int8["field_accuracy"] or 0)
+        verdict = "aman dipakai" if drop <= args.max_field_drop else "akurasi field turun, jangan dipakai"
+        print(f"int8 vs {reference['tier']}/{reference['backend']}: {int8['speedup']:.2f}x, "
+              f"akurasi field turun {100 * drop:.2f} poin -> {verdict}")
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump({"pages": args.pages, "dpi": args.dpi, "seed": args.seed, "results": results}, f, indent=2)
+    print(f"Laporan disimpan ke {args.out}")
+
+
+if __name__ == "__main__":
+    main()
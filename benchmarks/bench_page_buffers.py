@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import random
+import argparse
+import subprocess
+from io import BytesIO
+
+# Bandingkan jalur buffer halaman lama (pdftoppm -> PIL -> resize PIL ->
+# np.array) dengan jalur zero-copy page_render (PPM langsung ke numpy ->
+# resize ke buffer yang dipakai ulang) pada satu invoice multi-halaman.
+#
+#   python benchmarks/bench_page_buffers.py --pages 10 --variant scanned
+#
+# "Byte disalin" = jumlah ukuran buffer halaman penuh yang dialokasikan dan
+# diisi per halaman, termasuk bitmap halaman hasil render di kedua jalur (bitmap
+# PIL vs np.empty di render_region). Buffer baca pipe pdftoppm tidak dihitung.
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+from synth_invoice import generate_invoice  # noqa: E402
+from page_render import RENDER_DPI, OCR_SCALE, render_region, ResizeBuffer  # noqa: E402
+
+
+def legacy_page(pdf_bytes, page_no, dpi, scale):
+    proc = subprocess.run(
+        ["pdftoppm", "-r", str(dpi), "-f", str(page_no), "-l", str(page_no), "-"],
+        input=pdf_bytes, capture_output=True, timeout=300
+    )
+    image = Image.open(BytesIO(proc.stdout))
+    image.load()
+    w, h = image.size
+    resized = image.resize((int(w * scale), int(h * scale)))
+    array = np.array(resized)
+    # bitmap PIL halaman + hasil resize PIL + salinan numpy (stdout pipe tidak dihitung)
+    copied = w * h * 3 + resized.width * resized.height * 3 + array.nbytes
+    return array, copied
+
+
+def zero_copy_page(pdf_bytes, page_no, dpi, scale, buffer):
+    page = render_region(pdf_bytes, page_no, dpi)
+    allocated = buffer.nbytes
+    array = buffer.resize(page, scale)
+    # Array halaman dialokasikan per halaman; buffer resize hanya saat (re)alokasi,
+    # biasanya halaman pertama saja
+    copied = page.nbytes + (buffer.nbytes if buffer.nbytes != allocated else 0)
+    return array, copied
+
+
+def run(pdf_bytes, pages, dpi, scale, repeat):
+    rows = {}
+    for name in ("legacy", "zero_copy"):
+        times, copied = [], 0
+        for _ in range(repeat):
+            buffer = ResizeBuffer()
+            for page_no in range(1, pages + 1):
+                start = time.perf_counter()
+                if name == "legacy":
+                    _, nbytes = legacy_page(pdf_bytes, page_no, dpi, scale)
+                else:
+                    _, nbytes = zero_copy_page(pdf_bytes, page_no, dpi, scale, buffer)
+                times.append(time.perf_counter() - start)
+                copied += nbytes
+        rows[name] = {
+            "ms_per_page": 1000 * sum(times) / len(times),
+            "copied_mb_per_page": copied / (pages * repeat) / 1e6,
+            "total_s": sum(times),
+        }
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark buffer halaman render -> OCR")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--variant", choices=["scanned", "digital"], default="scanned")
+    parser.add_argument("--dpi", type=int, default=RENDER_DPI)
+    parser.add_argument("--scale", type=float, default=OCR_SCALE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pdf_bytes, _ = generate_invoice(random.Random(args.seed), args.variant, args.pages, args.pages * 12)
+    rows = run(pdf_bytes, args.pages, args.dpi, args.scale, args.repeat)
+
+    print(f"{args.variant} {args.pages} halaman @ {args.dpi} DPI, skala OCR {args.scale}")
+    print(f"{'jalur':<10} {'ms/halaman':>12} {'MB disalin/halaman':>20} {'total (s)':>10}")
+    for name, row in rows.items():
+        print(f"{name:<10} {row['ms_per_page']:>12.1f} {row['copied_mb_per_page']:>20.1f} {row['total_s']:>10.2f}")
+    saved = rows["legacy"]["total_s"] - rows["zero_copy"]["total_s"]
+    print(f"hemat {saved:.2f} s ({100 * saved / rows['legacy']['total_s']:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
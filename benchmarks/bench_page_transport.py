@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import Future
+
+# Overhead transport halaman client -> ocr_server.py tanpa model: server echo
+# (proses terpisah) langsung menjawab, jadi waktu yang terukur hanya
+# pengiriman halaman lewat socket vs deskriptor shared memory.
+#
+#   python benchmarks/bench_page_transport.py --pages 200 --width 1654 --height 2339
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import numpy as np  # noqa: E402
+import ocr_server  # noqa: E402
+
+
+class EchoBatcher:
+    def submit(self, image_np, det_scale=1.0):
+        future = Future()
+        # Sentuh piksel supaya halaman benar-benar dibaca penerima
+        future.set_result([[[[[0, 0], [1, 0], [1, 1], [0, 1]], (str(int(image_np[::64, ::64].sum())), 1.0)]]])
+        return future
+
+
+def serve_echo(socket_path):
+    server = ocr_server.OCRServer(socket_path, ocr_server.OCRRequestHandler)
+    server.batcher = EchoBatcher()
+    server.serve_forever()
+
+
+def run(socket_path, transport, pages, shape):
+    client = ocr_server.OCRServerClient(socket_path, transport=transport)
+    page = np.random.default_rng(0).integers(0, 255, size=shape, dtype=np.uint8)
+    client.ocr(page)
+    start = time.perf_counter()
+    for _ in range(pages):
+        client.ocr(page)
+    elapsed = time.perf_counter() - start
+    client.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transport halaman ke OCR server")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--width", type=int, default=1654, help="default A4 200 DPI")
+    parser.add_argument("--height", type=int, default=2339)
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve_echo(args.serve)
+        return
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "bench_ocr.sock")
+    server = subprocess.Popen([sys.executable, __file__, "--serve", socket_path])
+    try:
+        while not os.path.exists(socket_path):
+            time.sleep(0.05)
+        shape = (args.height, args.width, 3)
+        mb = np.prod(shape) / 1e6
+        print(f"{args.pages} halaman {args.width}x{args.height} ({mb:.1f} MB/halaman)")
+        print(f"{'transport':<10} {'ms/halaman':>12} {'halaman/s':>12} {'MB/s':>10}")
+        for transport in ("socket", "shm"):
+            elapsed = run(socket_path, transport, args.pages, shape)
+            rate = args.pages / elapsed
+            print(f"{transport:<10} {1000 / rate:>12.2f} {rate:>12.1f} {rate * mb:>10.0f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
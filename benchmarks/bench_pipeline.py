@@ -0,0 +1,243 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import resource
+from io import BytesIO
+
+# Benchmark reprodusibel untuk jalur extract_text_with_paddleocr ->
+# structure_invoice_data -> save_to_excel, memakai korpus sintetis (seed tetap)
+# dan server OpenAI tiruan dengan latensi yang bisa diatur.
+#
+#   python benchmarks/bench_pipeline.py --suite default --save-baseline
+#   python benchmarks/bench_pipeline.py --suite default          # bandingkan dengan baseline
+#
+# Hasil: pages/sec, latensi per tahap (p50/p95 dari metrics.py) dan peak RSS.
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from synth_invoice import generate_corpus  # noqa: E402
+from fake_openai_server import start_fake_openai_server  # noqa: E402
+
+SUITES = {
+    "quick": [("scanned", 1, 8), ("digital", 1, 8)],
+    "default": [
+        ("scanned", 1, 5), ("scanned", 1, 25), ("scanned", 5, 40), ("scanned", 20, 120),
+        ("digital", 1, 5), ("digital", 5, 40),
+    ],
+    "large": [("scanned", 50, 300), ("digital", 50, 300), ("scanned", 10, 60)],
+}
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines", "pipeline.json")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "pipeline_latest.json")
+
+
+# --- Pengukuran Memori ---
+def current_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RSSSampler:
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_mb = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- Benchmark ---
+def run_benchmark(suite, llm_latency, seed, repeat, profile_path=None):
+    work_dir = tempfile.mkdtemp(prefix="invoice-bench-")
+    corpus_dir = os.path.join(work_dir, "corpus")
+    paths = generate_corpus(corpus_dir, SUITES[suite], seed=seed)
+
+    _, base_url = start_fake_openai_server(latency=llm_latency, labels_dir=corpus_dir)
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["RESULTS_DB_PATH"] = os.path.join(work_dir, "results.sqlite")
+
+    import metrics
+    import invoice_pipeline
+    from profiling import profile_run
+    from invoice_pipeline import (
+        count_pages,
+        extract_text_with_paddleocr,
+        structure_invoice_data,
+        calculate_invoice_fields,
+        save_to_excel,
+    )
+
+    rss_before_model = current_rss_mb()
+    load_start = time.perf_counter()
+    invoice_pipeline.get_ocr_pool()
+    model_load_seconds = time.perf_counter() - load_start
+
+    # Pemanasan: satu dokumen tidak dihitung
+    with open(paths[0], "rb") as f:
+        extract_text_with_paddleocr(BytesIO(f.read()))
+    metrics.registry = metrics.MetricsRegistry()
+
+    documents = []
+    total_pages = 0
+    with RSSSampler() as sampler, profile_run(bool(profile_path)) as profiler:
+        wall_start = time.perf_counter()
+        for _ in range(repeat):
+            for path in paths:
+                with open(path, "rb") as f:
+                    pdf_bytes = f.read()
+                pages = count_pages(pdf_bytes)
+                start = time.perf_counter()
+                extracted_text = extract_text_with_paddleocr(BytesIO(pdf_bytes))
+                structured_data = structure_invoice_data(extracted_text)
+                calculated_fields = calculate_invoice_fields(structured_data)
+                save_to_excel(structured_data, calculated_fields)
+                documents.append({
+                    "file": os.path.basename(path),
+                    "pages": pages,
+                    "seconds": round(time.perf_counter() - start, 4),
+                })
+                total_pages += pages
+        wall = time.perf_counter() - wall_start
+
+    if profiler:
+        with open(profile_path, "wb") as f:
+            f.write(profiler.to_zip())
+
+    stages = {
+        stage: {key: round(value, 5) for key, value in summary.items()}
+        for stage, summary in metrics.registry.stage_summary().items()
+    }
+    cascade_lines = metrics.registry.counter("ocr_cascade_lines")
+    cascade_escalated = metrics.registry.counter("ocr_cascade_escalated")
+    return {
+        "suite": suite,
+        "seed": seed,
+        "repeat": repeat,
+        "llm_latency": llm_latency,
+        "git_revision": git_revision(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "summary": {
+            "documents": len(documents),
+            "pages": total_pages,
+            "wall_seconds": round(wall, 3),
+            "pages_per_sec": round(total_pages / wall, 4) if wall else 0,
+            "model_load_seconds": round(model_load_seconds, 3),
+            "rss_before_model_mb": round(rss_before_model, 1),
+            "peak_rss_mb": round(sampler.peak_mb, 1),
+            # Porsi baris yang selesai di model ringan (cascade rekognisi)
+            "cascade_light_rate": round(1 - cascade_escalated / cascade_lines, 4) if cascade_lines else None,
+        },
+        "stages": stages,
+        "documents": documents,
+    }
+
+
+# --- Perbandingan dengan Baseline ---
+def compare(result, baseline, tolerance):
+    # Kembalikan daftar (metrik, baseline, sekarang, perubahan, regresi?)
+    rows = []
+
+    def add(name, old, new, higher_is_better):
+        if old in (None, 0) or new is None:
+            return
+        change = (new - old) / old
+        regression = change < -tolerance if higher_is_better else change > tolerance
+        rows.append((name, old, new, change, regression))
+
+    add("pages_per_sec", baseline["summary"]["pages_per_sec"], result["summary"]["pages_per_sec"], True)
+    add("peak_rss_mb", baseline["summary"]["peak_rss_mb"], result["summary"]["peak_rss_mb"], False)
+    for stage, summary in baseline["stages"].items():
+        current = result["stages"].get(stage)
+        if current is None:
+            continue
+        add(f"{stage}.p50", summary["p50"], current["p50"], False)
+        add(f"{stage}.p95", summary["p95"], current["p95"], False)
+    return rows
+
+
+def print_comparison(rows):
+    print(f"{'metrik':<28}{'baseline':>12}{'sekarang':>12}{'ubah':>9}")
+    for name, old, new, change, regression in rows:
+        flag = "  REGRESI" if regression else ""
+        print(f"{name:<28}{old:>12.4f}{new:>12.4f}{change:>+8.1%}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline OCR invoice")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="default")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--out", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="simpan hasil sebagai baseline baru")
+    parser.add_argument("--profile", help="rekam profil CPU/memori ke file .zip (hasil waktu jadi tidak valid)")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="batas regresi relatif (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.suite, args.llm_latency, args.seed, args.repeat, args.profile)
+    print(json.dumps(result["summary"], indent=2))
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Baseline disimpan ke {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"Belum ada baseline di {args.baseline}; jalankan dengan --save-baseline.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("suite") != args.suite:
+        print(f"Baseline untuk suite {baseline.get('suite')}, bukan {args.suite}; tidak dibandingkan.")
+        return
+    rows = compare(result, baseline, args.tolerance)
+    print_comparison(rows)
+    sys.exit(1 if any(row[4] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import platform
+import subprocess
+import urllib.request
+
+# Benchmark cold start: waktu import modul halaman, waktu sampai model OCR siap
+# (muat + warm-up di background) dan latensi OCR pertama vs kedua, masing-masing
+# diukur di proses Python baru. Opsional: waktu sampai server Streamlit sehat.
+#
+#   python benchmarks/bench_startup.py --save-baseline
+#   python benchmarks/bench_startup.py --streamlit       # bandingkan dengan baseline
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from bench_pipeline import git_revision, print_comparison  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baselines", "startup.json")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "startup_latest.json")
+HEAVY_MODULES = ["paddleocr", "paddle", "onnxruntime", "openai", "pandas", "openpyxl"]
+
+
+# --- Pengukuran di Proses Baru ---
+def child_import():
+    start = time.perf_counter()
+    import invoice_pipeline  # noqa: F401
+    import results_store  # noqa: F401
+    import profiling  # noqa: F401
+    return {
+        "import_seconds": time.perf_counter() - start,
+        "heavy_modules_loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+
+
+def child_first_request(warmup):
+    from synth_invoice import page_images
+
+    start = time.perf_counter()
+    import invoice_pipeline
+    result = {"import_seconds": time.perf_counter() - start}
+    page, _ = page_images(random.Random(0), 1)[0]
+    if warmup:
+        invoice_pipeline.start_model_warmup()
+        while invoice_pipeline.model_status()["status"] == "loading":
+            time.sleep(0.01)
+        status = invoice_pipeline.model_status()
+        if status["status"] != "ready":
+            raise RuntimeError(status["error"])
+        result["ready_seconds"] = time.perf_counter() - start
+        result["load_seconds"] = status["load_seconds"]
+        result["warmup_seconds"] = status["warmup_seconds"]
+    for name in ("first_ocr_seconds", "second_ocr_seconds"):
+        request_start = time.perf_counter()
+        invoice_pipeline.get_ocr_pool().ocr(page)
+        result[name] = time.perf_counter() - request_start
+    return result
+
+
+def run_child(mode):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT_DIR, BENCH_DIR]))
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, timeout=600
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"child {mode} gagal:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# --- Streamlit ---
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_streamlit(timeout=120):
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", "Home.py", "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return {"streamlit_health_seconds": time.perf_counter() - start}
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError("Streamlit tidak sehat dalam batas waktu")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def run_benchmark(repeat, streamlit):
+    # Waktu: nilai terbaik dari N run (noise sistem hanya menambah waktu)
+    timings, info = {}, {}
+    for _ in range(repeat):
+        results = {mode: run_child(mode) for mode in ("import", "warm", "cold")}
+        if streamlit:
+            results["server"] = measure_streamlit()
+        for mode, result in results.items():
+            for key, value in result.items():
+                if isinstance(value, float):
+                    timings.setdefault(f"{mode}.{key}", []).append(value)
+                else:
+                    info[f"{mode}.{key}"] = value
+    summary = {key: round(min(values), 4) for key, values in timings.items()}
+    summary.update(info)
+    return {
+        "suite": "startup",
+        "repeat": repeat,
+        "git_revision": git_revision(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpu_count": os.cpu_count()},
+        "summary": summary,
+    }
+
+
+def compare_startup(result, baseline, tolerance):
+    rows = []
+    for key, old in baseline["summary"].items():
+        new = result["summary"].get(key)
+        if isinstance(old, float) and isinstance(new, float) and old:
+            change = (new - old) / old
+            rows.append((key, old, new, change, change > tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold start aplikasi OCR invoice")
+    parser.add_argument("--repeat", type=int, default=3, help="nilai terbaik dari N run")
+    parser.add_argument("--streamlit", action="store_true", help="ukur juga waktu sampai Streamlit sehat")
+    parser.add_argument("--out", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="batas regresi relatif (0.20 = 20%%)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = child_import() if args.child == "import" else child_first_request(warmup=args.child == "warm")
+        print(json.dumps(result))
+        return
+
+    result = run_benchmark(args.repeat, args.streamlit)
+    print(json.dumps(result["summary"], indent=2))
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Baseline disimpan ke {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"Belum ada baseline di {args.baseline}; jalankan dengan --save-baseline.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare_startup(result, baseline, args.tolerance)
+    print_comparison(rows)
+    sys.exit(1 if any(row[4] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import os
+import re
+import json
+import glob
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Server tiruan OpenAI (POST /v1/chat/completions) untuk benchmark dan load
+# test, dengan latensi yang bisa diatur. Bila --labels diisi (folder .json dari
+# synth_invoice.py), jawaban diambil dari label yang nomor invoice-nya muncul di
+# prompt; selain itu dikembalikan JSON invoice generik.
+#
+#   python benchmarks/fake_openai_server.py --port 8700 --latency 2.0
+#   OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8700/v1 streamlit run Home.py
+
+INVOICE_NO_PATTERN = re.compile(r"INV-\d{4}-\d{4}")
+
+GENERIC_INVOICE = {
+    "seller_identity": {"company_name": "PT Fake Seller", "address": "Jakarta", "email_address": None,
+                        "phone": None, "company_npwp_tin": None},
+    "buyer_identity": {"company_name": "PT Fake Buyer", "address": "Bandung", "email_address": None,
+                       "phone": None, "company_npwp_tin": None, "attention": None},
+    "invoice_details": {"invoice_no": None, "invoice_date": "2025-01-01", "order_po_number": None,
+                        "term_of_payment_due_date": None},
+    "item_details": [],
+    "subtotal_invoice": 0,
+    "discount": None,
+    "vat": None,
+    "invoice_total": 0,
+    "bank_details": {"account_no": None, "account_name": None, "beneficiary_bank": None, "branch": None,
+                     "swift_code": None},
+    "currency": "IDR",
+}
+
+
+def load_labels(labels_dir):
+    labels = {}
+    for path in glob.glob(os.path.join(labels_dir, "*.json")):
+        with open(path) as f:
+            data = json.load(f)
+        labels[data["invoice_details"]["invoice_no"]] = data
+    return labels
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        prompt = "\n".join(message["content"] for message in request.get("messages", []))
+
+        config = self.server.config
+        delay = config["latency"] + random.uniform(0, config["jitter"])
+        if random.random() < config["error_rate"]:
+            time.sleep(delay)
+            self.send_error(500, "fake error")
+            return
+
+        found = INVOICE_NO_PATTERN.search(prompt)
+        data = config["labels"].get(found.group(0)) if found else None
+        if data is None:
+            data = dict(GENERIC_INVOICE, invoice_details=dict(
+                GENERIC_INVOICE["invoice_details"], invoice_no=found.group(0) if found else "INV-0000-0000"))
+        content = json.dumps(data)
+        time.sleep(delay)
+
+        body = json.dumps({
+            "id": f"chatcmpl-fake-{random.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4,
+            },
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_openai_server(port=0, latency=1.0, jitter=0.0, error_rate=0.0, labels_dir=None, host="127.0.0.1"):
+    # Jalankan di thread background; kembalikan (server, base_url untuk OPENAI_BASE_URL)
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.config = {
+        "latency": latency,
+        "jitter": jitter,
+        "error_rate": error_rate,
+        "labels": load_labels(labels_dir) if labels_dir else {},
+    }
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server tiruan OpenAI chat completions")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--latency", type=float, default=1.0, help="detik per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="tambahan acak 0..jitter detik")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--labels", help="folder label .json dari synth_invoice.py")
+    args = parser.parse_args()
+    server, base_url = start_fake_openai_server(args.port, args.latency, args.jitter, args.error_rate, args.labels)
+    print(f"Fake OpenAI server: OPENAI_BASE_URL={base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
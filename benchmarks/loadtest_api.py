@@ -0,0 +1,119 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+# Load test lokal untuk api_server.py.
+#
+#   python api_server.py &
+#   python benchmarks/loadtest_api.py sample.pdf --concurrency 8 --requests 40
+#
+# Mode "jobs" mengirim ke POST /v1/jobs lalu polling sampai selesai,
+# mode "sync" memakai POST /v1/extract (PDF harus 1 halaman).
+# Semua request dikirim dengan ?reprocess=1: PDF yang sama dikirim berulang,
+# tanpa itu indeks dedup menjawab dari cache dan OCR tidak pernah diukur.
+
+
+def _request(url, data=None, method="GET"):
+    req = urllib.request.Request(url, data=data, method=method)
+    if data is not None:
+        req.add_header("Content-Type", "application/pdf")
+    try:
+        with urllib.request.urlopen(req, timeout=600) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}")
+
+
+# Status akhir job di api_server.py; selain "done" dihitung gagal
+TERMINAL_STATUSES = ("done", "error", "timeout", "cancelled")
+
+
+def run_sync(base_url, pdf_bytes):
+    status, payload = _request(f"{base_url}/v1/extract?reprocess=1", pdf_bytes, "POST")
+    return status == 200, payload
+
+
+def run_job(base_url, pdf_bytes, poll_interval):
+    status, payload = _request(f"{base_url}/v1/jobs?reprocess=1", pdf_bytes, "POST")
+    if status != 202:
+        return False, payload
+    job_id = payload["job_id"]
+    while True:
+        time.sleep(poll_interval)
+        status, job = _request(f"{base_url}/v1/jobs/{job_id}")
+        if status != 200:
+            return False, job
+        if job["status"] in TERMINAL_STATUSES:
+            return job["status"] == "done", job
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test untuk Invoice OCR API")
+    parser.add_argument("pdf", nargs="+", help="File PDF yang dikirim bergiliran")
+    parser.add_argument("--url", default=os.getenv("API_URL", "http://127.0.0.1:8600"))
+    parser.add_argument("--mode", choices=["jobs", "sync"], default="jobs")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    args = parser.parse_args()
+
+    pdfs = [open(path, "rb").read() for path in args.pdf]
+
+    def one(i):
+        pdf_bytes = pdfs[i % len(pdfs)]
+        start = time.perf_counter()
+        outcome = "ok"
+        if args.mode == "sync":
+            ok, _ = run_sync(args.url, pdf_bytes)
+            if not ok:
+                outcome = "error"
+        else:
+            ok, payload = run_job(args.url, pdf_bytes, args.poll_interval)
+            if not ok:
+                outcome = payload.get("status") if payload.get("status") in TERMINAL_STATUSES else "error"
+        return ok, outcome, time.perf_counter() - start
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one, range(args.requests)))
+    wall = time.perf_counter() - wall_start
+
+    latencies = [lat for ok, _, lat in results if ok]
+    errors = sum(1 for ok, _, _ in results if not ok)
+    failures = {}
+    for ok, outcome, _ in results:
+        if not ok:
+            failures[outcome] = failures.get(outcome, 0) + 1
+    report = {
+        "mode": args.mode,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "errors": errors,
+        "failures": failures,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(args.requests / wall, 3) if wall else 0,
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p95": round(percentile(latencies, 95), 3),
+        "latency_max": round(max(latencies), 3) if latencies else 0,
+        "latency_mean": round(statistics.mean(latencies), 3) if latencies else 0,
+    }
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+import urllib.request
+import urllib.error
+
+# Load test sesi Streamlit bersamaan untuk halaman invoice. Setiap sesi adalah
+# browser context headless terpisah (Playwright) = satu sesi Streamlit sendiri:
+# buka halaman, upload PDF sintetis, centang "proses ulang duplikat", klik
+# "🚀 Jalankan OCR", tunggu ringkasan hasil. LLM memakai server OpenAI tiruan.
+# Setiap upload memakai PDF sintetis yang berbeda (isi halaman unik), jadi
+# st.cache_data OCR halaman yang dibagi antar sesi tidak menjawab dari cache.
+# Selama test, RSS proses server (+ proses anak) dicatat berkala.
+#
+#   pip install playwright && playwright install chromium
+#   python benchmarks/loadtest_streamlit.py --sessions 1,2,4,8 --iterations 3
+#   python benchmarks/loadtest_streamlit.py --url http://127.0.0.1:8501 --pid $(pgrep -f "streamlit run") \
+#       --sessions 4 --iterations 5      # deployment yang sudah jalan (pm2), LLM sesuai env server
+#
+# Tanpa --url, server Streamlit (Home.py) dijalankan sendiri dengan OPENAI_BASE_URL
+# ke server tiruan dan database hasil/duplikat sementara. Hasil per langkah
+# jumlah sesi: latensi p50/p90/p95/p99, error rate, throughput dan RSS dari waktu
+# ke waktu -> dasar ukuran instance dan max_memory_restart pm2.
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from synth_invoice import generate_corpus  # noqa: E402
+from fake_openai_server import start_fake_openai_server  # noqa: E402
+from bench_pipeline import git_revision  # noqa: E402
+from loadtest_api import percentile  # noqa: E402
+
+INVOICE_PAGE_PATH = "OCR_Invoive"
+RUN_BUTTON = "🚀 Jalankan OCR"
+REPROCESS_LABEL = "Proses ulang dokumen duplikat"
+DONE_TEXT = "Ringkasan Hasil"
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "streamlit_loadtest_latest.json")
+
+
+# --- RSS Server ---
+def _process_tree(pid):
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def tree_rss_mb(pid):
+    total = 0.0
+    for member in _process_tree(pid):
+        try:
+            with open(f"/proc/{member}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) / 1024
+        except OSError:
+            continue
+    return total
+
+
+class RSSTimeline:
+    def __init__(self, pid, interval=1.0):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.started_at = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while True:
+            self.samples.append((round(time.perf_counter() - self.started_at, 1), round(tree_rss_mb(self.pid), 1)))
+            if self._stop.wait(self.interval):
+                break
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def window(self, start, end):
+        return [mb for t, mb in self.samples if start <= t <= end]
+
+
+# --- Server Streamlit ---
+def wait_healthy(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/_stcore/health", timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server Streamlit di {url} tidak sehat setelah {timeout} dtk")
+
+
+def start_streamlit(port, llm_base_url, work_dir):
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="loadtest",
+        OPENAI_BASE_URL=llm_base_url,
+        RESULTS_DB_PATH=os.path.join(work_dir, "results.sqlite"),
+    )
+    cmd = [
+        sys.executable, "-m", "streamlit", "run", "Home.py",
+        "--server.headless", "true",
+        "--server.port", str(port),
+        "--browser.gatherUsageStats", "false",
+    ]
+    log = open(os.path.join(work_dir, "streamlit.log"), "wb")
+    return subprocess.Popen(cmd, cwd=ROOT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+# --- Sesi ---
+async def run_session(browser, url, pdf_paths, iterations, timeout_ms, offset, started_at):
+    results = []
+    context = await browser.new_context()
+    page = await context.new_page()
+    try:
+        for i in range(iterations):
+            path = pdf_paths[(offset * iterations + i) % len(pdf_paths)]
+            start = time.perf_counter()
+            try:
+                await page.goto(f"{url}/{INVOICE_PAGE_PATH}", timeout=timeout_ms)
+                await page.locator('[data-testid="stFileUploader"] input[type="file"]').set_input_files(path, timeout=timeout_ms)
+                await page.get_by_text(REPROCESS_LABEL).click(timeout=timeout_ms)
+                await page.get_by_role("button", name=RUN_BUTTON).click(timeout=timeout_ms)
+                done = page.get_by_text(DONE_TEXT)
+                failed = page.locator('[data-testid="stException"]')
+                await done.or_(failed).first.wait_for(timeout=timeout_ms)
+                ok = await failed.count() == 0
+                error = None if ok else (await failed.first.inner_text())[:200]
+            except Exception as e:
+                ok, error = False, f"{type(e).__name__}: {str(e).splitlines()[0][:200]}"
+            end = time.perf_counter()
+            results.append({
+                "ok": ok,
+                "error": error,
+                "latency": round(end - start, 3),
+                "started": round(start - started_at, 1),
+                "finished": round(end - started_at, 1),
+            })
+    finally:
+        await context.close()
+    return results
+
+
+async def run_step(url, pdf_paths, sessions, iterations, timeout_ms, started_at):
+    try:
+        from playwright.async_api import async_playwright
+    except ImportError:
+        sys.exit("Load test ini butuh Playwright: pip install playwright && playwright install chromium")
+
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=True)
+        try:
+            per_session = await asyncio.gather(*[
+                run_session(browser, url, pdf_paths, iterations, timeout_ms, offset, started_at)
+                for offset in range(sessions)
+            ])
+        finally:
+            await browser.close()
+    return [result for results in per_session for result in results]
+
+
+def summarize(sessions, results, wall, rss_samples):
+    latencies = [r["latency"] for r in results if r["ok"]]
+    errors = [r for r in results if not r["ok"]]
+    return {
+        "sessions": sessions,
+        "runs": len(results),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(results), 3) if results else 0,
+        "error_samples": sorted({r["error"] for r in errors})[:5],
+        "wall_seconds": round(wall, 3),
+        "runs_per_minute": round(60 * len(results) / wall, 2) if wall else 0,
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p90": round(percentile(latencies, 90), 3),
+        "latency_p95": round(percentile(latencies, 95), 3),
+        "latency_p99": round(percentile(latencies, 99), 3),
+        "latency_max": round(max(latencies), 3) if latencies else 0,
+        "latency_mean": round(statistics.mean(latencies), 3) if latencies else 0,
+        "rss_start_mb": rss_samples[0] if rss_samples else None,
+        "rss_peak_mb": max(rss_samples) if rss_samples else None,
+        "rss_end_mb": rss_samples[-1] if rss_samples else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test sesi Streamlit bersamaan untuk halaman invoice")
+    parser.add_argument("--url", help="Streamlit yang sudah berjalan; default: jalankan Home.py sendiri")
+    parser.add_argument("--pid", type=int, help="PID server untuk RSS (wajib bila --url dipakai)")
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--sessions", default="1,2,4", help="jumlah sesi bersamaan per langkah, mis. 1,2,4,8")
+    parser.add_argument("--iterations", type=int, default=3, help="run OCR per sesi per langkah")
+    parser.add_argument("--pdf", nargs="*", help="PDF yang di-upload; default korpus sintetis")
+    parser.add_argument("--pages", type=int, default=2, help="halaman per PDF sintetis")
+    parser.add_argument("--llm-latency", type=float, default=2.0)
+    parser.add_argument("--llm-jitter", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=600, help="batas detik per run")
+    parser.add_argument("--rss-interval", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+    if args.url and not args.pid:
+        parser.error("--pid wajib bila --url dipakai (RSS diukur dari proses server)")
+
+    work_dir = tempfile.mkdtemp(prefix="streamlit-loadtest-")
+    steps = [int(n) for n in args.sessions.split(",")]
+    if args.pdf:
+        print("Peringatan: --pdf di-upload berulang, OCR halaman bisa dijawab st.cache_data (latensi terlalu optimis)")
+
+    def step_pdfs(name, count, seed):
+        # PDF unik per upload (seed berbeda per langkah): tidak ada halaman yang sama antar upload
+        if args.pdf:
+            return args.pdf
+        return generate_corpus(
+            os.path.join(work_dir, "corpus", name),
+            [("scanned", args.pages, 10 + 5 * (i % 4)) for i in range(count)],
+            seed=seed,
+        )
+
+    server = None
+    if args.url:
+        url, pid = args.url.rstrip("/"), args.pid
+    else:
+        _, llm_base_url = start_fake_openai_server(latency=args.llm_latency, jitter=args.llm_jitter)
+        server = start_streamlit(args.port, llm_base_url, work_dir)
+        url, pid = f"http://127.0.0.1:{args.port}", server.pid
+    timeout_ms = args.timeout * 1000
+    pdf_names = []
+    report_steps = []
+    rss = None
+
+    try:
+        wait_healthy(url, 120)
+        rss = RSSTimeline(pid, args.rss_interval)
+        with rss:
+            # Pemanasan (model OCR dimuat): tidak dihitung
+            warmup_pdfs = step_pdfs("warmup", 1, args.seed)
+            asyncio.run(run_step(url, warmup_pdfs[:1], 1, 1, timeout_ms, rss.started_at))
+            for n, sessions in enumerate(steps, start=1):
+                # Dibuat sebelum langkah dimulai, jadi tidak ikut terukur
+                pdf_paths = step_pdfs(f"step{n}_{sessions}", sessions * args.iterations, args.seed + 1000 * n)
+                pdf_names.extend(os.path.relpath(path, os.path.dirname(os.path.dirname(path))) for path in pdf_paths)
+                step_start = time.perf_counter() - rss.started_at
+                results = asyncio.run(run_step(url, pdf_paths, sessions, args.iterations, timeout_ms, rss.started_at))
+                step_end = time.perf_counter() - rss.started_at
+                summary = summarize(sessions, results, step_end - step_start, rss.window(step_start, step_end))
+                report_steps.append(summary)
+                print(f"sesi={sessions:<3} run={summary['runs']:<4} error={summary['error_rate']:.1%}  "
+                      f"p50={summary['latency_p50']:.1f}s p95={summary['latency_p95']:.1f}s p99={summary['latency_p99']:.1f}s  "
+                      f"RSS puncak={summary['rss_peak_mb']} MB")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = {
+        "git_revision": git_revision(),
+        "url": url,
+        "pdfs": sorted(set(pdf_names)),
+        "unique_uploads": not args.pdf,
+        "iterations": args.iterations,
+        "llm_latency": None if args.url else args.llm_latency,
+        "steps": report_steps,
+        "rss_timeline": rss.samples if rss else [],
+    }
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Laporan: {args.output}")
+    sys.exit(1 if any(step["errors"] for step in report_steps) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os
+import sys
+import random
+import argparse
+
+# Cek paritas OCR_BACKEND=onnx terhadap paddle pada halaman invoice sintetis:
+# box deteksi (jarak sudut rata-rata ke box pasangannya) dan teks/skor
+# rekognisi pada crop yang sama. Exit code 1 bila melewati toleransi.
+#
+#   python export_onnx.py && python benchmarks/onnx_parity.py --pages 10
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import numpy as np  # noqa: E402
+from synth_invoice import page_images  # noqa: E402
+from invoice_pipeline import DET_MODEL_DIR, REC_MODEL_DIR  # noqa: E402
+from ocr_backends import create_model  # noqa: E402
+from ocr_engine import detect_boxes, crop_boxes, recognize_crops  # noqa: E402
+
+
+def box_errors(reference, candidate):
+    # Untuk tiap box referensi: jarak sudut rata-rata ke box kandidat terdekat
+    if not len(candidate):
+        return [float("inf")] * len(reference)
+    candidate = np.asarray(candidate, dtype=np.float64)
+    errors = []
+    for box in np.asarray(reference, dtype=np.float64):
+        distances = np.linalg.norm(candidate - box, axis=2).mean(axis=1)
+        errors.append(float(distances.min()))
+    return errors
+
+
+def check_parity(pages, reference, candidate):
+    stats = {"boxes": 0, "box_count_diff": 0, "box_errors": [], "lines": 0, "text_match": 0, "score_diffs": []}
+    for image, _ in pages:
+        boxes_ref = detect_boxes(reference, image)
+        boxes_cand = detect_boxes(candidate, image)
+        stats["boxes"] += len(boxes_ref)
+        stats["box_count_diff"] += abs(len(boxes_ref) - len(boxes_cand))
+        stats["box_errors"].extend(box_errors(boxes_ref, boxes_cand))
+
+        # Rekognisi dibandingkan pada crop yang sama supaya tidak tercampur selisih deteksi
+        crops = crop_boxes(image, boxes_ref)
+        for (text_ref, score_ref), (text_cand, score_cand) in zip(
+            recognize_crops(reference, crops), recognize_crops(candidate, crops)
+        ):
+            stats["lines"] += 1
+            stats["text_match"] += text_ref == text_cand
+            stats["score_diffs"].append(abs(score_ref - score_cand))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paritas backend OCR ONNX vs Paddle")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--dpi", type=int, default=100, help="setara skala OCR 0.5 pada render 200 DPI")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", default="onnx", help="backend yang dibandingkan dengan paddle")
+    parser.add_argument("--max-box-px", type=float, default=2.0, help="batas p95 jarak sudut box (piksel)")
+    parser.add_argument("--min-text-match", type=float, default=0.99)
+    args = parser.parse_args()
+
+    pages = page_images(random.Random(args.seed), args.pages, dpi=args.dpi)
+    reference = create_model(DET_MODEL_DIR, REC_MODEL_DIR, backend="paddle", tier="fp32")
+    candidate = create_model(DET_MODEL_DIR, REC_MODEL_DIR, backend=args.backend)
+    stats = check_parity(pages, reference, candidate)
+
+    box_p95 = float(np.percentile(stats["box_errors"], 95)) if stats["box_errors"] else 0.0
+    text_match = stats["text_match"] / stats["lines"] if stats["lines"] else 1.0
+    score_max = max(stats["score_diffs"], default=0.0)
+    print(f"paddle vs {args.backend}: {args.pages} halaman, {stats['boxes']} box, {stats['lines']} baris")
+    print(f"  selisih jumlah box : {stats['box_count_diff']}")
+    print(f"  jarak sudut box p95: {box_p95:.2f} px (batas {args.max_box_px})")
+    print(f"  teks identik       : {100 * text_match:.2f}% (batas {100 * args.min_text_match:.0f}%)")
+    print(f"  selisih skor maks  : {score_max:.4f}")
+    ok = box_p95 <= args.max_box_px and text_match >= args.min_text_match
+    print("OK" if ok else "GAGAL: backend tidak setara dengan paddle")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import os
+import io
+import json
+import random
+import argparse
+from datetime import date, timedelta
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+# Generator invoice sintetis untuk benchmark.
+#   - "scanned": halaman dirender ke gambar dengan fonts/arial.ttf, diberi
+#     noise, sedikit rotasi dan kompresi JPEG, lalu dibungkus jadi PDF
+#   - "digital": PDF teks vektor (Helvetica, metrik setara Arial)
+# Setiap PDF disertai file .json berisi data sebenarnya dalam format
+# keluaran structure_invoice_data, untuk dipakai sebagai label.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONT_PATH = os.path.join(BASE_DIR, "fonts", "arial.ttf")
+
+PAGE_W_MM, PAGE_H_MM = 210, 297
+MARGIN_MM = 18
+LINE_MM = 6
+ITEMS_FIRST_PAGE_Y = 120
+
+SELLERS = ["PT Sumber Makmur", "PT Sentosa Abadi", "CV Cahaya Teknik", "PT Nusantara Data", "PT Mitra Logistik"]
+BUYERS = ["PT Wiratek Indonesia", "PT Bangun Persada", "PT Sinar Jaya", "CV Karya Mandiri"]
+PRODUCTS = ["Jasa Instalasi", "Kamera CCTV HD", "Kabel UTP Cat6", "Lisensi Software", "Switch 24 Port",
+            "Biaya Pengiriman", "Maintenance Bulanan", "Harddisk 2TB", "Router Wifi", "Jasa Konsultasi"]
+
+
+# --- Data Invoice ---
+def make_invoice_data(rng, n_items):
+    invoice_date = date(2025, 1, 1) + timedelta(days=rng.randint(0, 300))
+    items = []
+    for _ in range(n_items):
+        quantity = rng.randint(1, 20)
+        unit_price = rng.randint(5, 500) * 10000
+        items.append({
+            "item_description": rng.choice(PRODUCTS),
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "amount": quantity * unit_price,
+        })
+    subtotal = sum(item["amount"] for item in items)
+    vat = round(subtotal * 0.11)
+    npwp = f"{rng.randint(10, 99)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}.{rng.randint(1, 9)}-{rng.randint(100, 999)}.000"
+    return {
+        "seller_identity": {
+            "company_name": rng.choice(SELLERS),
+            "address": f"Jl. Merdeka No. {rng.randint(1, 200)}, Jakarta",
+            "email_address": "finance@seller.co.id",
+            "phone": f"+62-21-{rng.randint(1000000, 9999999)}",
+            "company_npwp_tin": npwp,
+        },
+        "buyer_identity": {
+            "company_name": rng.choice(BUYERS),
+            "address": f"Jl. Sudirman No. {rng.randint(1, 200)}, Bandung",
+            "email_address": "ap@buyer.co.id",
+            "phone": None,
+            "company_npwp_tin": None,
+            "attention": "Bagian Keuangan",
+        },
+        "invoice_details": {
+            "invoice_no": f"INV-{invoice_date.year}-{rng.randint(1000, 9999)}",
+            "invoice_date": invoice_date.isoformat(),
+            "order_po_number": f"PO-{rng.randint(10000, 99999)}",
+            "term_of_payment_due_date": (invoice_date + timedelta(days=30)).isoformat(),
+        },
+        "item_details": items,
+        "subtotal_invoice": subtotal,
+        "discount": None,
+        "vat": vat,
+        "invoice_total": subtotal + vat,
+        "bank_details": {
+            "account_no": str(rng.randint(10 ** 9, 10 ** 10 - 1)),
+            "account_name": "PT Seller",
+            "beneficiary_bank": "Bank Mandiri",
+            "branch": "Jakarta",
+            "swift_code": "BMRIIDJA",
+        },
+        "currency": "IDR",
+    }
+
+
+def _money(value):
+    return f"{value:,.0f}".replace(",", ".")
+
+
+def layout_pages(data, pages):
+    # Daftar (x_mm, y_mm, teks, ukuran_pt) per halaman; item dibagi rata ke semua halaman
+    seller, buyer = data["seller_identity"], data["buyer_identity"]
+    details, items = data["invoice_details"], data["item_details"]
+    per_page = [[] for _ in range(pages)]
+    first = per_page[0]
+    y = MARGIN_MM
+    first.append((MARGIN_MM, y - LINE_MM, seller["company_name"], 16))
+    for text in (seller["address"], f"Telp {seller['phone']}  Email {seller['email_address']}",
+                 f"NPWP {seller['company_npwp_tin']}"):
+        y += LINE_MM
+        first.append((MARGIN_MM, y, text, 10))
+    first.append((140, MARGIN_MM - LINE_MM - 2, "INVOICE", 18))
+    for i, text in enumerate((f"Invoice No: {details['invoice_no']}", f"Date: {details['invoice_date']}",
+                              f"PO: {details['order_po_number']}", f"Due: {details['term_of_payment_due_date']}")):
+        first.append((140, MARGIN_MM + (i + 1) * LINE_MM, text, 10))
+    y += 2 * LINE_MM
+    first.append((MARGIN_MM, y, "Bill To:", 11))
+    for text in (buyer["company_name"], buyer["address"], f"Attn: {buyer['attention']}"):
+        y += LINE_MM
+        first.append((MARGIN_MM, y, text, 10))
+
+    chunk = -(-len(items) // pages) if items else 0
+    for page_idx, lines in enumerate(per_page):
+        y = ITEMS_FIRST_PAGE_Y if page_idx == 0 else MARGIN_MM
+        for x, header in ((MARGIN_MM, "Description"), (110, "Qty"), (130, "Unit Price"), (165, "Amount")):
+            lines.append((x, y, header, 10))
+        for item in items[page_idx * chunk:(page_idx + 1) * chunk]:
+            y += LINE_MM
+            lines.append((MARGIN_MM, y, item["item_description"], 10))
+            lines.append((110, y, str(item["quantity"]), 10))
+            lines.append((130, y, _money(item["unit_price"]), 10))
+            lines.append((165, y, _money(item["amount"]), 10))
+        lines.append((MARGIN_MM, PAGE_H_MM - MARGIN_MM, f"Page {page_idx + 1} of {pages}", 8))
+
+    last = per_page[-1]
+    y = PAGE_H_MM - 80
+    for label, value in (("Subtotal", data["subtotal_invoice"]), ("VAT 11%", data["vat"]),
+                         ("Total", data["invoice_total"])):
+        last.append((130, y, label, 10))
+        last.append((165, y, _money(value), 10))
+        y += LINE_MM
+    bank = data["bank_details"]
+    for text in (f"Bank: {bank['beneficiary_bank']} {bank['branch']}", f"Account No: {bank['account_no']}",
+                 f"Account Name: {bank['account_name']}  SWIFT: {bank['swift_code']}"):
+        y += LINE_MM
+        last.append((MARGIN_MM, y, text, 10))
+    return per_page
+
+
+# --- Varian Scan (raster) ---
+def render_page_image(lines, dpi):
+    px = dpi / 25.4
+    image = Image.new("L", (int(PAGE_W_MM * px), int(PAGE_H_MM * px)), 255)
+    draw = ImageDraw.Draw(image)
+    fonts = {}
+    for x, y, text, size in lines:
+        if size not in fonts:
+            fonts[size] = ImageFont.truetype(FONT_PATH, int(size * dpi / 72))
+        draw.text((x * px, y * px), text, fill=0, font=fonts[size])
+    return image
+
+
+def scanned_pdf(data, pages, rng, dpi=200):
+    np_rng = np.random.default_rng(rng.randint(0, 2 ** 31))
+    images = []
+    for lines in layout_pages(data, pages):
+        image = render_page_image(lines, dpi)
+        image = image.rotate(rng.uniform(-0.8, 0.8), fillcolor=255, resample=Image.Resampling.BILINEAR)
+        image = image.filter(ImageFilter.GaussianBlur(0.6))
+        noisy = np.asarray(image, dtype=np.int16) + np_rng.normal(0, 12, (image.height, image.width))
+        image = Image.fromarray(np.clip(noisy, 0, 255).astype(np.uint8))
+        # Simulasikan kompresi JPEG scanner
+        buf = io.BytesIO()
+        image.convert("RGB").save(buf, format="JPEG", quality=70)
+        images.append(Image.open(buf))
+    out = io.BytesIO()
+    images[0].save(out, format="PDF", save_all=True, append_images=images[1:], resolution=dpi)
+    return out.getvalue()
+
+
+# --- Varian Digital (teks vektor) ---
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def digital_pdf(data, pages):
+    pt = 72 / 25.4
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    page_ids = []
+    for lines in layout_pages(data, pages):
+        ops = ["BT"]
+        for x, y, text, size in lines:
+            ops.append(f"/F1 {size} Tf 1 0 0 1 {x * pt:.2f} {(PAGE_H_MM - y) * pt - size:.2f} Tm ({_pdf_escape(text)}) Tj")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream.decode('latin-1')}\nendstream")
+        content_id = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_W_MM * pt:.2f} {PAGE_H_MM * pt:.2f}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1"))
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode("latin-1"))
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1"))
+    return out.getvalue()
+
+
+# --- Korpus ---
+def generate_invoice(rng, variant, pages, items):
+    data = make_invoice_data(rng, items)
+    pdf_bytes = scanned_pdf(data, pages, rng) if variant == "scanned" else digital_pdf(data, pages)
+    return pdf_bytes, data
+
+
+def page_images(rng, count, dpi=100, items=12):
+    # Halaman invoice 1 halaman sebagai array RGB (tanpa PDF/poppler) beserta
+    # baris teksnya, untuk benchmark/perbandingan model OCR
+    pages = []
+    while len(pages) < count:
+        lines = layout_pages(make_invoice_data(rng, items), 1)[0]
+        pages.append((np.asarray(render_page_image(lines, dpi).convert("RGB")), [text for _, _, text, _ in lines]))
+    return pages
+
+
+def generate_corpus(out_dir, specs, seed=0):
+    # specs: list of (variant, pages, items); seed tetap -> korpus identik antar run
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i, (variant, pages, items) in enumerate(specs):
+        pdf_bytes, data = generate_invoice(rng, variant, pages, items)
+        base = os.path.join(out_dir, f"{i:03d}_{variant}_{pages}p_{items}i")
+        with open(base + ".pdf", "wb") as f:
+            f.write(pdf_bytes)
+        with open(base + ".json", "w") as f:
+            json.dump(data, f, indent=2)
+        paths.append(base + ".pdf")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generator invoice PDF sintetis")
+    parser.add_argument("--out", default="benchmarks/corpus")
+    parser.add_argument("--variant", choices=["scanned", "digital"], default="scanned")
+    parser.add_argument("--pages", type=int, default=1, help="1-50 halaman")
+    parser.add_argument("--items", type=int, default=10)
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if not 1 <= args.pages <= 50:
+        parser.error("--pages harus 1-50")
+    specs = [(args.variant, args.pages, args.items)] * args.count
+    for path in generate_corpus(args.out, specs, seed=args.seed):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
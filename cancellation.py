@@ -0,0 +1,150 @@
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+import metrics
+
+# Pembatalan kooperatif + deadline untuk pekerjaan per dokumen. Token aktif
+# disimpan di contextvar, jadi rasterisasi, OCR dan panggilan LLM cukup
+# memanggil check_cancelled() / remaining() di titik aman (antar halaman,
+# sebelum request) tanpa parameter tambahan di setiap fungsi.
+#
+#   token = CancelToken()                  # dipegang pemanggil (UI / job API)
+#   with document_scope(token):            # deadline per dokumen
+#       with stage("ocr"): ...             # deadline per tahap (dalam deadline dokumen)
+#   token.cancel()                         # dari thread lain: tahap berikutnya berhenti
+#
+# Deadline dalam detik, 0 = tanpa batas. Deadline dokumen dan tahap OCR adalah
+# dasar + per halaman: begitu jumlah halaman diketahui (sesudah pre-flight),
+# scale_to_pages() memperpanjangnya, jadi dokumen sah sampai MAX_PAGES halaman
+# tidak terpotong oleh batas yang dimaksudkan untuk invoice 1-2 halaman.
+
+DOCUMENT_TIMEOUT = float(os.getenv("DOCUMENT_TIMEOUT_SECONDS", "180"))
+DOCUMENT_TIMEOUT_PER_PAGE = float(os.getenv("DOCUMENT_TIMEOUT_PER_PAGE_SECONDS", "30"))
+STAGE_TIMEOUTS = {
+    "ocr": float(os.getenv("OCR_STAGE_TIMEOUT_SECONDS", "60")),
+    "llm": float(os.getenv("LLM_TIMEOUT_SECONDS", "90")),
+}
+STAGE_TIMEOUTS_PER_PAGE = {
+    "ocr": float(os.getenv("OCR_STAGE_TIMEOUT_PER_PAGE_SECONDS", "25")),
+}
+
+
+class Cancelled(Exception):
+    def __init__(self, reason="dibatalkan", stage=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.stage = stage
+
+
+class DeadlineExceeded(Cancelled):
+    pass
+
+
+class CancelToken:
+    def __init__(self, timeout=None, parent=None, stage=None, per_page=0.0):
+        self.parent = parent
+        self.stage = stage
+        self.started = time.monotonic()
+        self.timeout = timeout
+        self.per_page = per_page
+        self.deadline = self.started + timeout if timeout else None
+        self.reason = None
+        self._event = threading.Event()
+
+    def scale_to_pages(self, pages):
+        # Deadline dihitung ulang dari awal token: dasar + per_page * halaman
+        if self.timeout and self.per_page:
+            self.deadline = self.started + self.timeout + self.per_page * pages
+
+    def cancel(self, reason="dibatalkan"):
+        self.reason = self.reason or reason
+        self._event.set()
+
+    def _chain(self):
+        token = self
+        while token is not None:
+            yield token
+            token = token.parent
+
+    @property
+    def cancelled(self):
+        return any(token._event.is_set() for token in self._chain())
+
+    def remaining(self):
+        # Sisa waktu ke deadline terdekat di rantai token, None bila tanpa batas
+        deadlines = [token.deadline for token in self._chain() if token.deadline is not None]
+        return max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+
+    def check(self):
+        now = time.monotonic()
+        for token in self._chain():
+            if token._event.is_set():
+                raise Cancelled(token.reason, self.stage)
+        # Deadline yang paling dulu lewat menentukan tahap yang dilaporkan
+        expired = [token for token in self._chain() if token.deadline is not None and now >= token.deadline]
+        if expired:
+            token = min(expired, key=lambda t: t.deadline)
+            raise DeadlineExceeded(f"melewati batas waktu {token.stage or 'dokumen'}", token.stage)
+
+
+_current_token = contextvars.ContextVar("cancel_token", default=None)
+
+
+def current_token():
+    return _current_token.get()
+
+
+def check_cancelled():
+    token = _current_token.get()
+    if token is not None:
+        token.check()
+
+
+def remaining(default=None):
+    token = _current_token.get()
+    left = token.remaining() if token is not None else None
+    if left is None:
+        return default
+    return left if default is None else min(left, default)
+
+
+@contextmanager
+def _scope(token):
+    context_token = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(context_token)
+
+
+def scale_to_pages(pages):
+    # Dipanggil setelah jumlah halaman diketahui: deadline tahap berjalan dan dokumen diperpanjang
+    token = _current_token.get()
+    if token is not None:
+        for scoped in token._chain():
+            scoped.scale_to_pages(pages)
+
+
+@contextmanager
+def document_scope(token=None, timeout=DOCUMENT_TIMEOUT, per_page=DOCUMENT_TIMEOUT_PER_PAGE):
+    # Deadline dokumen berlaku di bawah token pemanggil (pembatalan tetap diteruskan)
+    parent = token or _current_token.get()
+    with _scope(CancelToken(timeout, parent=parent, stage="document", per_page=per_page)) as scoped:
+        scoped.check()
+        yield scoped
+
+
+@contextmanager
+def stage(name):
+    scoped = CancelToken(
+        STAGE_TIMEOUTS.get(name), parent=_current_token.get(), stage=name, per_page=STAGE_TIMEOUTS_PER_PAGE.get(name, 0.0)
+    )
+    with _scope(scoped):
+        scoped.check()
+        try:
+            yield scoped
+        except DeadlineExceeded as e:
+            metrics.inc("deadline_exceeded", stage=e.stage or name)
+            raise
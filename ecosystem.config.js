@@ -1,5 +1,18 @@
 module.exports = {
     apps: [
+      {
+        // Satu proses memegang model det/rec; app lain terhubung lewat socket
+        name: "ocr_model_server",
+        script: "ocr_server.py",
+        instances: 1,
+        autorestart: true,
+        watch: false,
+        interpreter: './venv/bin/python',
+        max_memory_restart: "1G",
+        env: {
+          OCR_SERVER_SOCKET: "/tmp/ocr_invoice.sock",
+        },
+      },
       {
         name: "ocr_cv_invoice",
         script: "./venv/bin/streamlit", // Path to the Node.js wrapper script
@@ -9,6 +22,21 @@ module.exports = {
         watch: false,
         interpreter: './venv/bin/python',
         max_memory_restart: "1G",
+        env: {
+          OCR_SERVER_SOCKET: "/tmp/ocr_invoice.sock",
+        },
+      },
+      {
+        name: "ocr_invoice_api",
+        script: "api_server.py",
+        instances: 1,
+        autorestart: true,
+        watch: false,
+        interpreter: './venv/bin/python',
+        max_memory_restart: "1G",
+        env: {
+          OCR_SERVER_SOCKET: "/tmp/ocr_invoice.sock",
+        },
       }
     ]
   };
@@ -0,0 +1,48 @@
+import os
+import sys
+import argparse
+import subprocess
+from invoice_pipeline import DET_MODEL_DIR, REC_MODEL_DIR, HEAVY_REC_MODEL_DIR
+from ocr_backends import onnx_model_path
+
+# Export model Paddle inference (inference.pdmodel/.pdiparams) di models/ ke
+# ONNX untuk OCR_BACKEND=onnx. Hasil ditulis sebagai inference.onnx di folder
+# model yang sama. Butuh `pip install paddle2onnx`.
+#
+#   python export_onnx.py                  # det + rec (+ model berat cascade bila ada)
+#   python export_onnx.py --opset 11 --force
+
+def export_model(model_dir, opset, force=False):
+    target = onnx_model_path(model_dir)
+    if os.path.exists(target) and not force:
+        print(f"Lewati {target} (sudah ada, pakai --force untuk menimpa)")
+        return target
+    cmd = [
+        "paddle2onnx",
+        "--model_dir", model_dir,
+        "--model_filename", "inference.pdmodel",
+        "--params_filename", "inference.pdiparams",
+        "--save_file", target,
+        "--opset_version", str(opset),
+        "--enable_onnx_checker", "True",
+    ]
+    try:
+        subprocess.run(cmd, check=True)
+    except FileNotFoundError:
+        sys.exit("paddle2onnx tidak ditemukan, install dengan: pip install paddle2onnx")
+    print(f"Export {model_dir} -> {target}")
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export model det/rec PaddleOCR ke ONNX")
+    parser.add_argument("--opset", type=int, default=11)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+    for model_dir in (DET_MODEL_DIR, REC_MODEL_DIR, HEAVY_REC_MODEL_DIR):
+        if os.path.isdir(model_dir):
+            export_model(model_dir, args.opset, args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from PIL import Image
+from page_render import iter_thumbnails
+
+# Deteksi duplikat dokumen sebelum OCR + LLM dijalankan:
+# - duplikat persis: hash SHA-256 dari isi PDF
+# - hampir duplikat (scan ulang kertas yang sama): pHash (DCT) per halaman dari
+#   render thumbnail, dibandingkan dengan jarak Hamming. pHash thumbnail tidak
+#   bisa membedakan invoice lain dengan template yang sama, jadi kecocokan ini
+#   hanya kandidat: hasilnya baru dipakai ulang setelah dikonfirmasi dari teks
+#   OCR (nomor invoice, seller, total), lihat invoice_pipeline.py
+# Hasil sebelumnya disimpan di SQLite sehingga berlaku lintas batch dan sesi.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DB_PATH = os.getenv("RESULTS_DB_PATH", os.path.join(BASE_DIR, "data", "invoice_results.sqlite"))
+DEDUP_THUMBNAIL_DPI = 30
+DEDUP_HASH_SIZE = 16
+# Maks. bit berbeda per halaman (dari 256) agar dianggap kandidat scan ulang
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "16"))
+
+
+# --- Fungsi Hash Dokumen ---
+def content_hash(doc_bytes):
+    return hashlib.sha256(doc_bytes).hexdigest()
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT_32 = _dct_matrix(DEDUP_HASH_SIZE * 2)
+
+
+def phash_image(image_pil, hash_size=DEDUP_HASH_SIZE):
+    # Koefisien DCT frekuensi rendah dibanding median -> bitstring hex.
+    # Noise scan dan pergeseran kecil hanya mengubah frekuensi tinggi.
+    size = hash_size * 2
+    gray = image_pil.convert("L").resize((size, size), Image.Resampling.BOX)
+    pixels = np.asarray(gray, dtype=np.float64)
+    dct = _DCT_32 @ pixels @ _DCT_32.T
+    low = dct[:hash_size, :hash_size].flatten()
+    bits = low > np.median(low[1:])
+    return f"{int(''.join('1' if b else '0' for b in bits), 2):0{hash_size * hash_size // 4}x}"
+
+
+def page_hashes(doc_bytes):
+    return [phash_image(page) for page in iter_thumbnails(doc_bytes, DEDUP_THUMBNAIL_DPI)]
+
+
+def hamming_distance(hash_a, hash_b):
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+
+def is_near_duplicate(hashes_a, hashes_b, max_distance=DEDUP_MAX_DISTANCE):
+    if len(hashes_a) != len(hashes_b) or not hashes_a:
+        return False
+    return all(hamming_distance(a, b) <= max_distance for a, b in zip(hashes_a, hashes_b))
+
+
+# --- Indeks Duplikat (SQLite) ---
+class DedupIndex:
+    def __init__(self, db_path=RESULTS_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS processed_documents (
+                content_hash TEXT PRIMARY KEY,
+                page_count INTEGER NOT NULL,
+                page_hashes TEXT NOT NULL,
+                file_name TEXT,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_processed_documents_pages ON processed_documents (page_count)"
+        )
+        self._conn.commit()
+
+    def _row_to_match(self, row, kind):
+        content_hash_, file_name, result, created_at = row
+        return {
+            "kind": kind,
+            "content_hash": content_hash_,
+            "file_name": file_name,
+            "created_at": created_at,
+            "result": json.loads(result),
+        }
+
+    def find_exact(self, doc_hash):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, file_name, result, created_at FROM processed_documents WHERE content_hash = ?",
+                (doc_hash,),
+            ).fetchone()
+        return self._row_to_match(row, "exact") if row else None
+
+    def find_near(self, hashes):
+        # Hanya hash yang dibaca untuk pembandingan; hasil JSON diambil untuk kandidat terpilih saja
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT content_hash, page_hashes FROM processed_documents WHERE page_count = ? ORDER BY created_at DESC",
+                (len(hashes),),
+            ).fetchall()
+        for content_hash_, row_hashes in rows:
+            if is_near_duplicate(hashes, json.loads(row_hashes)):
+                match = self.find_exact(content_hash_)
+                if match:
+                    match["kind"] = "near"
+                return match
+        return None
+
+    def record(self, doc_hash, hashes, file_name, result):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO processed_documents VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_hash, len(hashes), json.dumps(hashes), file_name, json.dumps(result), time.time()),
+            )
+            self._conn.commit()
+
+
+_dedup_index = None
+_dedup_index_lock = threading.Lock()
+
+
+def get_dedup_index():
+    global _dedup_index
+    with _dedup_index_lock:
+        if _dedup_index is None:
+            _dedup_index = DedupIndex()
+        return _dedup_index
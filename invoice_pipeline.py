@@ -0,0 +1,686 @@
+import os
+import math
+import json
+import time
+import queue
+import threading
+import zipfile
+import numpy as np
+from io import BytesIO
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from invoice_dedup import content_hash, page_hashes, get_dedup_index
+from results_store import get_results_store, invoice_matches_text
+from page_render import (
+    plan_document, iter_page_images, find_content_region, shift_lines,
+    render_region, ResizeBuffer, CONTENT_MARGIN_PX, page_pixel_budget,
+)
+import metrics
+from metrics import timed
+from cancellation import check_cancelled, document_scope, remaining, scale_to_pages, stage
+
+# Pipeline invoice bersama: dipakai oleh halaman Streamlit, api_server.py dan
+# tool batch, supaya semua jalur memakai fungsi (dan pool model) yang sama.
+# Library berat (paddleocr, openai, pandas, openpyxl) baru di-import saat
+# pertama dipakai; start_model_warmup() memuat model OCR di thread background.
+
+# Load .env (for OpenAI API key)
+load_dotenv()
+
+# Konfigurasi path
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+POPPLER_PATH = r"C:\Program Files\poppler-24.07.0\Library\bin"
+FONT_PATH = os.path.join(BASE_DIR, "fonts", "arial.ttf")
+DET_MODEL_DIR = os.path.join(BASE_DIR, "models", "en_PP-OCRv3_det_infer")
+REC_MODEL_DIR = os.path.join(BASE_DIR, "models", "en_PP-OCRv3_rec_infer")
+# Model rekognisi berat untuk cascade: PP-OCRv4 server. Rilis resmi hanya ada
+# versi "ch" (kamusnya mencakup huruf Latin dan angka) dan tidak ikut repo:
+#   wget https://paddleocr.bj.bcebos.com/PP-OCRv4/chinese/ch_PP-OCRv4_rec_server_infer.tar
+#   tar -xf ch_PP-OCRv4_rec_server_infer.tar -C models/
+# Cascade nonaktif (dicatat sekali di log) bila folder tidak ada. Dimuat saat
+# pertama kali dibutuhkan.
+HEAVY_REC_MODEL_DIR = os.getenv("OCR_HEAVY_REC_MODEL_DIR", os.path.join(BASE_DIR, "models", "ch_PP-OCRv4_rec_server_infer"))
+# Kamus karakter model berat (lang PaddleOCR), harus sesuai model di atas
+HEAVY_REC_LANG = os.getenv("OCR_HEAVY_REC_LANG", "ch")
+# Model klasifikasi sudut baris (hanya untuk halaman berorientasi campuran);
+# bila folder tidak ada PaddleOCR mengunduh model cls bawaan
+CLS_MODEL_DIR = os.path.join(BASE_DIR, "models", "ch_ppocr_mobile_v2.0_cls_infer")
+
+# Bila di-set, OCR dijalankan oleh ocr_server.py lewat Unix socket ini
+OCR_SERVER_SOCKET = os.getenv("OCR_SERVER_SOCKET")
+# OCR dua resolusi: deteksi pada halaman skala OCR, rekognisi dari crop resolusi
+# render. Baris dengan skor < OCR_ESCALATE_SCORE (maks. N per halaman) dirender
+# ulang sekali per halaman pada OCR_ESCALATE_DPI (hanya PDF) dan direkognisi
+# ulang dalam satu batch.
+OCR_TWO_RES = os.getenv("OCR_TWO_RES", "1") == "1"
+OCR_ESCALATE_SCORE = float(os.getenv("OCR_ESCALATE_SCORE", "0.85"))
+OCR_ESCALATE_DPI = int(os.getenv("OCR_ESCALATE_DPI", "400"))
+OCR_ESCALATE_MAX_LINES = int(os.getenv("OCR_ESCALATE_MAX_LINES", "10"))
+
+# OpenAI API Key (client dibuat saat request LLM pertama)
+api_key = os.getenv("OPENAI_API_KEY")
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client():
+    global _client
+    if not api_key:
+        return None
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+            _client = OpenAI(api_key=api_key)
+        return _client
+
+
+# --- Pool Model PaddleOCR ---
+def create_ocr_model():
+    # Backend (paddle/onnx) dipilih lewat OCR_BACKEND, lihat ocr_backends.py
+    from ocr_backends import create_model
+    return create_model(DET_MODEL_DIR, REC_MODEL_DIR)
+
+
+def create_heavy_recognizer():
+    # Hanya text_recognizer yang dipakai; detektor instance ini ikut dibuang.
+    # Model berat selalu lewat Paddle fp32 (seperti create_angle_classifier): direktori
+    # server_infer tidak membawa inference.onnx, jadi OCR_BACKEND tidak berlaku di sini.
+    from ocr_backends import create_paddle_model
+    return create_paddle_model(DET_MODEL_DIR, HEAVY_REC_MODEL_DIR, lang=HEAVY_REC_LANG).text_recognizer
+
+
+def create_angle_classifier():
+    from ocr_backends import create_paddle_model
+    options = {"cls_model_dir": CLS_MODEL_DIR} if os.path.isdir(CLS_MODEL_DIR) else {}
+    return create_paddle_model(DET_MODEL_DIR, REC_MODEL_DIR, use_angle_cls=True, **options).text_classifier
+
+
+class OCRModelPool:
+    # PaddleOCR tidak thread-safe, jadi setiap instance hanya dipakai satu
+    # thread pada satu waktu; request lain menunggu di antrean.
+    def __init__(self, size=None):
+        # Jumlah instance (1 instance = 1 set bobot model di memori): OCR_POOL_SIZE
+        # atau hasil kalibrasi thread_tuning.py untuk host ini
+        from thread_tuning import tuned_pool_size
+        self.size = max(1, size or tuned_pool_size())
+        self._models = queue.Queue()
+        self._waiting = 0
+        for _ in range(self.size):
+            self._models.put(create_ocr_model())
+        metrics.set_gauge("ocr_pool_idle_models", self._models.qsize)
+        metrics.set_gauge("ocr_pool_waiting", lambda: self._waiting)
+
+    @contextmanager
+    def acquire(self):
+        self._waiting += 1
+        with timed("ocr_pool_wait"):
+            # Menunggu model bebas tetap bisa dibatalkan / kena deadline
+            while True:
+                try:
+                    model = self._models.get(timeout=0.2)
+                    break
+                except queue.Empty:
+                    try:
+                        check_cancelled()
+                    except Exception:
+                        self._waiting -= 1
+                        raise
+        self._waiting -= 1
+        try:
+            yield model
+        finally:
+            self._models.put(model)
+
+    def ocr(self, image_np, det_scale=1.0):
+        from ocr_engine import run_ocr_batch
+
+        with self.acquire() as model:
+            return run_ocr_batch(model, [image_np], [det_scale])[0]
+
+    def recognize(self, crops):
+        # Rekognisi saja (tanpa deteksi) untuk crop baris yang sudah dipotong
+        from ocr_engine import recognize_crops
+
+        with self.acquire() as model:
+            return recognize_crops(model, crops)
+
+
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+
+def get_ocr_pool():
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            if OCR_SERVER_SOCKET:
+                from ocr_server import OCRServerClient
+                _ocr_pool = OCRServerClient(OCR_SERVER_SOCKET)
+            else:
+                # Request yang datang selama kalibrasi (OCR_AUTOTUNE=1) ikut menunggu,
+                # jadi pool selalu dibuat dengan konfigurasi hasil kalibrasi
+                from thread_tuning import ensure_tuning
+                ensure_tuning()
+                _ocr_pool = OCRModelPool()
+        return _ocr_pool
+
+
+# --- Warm-up Model di Background ---
+_warmup = {"status": "idle", "error": None, "started_at": None, "load_seconds": None, "warmup_seconds": None, "cascade": None}
+_warmup_lock = threading.Lock()
+
+
+def _warm_up_model():
+    try:
+        start = time.perf_counter()
+        pool = get_ocr_pool()
+        loaded = time.perf_counter()
+        # Inferensi dummy: alokasi graph/arena pertama terjadi di sini, bukan di request user
+        dummy = np.full((64, 256, 3), 255, dtype=np.uint8)
+        dummy[24:40, 16:240] = 0
+        pool.ocr(dummy)
+        if not OCR_SERVER_SOCKET:
+            # Model berat tidak dimuat di sini, hanya dicek (dan dicatat bila tidak ada)
+            from ocr_engine import heavy_model_available
+            _warmup["cascade"] = heavy_model_available()
+        _warmup.update(
+            status="ready",
+            load_seconds=round(loaded - start, 3),
+            warmup_seconds=round(time.perf_counter() - loaded, 3),
+        )
+        metrics.set_gauge("ocr_model_ready", 1)
+    except Exception as e:
+        _warmup.update(status="error", error=str(e))
+        print(f"Warm-up model OCR gagal: {e}")
+
+
+def start_model_warmup():
+    # Idempoten; kembali langsung, status bisa dibaca lewat model_status()
+    with _warmup_lock:
+        if _warmup["status"] == "idle":
+            _warmup.update(status="loading", started_at=time.time())
+            metrics.set_gauge("ocr_model_ready", 0)
+            threading.Thread(target=_warm_up_model, name="ocr-warmup", daemon=True).start()
+    return model_status()
+
+
+def model_status():
+    return dict(_warmup)
+
+
+# --- Fungsi Ekstraksi Teks dari PaddleOCR ---
+def _escalation_clusters(rects, dpi, budget):
+    # Kelompokkan area baris (pts) berurutan dari atas; satu kelompok dirender
+    # sekali selama gabungannya masih muat anggaran piksel pada `dpi`
+    clusters = []
+    for index, rect in sorted(rects.items(), key=lambda item: item[1][1]):
+        if clusters:
+            x0, y0, x1, y1 = clusters[-1]["rect"]
+            merged = (min(x0, rect[0]), min(y0, rect[1]), max(x1, rect[2]), max(y1, rect[3]))
+            if (merged[2] - merged[0]) * (merged[3] - merged[1]) * (dpi / 72) ** 2 <= budget:
+                clusters[-1]["rect"] = merged
+                clusters[-1]["lines"].append(index)
+                continue
+        clusters.append({"rect": rect, "lines": [index]})
+    return clusters
+
+
+def escalate_low_confidence(doc_bytes, page_plan, tile, lines, recognize):
+    # Baris berskor rendah direkognisi ulang dari render DPI lebih tinggi. Baris
+    # dikelompokkan per area yang muat anggaran piksel/RSS (page_pixel_budget),
+    # tiap area dirender sekali (dipotong ke ukuran halaman, DPI diturunkan bila
+    # perlu), lalu semua crop baris direkognisi dalam satu batch tanpa deteksi.
+    # Box dalam frame render (tile).
+    low = sorted((i for i, (_, (_, score)) in enumerate(lines) if score < OCR_ESCALATE_SCORE), key=lambda i: lines[i][1][1])
+    low = low[:OCR_ESCALATE_MAX_LINES]
+    if not low or "size_pts" not in page_plan:
+        return lines
+    from ocr_engine import crop_boxes
+
+    page_dpi = page_plan["dpi"]
+    page_w, page_h = page_plan["size_pts"]
+    tile_x, tile_y = tile[:2] if tile else (0, 0)
+    margin = CONTENT_MARGIN_PX * 72 / page_dpi
+    # Box baris dalam pts halaman
+    boxes = {
+        i: np.array([[(x + tile_x) * 72 / page_dpi, (y + tile_y) * 72 / page_dpi] for x, y in lines[i][0]], dtype=np.float32)
+        for i in low
+    }
+    rects = {
+        i: (max(0.0, box[:, 0].min() - margin), max(0.0, box[:, 1].min() - margin),
+            min(page_w, box[:, 0].max() + margin), min(page_h, box[:, 1].max() + margin))
+        for i, box in boxes.items()
+    }
+    budget = page_pixel_budget()
+    crops, crop_lines = [], []
+    with timed("ocr_escalate"):
+        for cluster in _escalation_clusters(rects, OCR_ESCALATE_DPI, budget):
+            check_cancelled()
+            x0, y0, x1, y1 = cluster["rect"]
+            area_pts = max((x1 - x0) * (y1 - y0), 1.0)
+            dpi = min(OCR_ESCALATE_DPI, int(72 * math.sqrt(budget / area_pts)))
+            if dpi <= page_dpi:
+                # Anggaran tidak memberi resolusi lebih tinggi dari render awal
+                metrics.inc("ocr_escalations_skipped", len(cluster["lines"]))
+                continue
+            factor = dpi / 72
+            left, top = int(x0 * factor), int(y0 * factor)
+            right = min(math.ceil(x1 * factor), int(page_w * factor))
+            bottom = min(math.ceil(y1 * factor), int(page_h * factor))
+            area = render_region(doc_bytes, page_plan["page"], dpi, (left, top, right - left, bottom - top))
+            origin = np.array([left, top], dtype=np.float32)
+            crops.extend(crop_boxes(area, [boxes[i] * factor - origin for i in cluster["lines"]]))
+            crop_lines.extend(cluster["lines"])
+        if not crops:
+            return lines
+        metrics.inc("ocr_escalations", len(crops))
+        retry = recognize(crops)
+    lines = list(lines)
+    for i, (text, score) in zip(crop_lines, retry):
+        if text and score > lines[i][1][1]:
+            metrics.inc("ocr_escalations_improved")
+            lines[i] = [lines[i][0], (text, float(score))]
+    return lines
+
+
+def recognizer_from_ocr(run_ocr):
+    # Pemanggil hanya memberi run_ocr (mis. versi ter-cache): crop baris lewat OCR
+    # pemanggil itu juga, teks + rata-rata skor semua baris yang terdeteksi
+    def recognize(crops):
+        results = []
+        for crop in crops:
+            found = run_ocr(crop)[0] or []
+            if not found:
+                results.append(("", 0.0))
+                continue
+            results.append((" ".join(t for _, (t, _) in found), sum(score for _, (_, score) in found) / len(found)))
+        return results
+    return recognize
+
+
+def extract_text_with_paddleocr(pdf_file, run_ocr=None, plan=None, recognize=None):
+    # run_ocr bisa diganti pemanggil (mis. versi ter-cache milik Streamlit);
+    # recognize (rekognisi crop saja, untuk eskalasi) mengikuti OCR yang sama
+    if recognize is None:
+        recognize = get_ocr_pool().recognize if run_ocr is None else recognizer_from_ocr(run_ocr)
+    run_ocr = run_ocr or get_ocr_pool().ocr
+    doc_bytes = pdf_file.read()
+    plan = plan or plan_document(doc_bytes)
+    pages_by_no = {page["page"]: page for page in plan["pages"]}
+    extracted_text = ""
+    resize_buffer = ResizeBuffer()
+    blank_pages, content_pages = set(), set()
+    for page_no, page, scale, tile in iter_page_images(doc_bytes, plan, full_resolution=OCR_TWO_RES):
+        # Titik batal/deadline antar halaman (render halaman berikutnya belum dimulai)
+        check_cancelled()
+        # Halaman kosong dilewati; deteksi hanya melihat area berisi tinta
+        with timed("content_crop"):
+            region = find_content_region(page)
+        if region is None:
+            metrics.inc("pages_blank")
+            blank_pages.add(page_no)
+            continue
+        content_pages.add(page_no)
+        x0, y0, x1, y1 = region
+        metrics.inc("page_pixels", page.shape[0] * page.shape[1])
+        metrics.inc("content_pixels", (x1 - x0) * (y1 - y0))
+        content = page[y0:y1, x0:x1]
+
+        # Box dikembalikan ke frame halaman render (resolusi penuh)
+        if OCR_TWO_RES:
+            with timed("ocr"):
+                result = run_ocr(content, det_scale=scale)
+            lines = shift_lines(result[0] or [], x0, y0)
+            if plan.get("kind", "pdf") == "pdf":
+                lines = escalate_low_confidence(doc_bytes, pages_by_no[page_no], tile, lines, recognize)
+        else:
+            # Skala sisa per halaman sudah dihitung di rencana (JPEG sebagian
+            # sudah diperkecil oleh decoder)
+            with timed("resize"):
+                image_np = resize_buffer.resize(content, scale)
+            with timed("ocr"):
+                result = run_ocr(image_np)
+            lines = shift_lines(result[0] or [], x0, y0, 1 / scale)
+        metrics.inc("pages")
+        metrics.inc("lines", len(lines))
+
+        txts = [line[1][0] for line in lines]
+        extracted_text += "\n".join(txts) + "\n"
+
+    # Halaman (semua tile-nya) tanpa tinta dilaporkan ke pemanggil, bukan dilewati diam-diam
+    skipped = sorted(blank_pages - content_pages)
+    if skipped:
+        plan["limits"].append(f"halaman {', '.join(map(str, skipped))} terdeteksi kosong dan tidak di-OCR")
+    return extracted_text
+
+# --- Fungsi Strukturkan JSON dari OpenAI ---
+def structure_invoice_data(extracted_text):
+    client = get_openai_client()
+    if not client:
+        return {"error": "OpenAI API key belum dikonfigurasi."}
+
+    prompt = f"""
+    You are a financial assistant. Based on the following extracted invoice text, convert it into a clean and structured JSON format.
+    Extract structured data from the invoice document using the following rules and output it strictly in the provided JSON format.
+
+    RULES:
+    - Fields marked as "mandatory" must always be filled based on the content found in the invoice.
+    - Fields marked as "not mandatory" must ONLY be filled if the exact information is found in the document. If not available, set them to `null`.
+    - DO NOT guess, infer, or hallucinate values that are not explicitly stated in the document.
+    - Use proper data types: strings for text, integers for amounts, ISO 8601 format (YYYY-MM-DD) for dates.
+    - Show all readable items
+    - Return ONLY a valid JSON object, no explanation or surrounding text.
+
+    JSON FORMAT:
+    {{
+    "seller_identity": {{
+        "company_name": "...",
+        "address": "...",
+        "email_address": "...",
+        "phone": "... or null",
+        "company_npwp_tin": "... or null"
+    }},
+    "buyer_identity": {{
+        "company_name": "...",
+        "address": "...",
+        "email_address": "...",
+        "phone": "... or null",
+        "company_npwp_tin": "... or null",
+        "attention": "... or null"
+    }},
+    "invoice_details": {{
+        "invoice_no": "...",
+        "invoice_date": "...",
+        "order_po_number": "... or null",
+        "term_of_payment_due_date": "... or null"
+    }},
+    "item_details": [
+        {{
+        "item_description": "...",
+        "quantity": ...,
+        "unit_price": ...,
+        "amount": ...
+        }}
+    ],
+    "subtotal_invoice": ...,
+    "discount": ... or null,
+    "vat": ... or null,
+    "invoice_total": ...,
+    "bank_details": {{
+        "account_no": "...",
+        "account_name": "...",
+        "beneficiary_bank": "...",
+        "branch": "... or null",
+        "swift_code": "... or null"
+    }},
+    "currency": "IDR"
+    }}
+
+    Invoice Text:
+    \"\"\"{extracted_text}\"\"\"
+    """
+
+    # Teks yang tidak akan dipakai tidak dikirim ke LLM; request dibatasi sisa deadline
+    check_cancelled()
+    with timed("llm"):
+        try:
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[
+                    {"role": "system", "content": "You are an assistant that extracts information from Invoice."},
+                    {"role": "user", "content": prompt}
+                ],
+                timeout=remaining(600)
+            )
+        except Exception:
+            # Timeout karena deadline dilaporkan sebagai DeadlineExceeded
+            check_cancelled()
+            raise
+    metrics.inc("llm_requests")
+    if response.usage:
+        metrics.inc("llm_prompt_tokens", response.usage.prompt_tokens)
+        metrics.inc("llm_completion_tokens", response.usage.completion_tokens)
+
+    structured_data = response.choices[0].message.content.strip()
+    try:
+        return json.loads(structured_data)
+    except json.JSONDecodeError:
+        return {"error": "❌ Gagal parsing JSON dari LLM."}
+
+# --- Fungsi Perhitungan Tambahan (DPP, VAT) ---
+def calculate_invoice_fields(data):
+    try:
+        subtotal = data.get("subtotal_invoice", 0)
+        vat = data.get("vat", None)
+        # discount = data.get("discount", 0)
+
+        # Jika discount tidak valid (misalnya None), jadikan 0
+        # if discount is None:
+        #     discount = 0
+
+        # Hitung subtotal setelah diskon
+        after_discount = subtotal
+        # after_discount = max(after_discount, 0)  # Hindari negatif
+        dpp = round((100 / 111) * after_discount, 2)
+        calculated_vat = round(0.11 * dpp, 2)
+
+        return {
+            "subtotal_sebelum_diskon": subtotal,
+            # "diskon": discount,
+            # "subtotal_setelah_diskon": after_discount,
+            "dpp": dpp,
+            "ppn_11_persen": calculated_vat
+        }
+    except Exception as e:
+        return {"error": f"Gagal menghitung: {str(e)}"}
+
+
+@timed("excel")
+def save_to_excel(structured_invoice_data, calculated_fields):
+    import pandas as pd
+    from openpyxl import Workbook
+    from openpyxl.utils.dataframe import dataframe_to_rows
+
+    output = BytesIO()
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Invoice"
+
+    seller_identity = structured_invoice_data.get("seller_identity") or {}
+    buyer_identity = structured_invoice_data.get("buyer_identity") or {}
+    invoice_details = structured_invoice_data.get("invoice_details") or {}
+    item_details = structured_invoice_data.get("item_details") or []
+    subtotal_invoice = structured_invoice_data.get("subtotal_invoice", "")
+    discount = structured_invoice_data.get("discount", "")
+    vat = structured_invoice_data.get("vat", "")
+    invoice_total = structured_invoice_data.get("invoice_total", "")
+    currency = structured_invoice_data.get("currency", "")
+    bank_details = structured_invoice_data.get("bank_details") or {}
+    
+
+    ws.append(["Seller Identity"])
+    ws.append(["Company Name", seller_identity.get("company_name", "")])
+    ws.append(["Address", seller_identity.get("address", "")])
+    ws.append(["Email Address", seller_identity.get("email_address", "")])
+    ws.append(["Phone", seller_identity.get("phone", "")])
+    ws.append(["Company NPWP/TIN", seller_identity.get("company_npwp_tin", "")])
+    ws.append([])
+
+    ws.append(["Buyer Identity"])
+    ws.append(["Company Name", buyer_identity.get("company_name", "")])
+    ws.append(["Address", buyer_identity.get("address", "")])
+    ws.append(["Email Address", buyer_identity.get("email_address", "")])
+    ws.append(["Phone", buyer_identity.get("phone", "")])
+    ws.append(["Company NPWP/TIN", buyer_identity.get("company_npwp_tin", "")])
+    ws.append(["Attention", buyer_identity.get("attention", "")])
+    ws.append([])
+
+    ws.append(["Invoice Details"])
+    ws.append(["Invoice No", invoice_details.get("invoice_no", "")])
+    ws.append(["Invoice Date", invoice_details.get("invoice_date", "")])
+    ws.append(["Order/PO Number", invoice_details.get("order_po_number", "")])
+    ws.append(["Term of Payment/Due Date", invoice_details.get("term_of_payment_due_date", "")])
+    ws.append([])
+
+    if item_details:
+        ws.append(["item_details"])
+        item_df = pd.DataFrame(item_details)
+        for row in dataframe_to_rows(item_df, index=False, header=True):
+            ws.append(row)
+        ws.append([])
+
+    ws.append(["Subtotal Invoice", subtotal_invoice])
+    ws.append(["Discount", discount])
+    ws.append(["VAT", vat])
+    ws.append(["Invoice Total", invoice_total])
+    ws.append(["Currency", currency])
+
+    ws.append(["Bank Details"])
+    ws.append(["Account No", bank_details.get("account_no", "")])
+    ws.append(["Account Name", bank_details.get("account_name", "")])
+    ws.append(["Benecifiary Bank", bank_details.get("beneficiary_bank", "")])
+    ws.append(["Branch", bank_details.get("branch", "")])
+    ws.append(["SWIFT Code", bank_details.get("swift_code", "")])
+    ws.append([])
+
+    
+
+    wb.save(output)
+    output.seek(0)
+    return output
+
+def excel_file_name(idx):
+    return f"invoice_data_{idx}.xlsx"
+
+
+def write_excel_zip(results, fileobj):
+    # Workbook dibuat dan ditulis ke arsip satu per satu, jadi hanya satu
+    # workbook yang ada di memori walau batch berisi ratusan invoice
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for result in results:
+            excel_file = save_to_excel(result["data"], result["calculation"])
+            archive.writestr(excel_file_name(result["idx"]), excel_file.getbuffer())
+    return fileobj
+
+# --- Deteksi Duplikat ---
+@timed("dedup")
+def find_duplicate(doc_bytes):
+    # Cek hash isi dulu (murah); hash perseptual halaman hanya dihitung bila perlu
+    index = get_dedup_index()
+    doc_hash = content_hash(doc_bytes)
+    hashes = None
+    match = index.find_exact(doc_hash)
+    if match is None:
+        hashes = page_hashes(doc_bytes)
+        match = index.find_near(hashes)
+    return doc_hash, hashes, match
+
+
+def _duplicate_info(match):
+    return {
+        "kind": match["kind"],
+        "file_name": match["file_name"],
+        "content_hash": match["content_hash"],
+        "created_at": match["created_at"],
+    }
+
+
+# --- Pipeline Lengkap per Dokumen ---
+@timed("document")
+def process_invoice(doc_bytes, run_ocr=None, file_name=None, skip_duplicates=True, cancel_token=None, recognize=None):
+    # Deadline per dokumen/tahap dan pembatalan dari pemanggil: Cancelled atau
+    # DeadlineExceeded (cancellation.py) dinaikkan ke pemanggil
+    with document_scope(cancel_token):
+        return _process_invoice(doc_bytes, run_ocr, file_name, skip_duplicates, recognize)
+
+
+def _process_invoice(doc_bytes, run_ocr, file_name, skip_duplicates, recognize=None):
+    # 0. Duplikat persis (SHA-256 sama) memakai hasil sebelumnya; kecocokan pHash
+    #    (scan ulang) baru dipakai ulang setelah dikonfirmasi dari teks OCR (langkah 2)
+    metrics.inc("documents")
+    doc_hash, hashes, match = find_duplicate(doc_bytes)
+    if match:
+        metrics.inc("dedup_hits", kind=match["kind"])
+    if match and match["kind"] == "exact" and skip_duplicates:
+        result = dict(match["result"])
+        result["duplicate_of"] = _duplicate_info(match)
+        result["reused"] = True
+        result["limits"] = []
+        return result
+
+    # 1. Ekstrak teks dari OCR (dengan anggaran halaman/piksel/memori)
+    with stage("ocr"):
+        plan = plan_document(doc_bytes)
+        # Deadline OCR dan dokumen mengikuti jumlah halaman yang benar-benar diproses
+        scale_to_pages(len(plan["pages"]))
+        extracted_text = extract_text_with_paddleocr(BytesIO(doc_bytes), run_ocr=run_ocr, plan=plan, recognize=recognize)
+
+    # 2a. Scan ulang: pakai hasil kandidat hanya bila nomor invoice, seller dan
+    #     total-nya ada di teks OCR; selain itu hanya ditandai (duplicate_of, reused=False)
+    if match and match["kind"] == "near" and skip_duplicates:
+        if invoice_matches_text(match["result"].get("data") or {}, extracted_text):
+            metrics.inc("dedup_confirmed", kind="near")
+            result = dict(match["result"])
+            result["text"] = extracted_text
+            get_dedup_index().record(doc_hash, hashes, file_name, result)
+            result["duplicate_of"] = _duplicate_info(match)
+            result["reused"] = True
+            result["limits"] = plan["limits"]
+            return result
+        metrics.inc("dedup_unconfirmed", kind="near")
+
+    # 2b. Invoice yang sudah dikenal (nomor berlabel + seller ada di teks OCR) tidak
+    #     dikirim ke LLM; kecocokan yang belum pasti hanya ditandai
+    with timed("known_invoice_lookup"):
+        known = get_results_store().find_known_invoice(extracted_text) if skip_duplicates else None
+    if known:
+        metrics.inc("dedup_hits", kind="invoice" if known["confirmed"] else "possible_invoice")
+        known_info = {
+            "kind": "invoice" if known["confirmed"] else "possible_invoice",
+            "file_name": known["file_name"],
+            "content_hash": known["content_hash"],
+            "created_at": known["created_at"],
+        }
+    if known and known["confirmed"]:
+        result = {
+            "text": extracted_text,
+            "data": known["data"],
+            "calculation": known["calculation"]
+        }
+        get_dedup_index().record(doc_hash, hashes or page_hashes(doc_bytes), file_name, result)
+        result["duplicate_of"] = known_info
+        result["reused"] = True
+        result["limits"] = plan["limits"]
+        return result
+
+    # 3. Strukturkan data via OpenAI
+    with stage("llm"):
+        structured_data = structure_invoice_data(extracted_text)
+
+    # 4. Hitung nilai tambahan
+    calculated_fields = calculate_invoice_fields(structured_data)
+
+    # 5. Periksa apakah invoice menyebutkan "Price including VAT"
+    if "price including vat" in extracted_text.lower():
+        structured_data["vat"] = calculated_fields.get("ppn_11_persen", None)
+
+    result = {
+        "text": extracted_text,
+        "data": structured_data,
+        "calculation": calculated_fields
+    }
+
+    # 6. Simpan ke riwayat (hasil error tidak disimpan agar bisa dicoba ulang)
+    if "error" not in structured_data:
+        if hashes is None:
+            hashes = page_hashes(doc_bytes)
+        get_dedup_index().record(doc_hash, hashes, file_name, result)
+        get_results_store().save(structured_data, calculated_fields, file_name, doc_hash)
+
+    if match:
+        result["duplicate_of"] = _duplicate_info(match)
+    else:
+        result["duplicate_of"] = known_info if known else None
+    result["reused"] = False
+    result["limits"] = plan["limits"]
+    return result
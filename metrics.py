@@ -0,0 +1,215 @@
+import os
+import time
+import threading
+import contextvars
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Timer dan counter per tahap pipeline (rasterisasi, OCR det/rec, LLM, Excel, ...).
+# Semua observasi masuk ke registry global (diekspos dalam format teks
+# Prometheus) dan, bila ada, ke RunMetrics milik run yang sedang berjalan
+# untuk rincian waktu per run di halaman Streamlit.
+
+METRICS_PREFIX = "invoice"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Jumlah observasi terakhir per tahap yang dipakai untuk p50/p95
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1000"))
+QUANTILES = (0.5, 0.95)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+# --- Registry ---
+class MetricsRegistry:
+    def __init__(self, window=METRICS_WINDOW):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._sums = defaultdict(float)
+        self._counts = defaultdict(int)
+        self._gauges = {}
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[(name, _label_key(labels))] += value
+
+    def counter(self, name):
+        # Total counter untuk semua kombinasi label
+        with self._lock:
+            return sum(value for (counter_name, _), value in self._counters.items() if counter_name == name)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self._samples[stage].append(seconds)
+            self._sums[stage] += seconds
+            self._counts[stage] += 1
+
+    def set_gauge(self, name, value, **labels):
+        # value boleh berupa callable (mis. panjang antrean), dibaca saat scrape
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def stage_summary(self):
+        with self._lock:
+            stages = {stage: list(samples) for stage, samples in self._samples.items()}
+            sums = dict(self._sums)
+            counts = dict(self._counts)
+        return {
+            stage: {
+                "count": counts[stage],
+                "sum": sums[stage],
+                "p50": percentile(samples, 50),
+                "p95": percentile(samples, 95),
+            }
+            for stage, samples in stages.items()
+        }
+
+    def render_prometheus(self):
+        lines = []
+        metric = f"{METRICS_PREFIX}_stage_seconds"
+        lines.append(f"# HELP {metric} Latency per pipeline stage.")
+        lines.append(f"# TYPE {metric} summary")
+        for stage, summary in sorted(self.stage_summary().items()):
+            labels = [("stage", stage)]
+            for q in QUANTILES:
+                value = summary["p50"] if q == 0.5 else summary["p95"]
+                lines.append(f"{metric}{_format_labels(labels, {'quantile': q})} {value:.6f}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {summary['sum']:.6f}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {summary['count']}")
+
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name}_total counter")
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f"{METRICS_PREFIX}_{name}_total{_format_labels(labels)} {value:g}")
+        for name in sorted({name for name, _ in gauges}):
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} gauge")
+            for (gauge_name, labels), value in sorted(gauges.items(), key=lambda item: item[0]):
+                if gauge_name == name:
+                    try:
+                        value = value() if callable(value) else value
+                    except Exception:
+                        continue
+                    lines.append(f"{METRICS_PREFIX}_{name}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+# --- Rincian per Run ---
+class RunMetrics:
+    def __init__(self):
+        self.stages = defaultdict(list)
+        self.counters = defaultdict(float)
+
+    def breakdown(self):
+        rows = []
+        for stage, samples in self.stages.items():
+            rows.append({
+                "Tahap": stage,
+                "Jumlah": len(samples),
+                "Total (s)": round(sum(samples), 3),
+                "Rata-rata (s)": round(sum(samples) / len(samples), 3),
+                "p50 (s)": round(percentile(samples, 50), 3),
+                "p95 (s)": round(percentile(samples, 95), 3),
+            })
+        return sorted(rows, key=lambda row: row["Total (s)"], reverse=True)
+
+
+_current_run = contextvars.ContextVar("current_run", default=None)
+# Dipasang oleh profiling.py selama satu run yang diprofil; default None
+stage_listener = contextvars.ContextVar("stage_listener", default=None)
+
+
+@contextmanager
+def track_run(run=None):
+    run = run or RunMetrics()
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+def inc(name, value=1, **labels):
+    registry.inc(name, value, **labels)
+    run = _current_run.get()
+    if run is not None:
+        run.counters[name] += value
+
+
+def observe(stage, seconds):
+    registry.observe(stage, seconds)
+    run = _current_run.get()
+    if run is not None:
+        run.stages[stage].append(seconds)
+    listener = stage_listener.get()
+    if listener is not None:
+        listener(stage, seconds)
+
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def set_gauge(name, value, **labels):
+    registry.set_gauge(name, value, **labels)
+
+
+# --- Endpoint /metrics ---
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    # Untuk proses tanpa HTTP server sendiri (Streamlit, ocr_server.py).
+    # port 0 = nonaktif.
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is None and port:
+            _metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+            threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+        return _metrics_server
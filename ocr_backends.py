@@ -0,0 +1,123 @@
+import os
+
+# Backend inference untuk model det/rec di models/. Semua backend memakai
+# pre/post-processing PaddleOCR yang sama, hanya predictor-nya yang berbeda:
+#   paddle  paddlepaddle CPU inference (default)
+#   onnx    ONNX Runtime dengan model hasil export_onnx.py (inference.onnx di
+#           folder model yang sama); butuh `pip install onnxruntime`
+#
+#   OCR_BACKEND=onnx ORT_INTRA_OP_THREADS=4 streamlit run Home.py
+#
+# Tier model (OCR_MODEL_TIER):
+#   fp32    model asli di models/<nama>
+#   int8    model terkuantisasi di models/<nama>_int8 (hasil quantize_models.py),
+#           selalu dijalankan dengan backend onnx
+#
+#   OCR_MODEL_TIER=int8 streamlit run Home.py
+#
+# Jumlah thread CPU dan MKL-DNN diambil dari hasil kalibrasi host ini
+# (thread_tuning.py) bila opsi tidak diberikan eksplisit.
+
+OCR_BACKEND = os.getenv("OCR_BACKEND", "paddle")
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))
+ORT_INTER_OP_THREADS = int(os.getenv("ORT_INTER_OP_THREADS", "0"))
+ORT_GRAPH_OPT = os.getenv("ORT_GRAPH_OPT", "all")
+ONNX_MODEL_FILE = "inference.onnx"
+OCR_MODEL_TIER = os.getenv("OCR_MODEL_TIER", "fp32")
+MODEL_TIERS = {"fp32": "", "int8": "_int8"}
+
+
+def onnx_model_path(model_dir):
+    return os.path.join(model_dir, ONNX_MODEL_FILE)
+
+
+def tier_model_dir(model_dir, tier=None):
+    tier = tier or OCR_MODEL_TIER
+    if tier not in MODEL_TIERS:
+        raise ValueError(f"OCR_MODEL_TIER tidak dikenal: {tier} (pilihan: {', '.join(MODEL_TIERS)})")
+    return model_dir + MODEL_TIERS[tier]
+
+
+# --- Paddle ---
+def create_paddle_model(det_model_dir, rec_model_dir, lang="en", **options):
+    from paddleocr import PaddleOCR
+
+    options.setdefault("use_angle_cls", False)
+    return PaddleOCR(
+        det_model_dir=det_model_dir,
+        rec_model_dir=rec_model_dir,
+        use_gpu=False,
+        lang=lang,
+        **options
+    )
+
+
+# --- ONNX Runtime ---
+def create_onnx_session(model_path, intra_op_threads=None):
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        raise RuntimeError("OCR_BACKEND=onnx membutuhkan onnxruntime (pip install onnxruntime).")
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = {
+        "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+        "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+        "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+    }[ORT_GRAPH_OPT]
+    options.intra_op_num_threads = ORT_INTRA_OP_THREADS if intra_op_threads is None else intra_op_threads
+    options.inter_op_num_threads = ORT_INTER_OP_THREADS
+    return ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def _use_session(predictor_owner, model_path, intra_op_threads=None):
+    # PaddleOCR membuat InferenceSession tanpa SessionOptions; ganti dengan
+    # session yang memakai pengaturan thread/optimasi graph di atas
+    session = create_onnx_session(model_path, intra_op_threads)
+    predictor_owner.predictor = session
+    predictor_owner.input_tensor = session.get_inputs()[0]
+    predictor_owner.output_tensors = None
+
+
+def create_onnx_model(det_model_dir, rec_model_dir, lang="en", cpu_threads=None):
+    det_path, rec_path = onnx_model_path(det_model_dir), onnx_model_path(rec_model_dir)
+    # Validasi dulu supaya pesan error jelas sebelum PaddleOCR memuat apa pun
+    for path in (det_path, rec_path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} tidak ditemukan, jalankan export_onnx.py terlebih dahulu.")
+    from paddleocr import PaddleOCR
+
+    model = PaddleOCR(
+        use_angle_cls=False,
+        use_onnx=True,
+        det_model_dir=det_path,
+        rec_model_dir=rec_path,
+        use_gpu=False,
+        lang=lang
+    )
+    _use_session(model.text_detector, det_path, cpu_threads)
+    _use_session(model.text_recognizer, rec_path, cpu_threads)
+    return model
+
+
+BACKENDS = {
+    "paddle": create_paddle_model,
+    "onnx": create_onnx_model,
+}
+
+
+def create_model(det_model_dir, rec_model_dir, backend=None, tier=None, lang="en", **options):
+    # lang menentukan kamus karakter rekognisi (harus sama dengan model rec)
+    tier = tier or OCR_MODEL_TIER
+    backend = backend or OCR_BACKEND
+    if tier == "int8":
+        # Model INT8 hanya tersedia sebagai ONNX
+        backend = "onnx"
+    det_model_dir, rec_model_dir = tier_model_dir(det_model_dir, tier), tier_model_dir(rec_model_dir, tier)
+    if backend not in BACKENDS:
+        raise ValueError(f"OCR_BACKEND tidak dikenal: {backend} (pilihan: {', '.join(BACKENDS)})")
+    if not options:
+        from thread_tuning import tuned_options
+        options = tuned_options(backend, tier)
+    return BACKENDS[backend](det_model_dir, rec_model_dir, lang=lang, **options)
@@ -0,0 +1,330 @@
+import os
+import re
+import copy
+import threading
+import cv2
+import numpy as np
+import paddleocr  # noqa: F401 - menambahkan folder paket ke sys.path untuk modul tools.*
+from tools.infer.predict_system import sorted_boxes
+from tools.infer.utility import get_rotate_crop_image
+import metrics
+from metrics import timed
+
+# Langkah deteksi dan rekognisi PaddleOCR yang dipisah, supaya crop dari
+# beberapa halaman/request bisa direkognisi dalam satu panggilan batch.
+# Format hasil sama dengan PaddleOCR.ocr(): [[box, (text, score)], ...] per halaman.
+# Dengan det_scale < 1 deteksi berjalan pada gambar yang diperkecil, sedangkan
+# crop untuk rekognisi diambil dari gambar resolusi penuh (OCR dua resolusi).
+#
+# Cascade rekognisi: semua crop lewat model ringan; crop berskor di bawah
+# OCR_CASCADE_SCORE atau yang gagal cek format field (tanggal, nominal, NPWP)
+# direkognisi ulang dengan model berat (HEAVY_REC_MODEL_DIR, dimuat lazy).
+#
+# Orientasi per halaman: dari rasio box tinggi/lebar hasil deteksi, halaman yang
+# teksnya vertikal diputar 90 derajat sekali lalu dideteksi ulang; halaman yang
+# skor rekognisinya rendah dicek terbalik (180) pada sampel crop. Klasifikasi
+# sudut per baris (cls) hanya dijalankan untuk halaman dengan orientasi campuran.
+# Box hasil selalu dikembalikan ke frame gambar input.
+
+OCR_CASCADE = os.getenv("OCR_CASCADE", "1") == "1"
+OCR_CASCADE_SCORE = float(os.getenv("OCR_CASCADE_SCORE", "0.9"))
+
+OCR_ORIENTATION = os.getenv("OCR_ORIENTATION", "1") == "1"
+# Porsi box memanjang yang vertikal: di atas ini halaman diputar, di antara
+# batas bawah dan atas halaman dianggap campuran
+ORIENTATION_ROTATE_RATIO = 0.7
+ORIENTATION_MIXED_RATIO = 0.3
+ORIENTATION_MIN_BOXES = 4
+# Cek terbalik hanya bila rata-rata skor halaman di bawah ini
+ORIENTATION_FLIP_SCORE = 0.7
+ORIENTATION_FLIP_MARGIN = 0.1
+ORIENTATION_SAMPLE_LINES = 8
+
+_NUMBER_TOKEN = re.compile(r"\d[\d.,]*\d|\d")
+_DATE_TOKEN = re.compile(r"^(\d{1,4})[/.-](\d{1,2})[/.-](\d{1,4})$")
+_AMOUNT_TOKEN = re.compile(r"^\d{1,3}([.,]\d{3})*([.,]\d{1,2})?$|^\d+([.,]\d{1,2})?$")
+_NPWP_DIGITS = (15, 16)
+# Huruf yang sering tertukar dengan angka di tengah deretan digit
+_CONFUSABLE_IN_NUMBER = re.compile(r"\d[OoIlSB]\d|\d[.,][OoIlSB]|[OoIlSB][.,]\d")
+
+
+def detect_boxes(model, image_np, det_scale=1.0):
+    if det_scale < 1:
+        height, width = image_np.shape[:2]
+        size = (max(1, int(width * det_scale)), max(1, int(height * det_scale)))
+        image_np = cv2.resize(image_np, size, interpolation=cv2.INTER_AREA)
+    dt_boxes, _ = model.text_detector(image_np)
+    if dt_boxes is None or len(dt_boxes) == 0:
+        return []
+    if det_scale < 1:
+        dt_boxes = dt_boxes / det_scale
+    return sorted_boxes(dt_boxes)
+
+
+def crop_boxes(image_np, boxes):
+    return [get_rotate_crop_image(image_np, copy.deepcopy(box)) for box in boxes]
+
+
+def recognize_crops(model, crops):
+    if not crops:
+        return []
+    rec_res, _ = model.text_recognizer(crops)
+    return rec_res
+
+
+# --- Cek Format Field ---
+def _valid_date(token):
+    match = _DATE_TOKEN.match(token)
+    if not match:
+        return None
+    first, month, last = (int(part) for part in match.groups())
+    day = last if len(match.group(1)) == 4 else first
+    return 1 <= month <= 12 and 1 <= day <= 31
+
+
+def field_format_ok(text):
+    # False bila baris terlihat seperti tanggal/nominal/NPWP tapi formatnya rusak
+    if _CONFUSABLE_IN_NUMBER.search(text):
+        return False
+    if "npwp" in text.lower():
+        digits = sum(char.isdigit() for char in text)
+        if digits and digits not in _NPWP_DIGITS:
+            return False
+    for token in text.replace(" ", "\n").split():
+        token = token.strip("()[]:;Rp")
+        if not any(char.isdigit() for char in token):
+            continue
+        date_ok = _valid_date(token)
+        if date_ok is not None:
+            if not date_ok:
+                return False
+            continue
+        number = _NUMBER_TOKEN.fullmatch(token)
+        if number and not _AMOUNT_TOKEN.match(token) and token.count(".") + token.count(",") > 1:
+            # Pemisah ribuan yang tidak teratur, mis. "1.23.456" atau "12,3,4"
+            return False
+    return True
+
+
+# --- Cascade Model Ringan -> Berat ---
+_heavy_recognizer = None
+_heavy_lock = threading.Lock()
+_heavy_missing_logged = False
+
+
+def heavy_model_available():
+    # Cascade nonaktif bila model berat tidak ada; dicatat sekali di log + gauge metrik
+    global _heavy_missing_logged
+    from invoice_pipeline import HEAVY_REC_MODEL_DIR
+
+    if not OCR_CASCADE or _heavy_recognizer is False:
+        return False
+    available = os.path.isdir(HEAVY_REC_MODEL_DIR)
+    metrics.set_gauge("ocr_cascade_available", int(available))
+    if not available and not _heavy_missing_logged:
+        _heavy_missing_logged = True
+        print(f"Cascade OCR nonaktif: model rekognisi berat tidak ditemukan di {HEAVY_REC_MODEL_DIR} "
+              "(lihat HEAVY_REC_MODEL_DIR di invoice_pipeline.py untuk cara mengunduh)")
+    return available
+
+
+def get_heavy_recognizer():
+    # False = gagal dimuat; cascade dimatikan permanen agar tidak dicoba ulang tiap halaman
+    global _heavy_recognizer
+    from invoice_pipeline import create_heavy_recognizer
+
+    if not heavy_model_available():
+        return None
+    with _heavy_lock:
+        if _heavy_recognizer is None:
+            try:
+                with timed("ocr_heavy_load"):
+                    _heavy_recognizer = create_heavy_recognizer()
+            except Exception as e:
+                print(f"Cascade OCR nonaktif: model rekognisi berat tidak bisa dimuat: {e}")
+                _heavy_recognizer = False
+                metrics.set_gauge("ocr_cascade_available", 0)
+        return _heavy_recognizer or None
+
+
+def _better(light, heavy):
+    light_ok, heavy_ok = field_format_ok(light[0]), field_format_ok(heavy[0])
+    if heavy_ok != light_ok:
+        return heavy if heavy_ok else light
+    return heavy if heavy[1] > light[1] else light
+
+
+def cascade_recognize(crops, rec_res):
+    # Kirim crop yang meragukan ke model berat; hasil terbaik per crop dipakai
+    metrics.inc("ocr_cascade_lines", len(rec_res))
+    pending = [
+        i for i, (text, score) in enumerate(rec_res)
+        if score < OCR_CASCADE_SCORE or not field_format_ok(text)
+    ]
+    if not pending:
+        return rec_res
+    recognizer = get_heavy_recognizer()
+    if recognizer is None:
+        metrics.inc("ocr_cascade_unavailable", len(pending))
+        return rec_res
+    metrics.inc("ocr_cascade_escalated", len(pending))
+    with _heavy_lock, timed("ocr_rec_heavy"):
+        heavy_res, _ = recognizer([crops[i] for i in pending])
+    rec_res = list(rec_res)
+    for i, heavy in zip(pending, heavy_res):
+        best = _better(rec_res[i], heavy)
+        if best is not rec_res[i]:
+            metrics.inc("ocr_cascade_replaced")
+            rec_res[i] = best
+    return rec_res
+
+
+# --- Orientasi Halaman ---
+def box_sizes(box):
+    box = np.asarray(box, dtype=np.float32)
+    return float(np.linalg.norm(box[1] - box[0])), float(np.linalg.norm(box[2] - box[1]))
+
+
+def page_orientation(boxes):
+    # "upright", "rotated" (teks vertikal) atau "mixed", dari box yang memanjang
+    elongated = [(w, h) for w, h in map(box_sizes, boxes) if max(w, h) > 2 * min(w, h)]
+    if len(elongated) < ORIENTATION_MIN_BOXES:
+        return "upright"
+    vertical = sum(h > w for w, h in elongated) / len(elongated)
+    if vertical > ORIENTATION_ROTATE_RATIO:
+        return "rotated"
+    if vertical >= ORIENTATION_MIXED_RATIO:
+        return "mixed"
+    return "upright"
+
+
+def rotate_image(image_np, k):
+    return np.ascontiguousarray(np.rot90(image_np, k)) if k else image_np
+
+
+def unrotate_box(box, k, width, height):
+    # Titik box di gambar hasil np.rot90(gambar, k) -> frame gambar asli (width x height)
+    box = np.asarray(box, dtype=np.float32)
+    x, y = box[:, 0], box[:, 1]
+    if k == 1:
+        x, y = width - 1 - y, x
+    elif k == 2:
+        x, y = width - 1 - x, height - 1 - y
+    elif k == 3:
+        x, y = y, height - 1 - x
+    return np.stack([x, y], axis=1)
+
+
+def orient_page(model, image_np, det_scale):
+    boxes = detect_boxes(model, image_np, det_scale)
+    page = {"source": image_np, "image": image_np, "k": 0, "det_scale": det_scale, "boxes": boxes, "mixed": False}
+    if not OCR_ORIENTATION:
+        return page
+    orientation = page_orientation(boxes)
+    if orientation == "rotated":
+        # Arah 90 vs 270 diselesaikan oleh cek terbalik setelah rekognisi
+        metrics.inc("ocr_pages_rotated")
+        page["k"] = 1
+        page["image"] = rotate_image(image_np, 1)
+        page["boxes"] = detect_boxes(model, page["image"], det_scale)
+    elif orientation == "mixed":
+        metrics.inc("ocr_pages_mixed")
+        page["mixed"] = True
+    return page
+
+
+def flip_page(model, page):
+    k = (page["k"] + 2) % 4
+    image = rotate_image(page["source"], k)
+    return dict(page, k=k, image=image, boxes=detect_boxes(model, image, page["det_scale"]))
+
+
+def is_upside_down(model, crops, rec_res):
+    # Murah untuk halaman normal: hanya dicek bila skornya rendah
+    if len(rec_res) < 3 or sum(score for _, score in rec_res) / len(rec_res) >= ORIENTATION_FLIP_SCORE:
+        return False
+    metrics.inc("ocr_flip_checks")
+    sample = sorted(range(len(crops)), key=lambda i: crops[i].shape[1], reverse=True)[:ORIENTATION_SAMPLE_LINES]
+    flipped = recognize_crops(model, [rotate_image(crops[i], 2) for i in sample])
+    original = sum(rec_res[i][1] for i in sample) / len(sample)
+    return sum(score for _, score in flipped) / len(sample) > original + ORIENTATION_FLIP_MARGIN
+
+
+_angle_classifier = None
+_angle_classifier_lock = threading.Lock()
+
+
+def get_angle_classifier():
+    # Model cls dimuat saat halaman campuran pertama ditemukan; False = gagal dimuat
+    global _angle_classifier
+    from invoice_pipeline import create_angle_classifier
+
+    with _angle_classifier_lock:
+        if _angle_classifier is None:
+            try:
+                with timed("ocr_cls_load"):
+                    _angle_classifier = create_angle_classifier()
+            except Exception as e:
+                print(f"Model klasifikasi sudut tidak bisa dimuat: {e}")
+                _angle_classifier = False
+        return _angle_classifier or None
+
+
+def classify_crops(crops):
+    classifier = get_angle_classifier()
+    if classifier is None or not crops:
+        return crops
+    with _angle_classifier_lock, timed("ocr_cls"):
+        crops, _, _ = classifier(crops)
+    return crops
+
+
+def to_page_result(model, boxes, rec_res):
+    lines = [
+        [box.tolist(), (text, float(score))]
+        for box, (text, score) in zip(boxes, rec_res)
+        if score >= model.drop_score
+    ]
+    return [lines or None]
+
+
+def _recognize_pages(model, pages):
+    # Crop semua halaman lalu satu rekognisi batch; kembalikan (crops, rec_res) per halaman
+    with timed("ocr_crop"):
+        crops_per_page = []
+        for page in pages:
+            crops = crop_boxes(page["image"], page["boxes"])
+            crops_per_page.append(classify_crops(crops) if page["mixed"] else crops)
+    crops = [crop for page_crops in crops_per_page for crop in page_crops]
+    with timed("ocr_rec"):
+        rec_res = recognize_crops(model, crops)
+    metrics.inc("ocr_crops", len(crops))
+    if OCR_CASCADE and crops:
+        rec_res = cascade_recognize(crops, rec_res)
+
+    results = []
+    offset = 0
+    for page_crops in crops_per_page:
+        results.append((page_crops, rec_res[offset:offset + len(page_crops)]))
+        offset += len(page_crops)
+    return results
+
+
+def run_ocr_batch(model, images, det_scales=None):
+    # Deteksi (+ orientasi) per gambar, lalu semua crop direkognisi sekaligus
+    det_scales = det_scales or [1.0] * len(images)
+    with timed("ocr_det"):
+        pages = [orient_page(model, image_np, det_scale) for image_np, det_scale in zip(images, det_scales)]
+    recognized = _recognize_pages(model, pages)
+
+    results = []
+    for page, (crops, rec_res) in zip(pages, recognized):
+        if OCR_ORIENTATION and is_upside_down(model, crops, rec_res):
+            metrics.inc("ocr_pages_flipped")
+            with timed("ocr_det"):
+                page = flip_page(model, page)
+            _, rec_res = _recognize_pages(model, [page])[0]
+        height, width = page["source"].shape[:2]
+        boxes = [unrotate_box(box, page["k"], width, height) for box in page["boxes"]]
+        results.append(to_page_result(model, boxes, rec_res))
+    return results
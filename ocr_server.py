@@ -0,0 +1,302 @@
+import os
+import json
+import queue
+import socket
+import struct
+import threading
+import socketserver
+from concurrent.futures import Future
+import numpy as np
+import metrics
+from cancellation import check_cancelled, remaining
+from page_transport import PageAttachments, get_page_pool
+
+# Model server OCR bersama: satu proses memegang model det/rec dari models/
+# dan melayani OCR lewat Unix socket. Streamlit, api_server.py dan tool batch
+# menjadi thin client bila OCR_SERVER_SOCKET di-set, sehingga N instance UI
+# cukup memakai satu set bobot model di memori.
+#
+#   python ocr_server.py                      # default /tmp/ocr_invoice.sock
+#   OCR_SERVER_SOCKET=/tmp/ocr_invoice.sock streamlit run Home.py
+#
+# Protokol per pesan: 4 byte panjang header (big-endian) + header JSON + payload.
+# Request: header {"shape": [...], "dtype": "uint8", "det_scale": 1.0} + byte array gambar, atau
+#          header {"shm": nama, "shape": [...], "dtype": ...} tanpa payload bila
+#          gambar sudah ada di shared memory (page_transport.py, default).
+# Rekognisi saja (crop baris, mis. eskalasi DPI tinggi): header {"rec_shapes": [[h, w, 3], ...],
+#          "dtype": "uint8"} + byte semua crop berurutan; hasilnya [[teks, skor], ...].
+# Response: header {"result": ...} atau {"error": "..."} tanpa payload.
+# Metrik (antrean, ukuran batch, waktu det/rec) di http://127.0.0.1:$METRICS_PORT/metrics.
+
+OCR_SERVER_SOCKET = os.getenv("OCR_SERVER_SOCKET", "/tmp/ocr_invoice.sock")
+OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", "8"))
+OCR_BATCH_WAIT_MS = float(os.getenv("OCR_BATCH_WAIT_MS", "10"))
+OCR_CLIENT_TIMEOUT = float(os.getenv("OCR_CLIENT_TIMEOUT", "300"))
+# "shm" (deskriptor shared memory) atau "socket" (byte gambar lewat socket)
+OCR_PAGE_TRANSPORT = os.getenv("OCR_PAGE_TRANSPORT", "shm")
+
+_HEADER = struct.Struct(">I")
+
+
+# --- Protokol ---
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    while size:
+        n = sock.recv_into(view, size)
+        if n == 0:
+            raise ConnectionError("Koneksi OCR server terputus.")
+        view = view[n:]
+        size -= n
+    return buf
+
+
+def send_message(sock, header, payload=b""):
+    header_bytes = json.dumps(header).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(header_bytes)) + header_bytes)
+    if payload:
+        sock.sendall(payload)
+
+
+def recv_message(sock):
+    (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, length))
+
+
+def recv_image(sock, header):
+    dtype = np.dtype(header["dtype"])
+    size = int(np.prod(header["shape"])) * dtype.itemsize
+    return np.frombuffer(_recv_exact(sock, size), dtype=dtype).reshape(header["shape"])
+
+
+def recv_crops(sock, header):
+    return [recv_image(sock, dict(header, shape=shape)) for shape in header["rec_shapes"]]
+
+
+# --- Server ---
+class OCRBatcher:
+    # Request dari semua koneksi masuk ke satu antrean; tiap worker mengambil
+    # sampai OCR_BATCH_SIZE gambar (menunggu maks. OCR_BATCH_WAIT_MS) lalu
+    # menjalankan deteksi per gambar dan satu rekognisi batch untuk semua crop.
+    # Request rekognisi saja ikut batch yang sama, crop-nya digabung dalam satu panggilan.
+    def __init__(self, models, batch_size=OCR_BATCH_SIZE, wait_ms=OCR_BATCH_WAIT_MS):
+        self.batch_size = max(1, batch_size)
+        self.wait = wait_ms / 1000
+        self._queue = queue.Queue()
+        metrics.set_gauge("ocr_server_queue_depth", self._queue.qsize)
+        for model in models:
+            threading.Thread(target=self._worker, args=(model,), daemon=True).start()
+
+    def submit(self, image_np, det_scale=1.0):
+        future = Future()
+        self._queue.put(("ocr", image_np, det_scale, future))
+        return future
+
+    def submit_recognize(self, crops):
+        future = Future()
+        self._queue.put(("rec", crops, None, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get(timeout=self.wait))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_pages(self, model, batch):
+        if not batch:
+            return
+        from ocr_engine import run_ocr_batch
+
+        metrics.inc("ocr_batches")
+        metrics.inc("ocr_batch_images", len(batch))
+        try:
+            results = run_ocr_batch(
+                model,
+                [image_np for _, image_np, _, _ in batch],
+                [det_scale for _, _, det_scale, _ in batch]
+            )
+        except Exception as e:
+            for *_, future in batch:
+                future.set_exception(e)
+            return
+        for (*_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _run_recognize(self, model, batch):
+        if not batch:
+            return
+        from ocr_engine import recognize_crops
+
+        crops = [crop for _, item_crops, _, _ in batch for crop in item_crops]
+        metrics.inc("ocr_rec_batches")
+        try:
+            rec_res = recognize_crops(model, crops)
+        except Exception as e:
+            for *_, future in batch:
+                future.set_exception(e)
+            return
+        offset = 0
+        for _, item_crops, _, future in batch:
+            future.set_result([[text, float(score)] for text, score in rec_res[offset:offset + len(item_crops)]])
+            offset += len(item_crops)
+
+    def _worker(self, model):
+        while True:
+            batch = self._collect()
+            self._run_pages(model, [item for item in batch if item[0] == "ocr"])
+            self._run_recognize(model, [item for item in batch if item[0] == "rec"])
+
+
+class OCRRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # Satu koneksi bisa dipakai berulang oleh client (persistent)
+        attachments = PageAttachments()
+        try:
+            self._serve(attachments)
+        finally:
+            attachments.close()
+
+    def _serve(self, attachments):
+        while True:
+            try:
+                header = recv_message(self.request)
+                if "rec_shapes" in header:
+                    crops = recv_crops(self.request, header)
+                elif "shm" not in header:
+                    image_np = recv_image(self.request, header)
+            except (ConnectionError, OSError):
+                return
+            if "rec_shapes" in header:
+                try:
+                    result = self.server.batcher.submit_recognize(crops).result()
+                    send_message(self.request, {"result": result})
+                except Exception as e:
+                    send_message(self.request, {"error": str(e)})
+                continue
+            if "shm" in header:
+                try:
+                    image_np = attachments.view(header)
+                except OSError as e:
+                    # Mis. client di container lain tanpa /dev/shm bersama
+                    send_message(self.request, {"error": f"shared memory tidak tersedia: {e}", "shm_unavailable": True})
+                    continue
+            try:
+                result = self.server.batcher.submit(image_np, header.get("det_scale", 1.0)).result()
+                send_message(self.request, {"result": result})
+            except Exception as e:
+                send_message(self.request, {"error": str(e)})
+
+
+class OCRServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path=OCR_SERVER_SOCKET):
+    from invoice_pipeline import create_ocr_model
+    from thread_tuning import ensure_tuning, tuned_pool_size
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    ensure_tuning()
+    models = [create_ocr_model() for _ in range(tuned_pool_size())]
+    from ocr_engine import heavy_model_available
+    heavy_model_available()
+    server = OCRServer(socket_path, OCRRequestHandler)
+    server.batcher = OCRBatcher(models)
+    os.chmod(socket_path, 0o660)
+    metrics.start_metrics_server()
+    print(f"OCR model server berjalan di {socket_path} ({len(models)} model, batch {OCR_BATCH_SIZE})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+
+
+# --- Client ---
+class OCRServerClient:
+    # Antarmuka sama dengan OCRModelPool.ocr(); satu koneksi persisten per thread
+    def __init__(self, socket_path=OCR_SERVER_SOCKET, timeout=OCR_CLIENT_TIMEOUT, transport=OCR_PAGE_TRANSPORT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.transport = transport
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _request(self, image_np, det_scale):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = self._local.sock = self._connect()
+        # Jangan menunggu server melewati deadline dokumen/tahap yang sedang berjalan
+        check_cancelled()
+        sock.settimeout(max(remaining(self.timeout), 0.01))
+        if self.transport != "shm":
+            header = {"shape": list(image_np.shape), "dtype": image_np.dtype.str, "det_scale": det_scale}
+            send_message(sock, header, memoryview(image_np).cast("B"))
+            return recv_message(sock)
+        # Halaman dipegang sampai server menjawab (atau koneksi putus)
+        with get_page_pool().put(image_np) as page:
+            send_message(sock, dict(page.descriptor, det_scale=det_scale))
+            return recv_message(sock)
+
+    def _retrying(self, request):
+        try:
+            return request()
+        except (ConnectionError, OSError):
+            # Server restart: buang koneksi lama dan coba sekali lagi (kecuali
+            # deadline sudah lewat; jawaban lama di koneksi itu ikut dibuang)
+            self.close()
+            check_cancelled()
+            return request()
+
+    def ocr(self, image_np, det_scale=1.0):
+        image_np = np.ascontiguousarray(image_np)
+        response = self._retrying(lambda: self._request(image_np, det_scale))
+        if response.get("shm_unavailable"):
+            self.transport = "socket"
+            response = self._request(image_np, det_scale)
+        if "error" in response:
+            raise RuntimeError(f"OCR server error: {response['error']}")
+        return response["result"]
+
+    def _request_recognize(self, crops):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = self._local.sock = self._connect()
+        check_cancelled()
+        sock.settimeout(max(remaining(self.timeout), 0.01))
+        # Crop baris kecil, cukup dikirim lewat socket
+        header = {"rec_shapes": [list(crop.shape) for crop in crops], "dtype": np.dtype(np.uint8).str}
+        send_message(sock, header, b"".join(memoryview(crop).cast("B") for crop in crops))
+        return recv_message(sock)
+
+    def recognize(self, crops):
+        # Antarmuka sama dengan OCRModelPool.recognize()
+        if not crops:
+            return []
+        crops = [np.ascontiguousarray(crop, dtype=np.uint8) for crop in crops]
+        response = self._retrying(lambda: self._request_recognize(crops))
+        if "error" in response:
+            raise RuntimeError(f"OCR server error: {response['error']}")
+        return [tuple(item) for item in response["result"]]
+
+    def close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,429 @@
+import os
+import re
+import math
+import threading
+import time
+import subprocess
+from io import BytesIO
+from contextlib import contextmanager
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+from pdf2image import convert_from_bytes, pdfinfo_from_bytes
+from pdf2image.exceptions import PDFPopplerTimeoutError
+import metrics
+from cancellation import Cancelled, check_cancelled, current_token, remaining
+
+# Rasterisasi dokumen (PDF atau gambar JPEG/PNG/TIFF) per halaman dengan
+# anggaran sumber daya. Untuk PDF, ukuran setiap halaman dibaca dengan pdfinfo
+# lalu dibuat rencana render: DPI normal, DPI diturunkan (downscale), atau
+# dipotong menjadi beberapa tile bila downscale membuat teks terlalu kecil.
+# Gambar dibaca langsung (tiap frame TIFF = satu halaman); JPEG didekode dalam
+# draft mode pada ukuran yang sudah diperkecil bila skala OCR < 1.
+# Halaman diproses satu per satu sehingga memori tidak tumbuh dengan jumlah halaman.
+# Output PPM pdftoppm dibaca langsung ke array numpy (tanpa objek PIL) dan
+# resize ke skala OCR ditulis ke buffer yang dipakai ulang antar halaman.
+# Sebelum OCR, thumbnail halaman dipakai untuk melewati halaman kosong dan
+# memotong halaman ke area berisi tinta (box OCR dipetakan balik ke halaman).
+# Setiap panggilan poppler (pdfinfo, pdftoppm) dibatasi sisa deadline dokumen
+# (cancellation.py) dan paling lama POPPLER_TIMEOUT; pdftoppm yang sedang
+# merender dimatikan watchdog begitu token dibatalkan atau deadline lewat.
+
+RENDER_DPI = 200
+OCR_SCALE = 0.5
+# Gambar kecil tidak diperkecil sampai sisi terpanjang di bawah ini (~A4 100 DPI)
+IMAGE_MIN_OCR_SIDE = 1200
+# Gambar non-JPEG harus didekode penuh; di atas anggaran x faktor ini dilewati
+IMAGE_DECODE_HEADROOM = 4
+# Di bawah DPI ini halaman besar dipecah jadi tile, bukan di-downscale lagi
+MIN_RENDER_DPI = int(os.getenv("MIN_RENDER_DPI", "150"))
+# Batas per panggilan poppler bila tidak ada deadline dokumen yang lebih dekat
+POPPLER_TIMEOUT = float(os.getenv("POPPLER_TIMEOUT_SECONDS", "300"))
+POPPLER_WATCHDOG_INTERVAL = 0.2
+MAX_PAGES = int(os.getenv("MAX_PAGES", "100"))
+MAX_PAGE_PIXELS = int(os.getenv("MAX_PAGE_PIXELS", str(40_000_000)))
+MAX_DOCUMENT_RSS_MB = int(os.getenv("MAX_DOCUMENT_RSS_MB", "400"))
+# Pre-pass tinta: thumbnail sisi terpanjang PAGE_THUMBNAIL_SIDE, piksel yang
+# lebih gelap PAGE_INK_DELTA dari latar (median) dihitung sebagai tinta
+PAGE_THUMBNAIL_SIDE = 400
+PAGE_INK_DELTA = 40
+# Latar (median) segelap ini = scan gelap/terbalik; deteksi tinta tidak bisa
+# dipercaya, jadi seluruh halaman di-OCR
+PAGE_DARK_MEDIAN = int(os.getenv("PAGE_DARK_MEDIAN", "96"))
+# Halaman dengan cakupan tinta di bawah ini dianggap kosong dan dilewati
+PAGE_BLANK_INK = float(os.getenv("PAGE_BLANK_INK", "0.0005"))
+# Margin di sekitar area konten (piksel render) supaya box tepi tidak terpotong
+CONTENT_MARGIN_PX = 24
+# Perkiraan kasar: render RGB + hasil resize + array numpy + buffer model
+RSS_BYTES_PER_PIXEL = 3 * 4
+
+_PAGE_SIZE_PATTERN = re.compile(r"Page\s+(\d+)\s+size:\s+([\d.]+)\s+x\s+([\d.]+)\s+pts")
+_PAGE_ROT_PATTERN = re.compile(r"Page\s+(\d+)\s+rot:\s+(\d+)")
+
+
+class DocumentBudgetError(ValueError):
+    pass
+
+
+def detect_kind(doc_bytes):
+    head = doc_bytes[:8]
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG"):
+        return "png"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    return None
+
+
+# --- Batas Waktu Poppler ---
+def poppler_timeout():
+    # Sisa waktu untuk satu panggilan poppler; langsung gagal bila sudah dibatalkan
+    check_cancelled()
+    return max(remaining(POPPLER_TIMEOUT), 0.1)
+
+
+@contextmanager
+def poppler_deadline():
+    # Timeout poppler karena deadline dokumen/tahap dilaporkan sebagai DeadlineExceeded
+    try:
+        yield
+    except (PDFPopplerTimeoutError, subprocess.TimeoutExpired):
+        check_cancelled()
+        raise
+
+
+# --- Pre-flight ---
+def inspect_pdf(pdf_bytes, last_page=None):
+    # Jumlah halaman + ukuran (pts, sudah memperhitungkan rotasi) tiap halaman
+    with poppler_deadline():
+        page_count = pdfinfo_from_bytes(pdf_bytes, timeout=poppler_timeout())["Pages"]
+        last_page = min(page_count, last_page or page_count)
+        proc = subprocess.run(
+            ["pdfinfo", "-f", "1", "-l", str(last_page), "-"],
+            input=pdf_bytes, capture_output=True, timeout=poppler_timeout(),
+        )
+    output = proc.stdout.decode("utf-8", "ignore")
+    rotations = {int(m.group(1)): int(m.group(2)) for m in _PAGE_ROT_PATTERN.finditer(output)}
+    sizes = []
+    for m in _PAGE_SIZE_PATTERN.finditer(output):
+        page, width, height = int(m.group(1)), float(m.group(2)), float(m.group(3))
+        if rotations.get(page, 0) % 180 == 90:
+            width, height = height, width
+        sizes.append((width, height))
+    return page_count, sizes
+
+
+def page_pixel_budget():
+    rss_budget = MAX_DOCUMENT_RSS_MB * 1024 * 1024 // RSS_BYTES_PER_PIXEL
+    return min(MAX_PAGE_PIXELS, rss_budget)
+
+
+def plan_page(page_no, width_pts, height_pts, budget):
+    pixels = (width_pts * RENDER_DPI / 72) * (height_pts * RENDER_DPI / 72)
+    plan = {
+        "page": page_no, "dpi": RENDER_DPI, "scale": OCR_SCALE, "tiles": None, "limit": None,
+        "size_pts": (width_pts, height_pts),
+    }
+    if pixels <= budget:
+        return plan
+
+    # Skala OCR relatif ke RENDER_DPI, jadi halaman yang di-downscale tetap
+    # masuk OCR dengan resolusi efektif yang sama
+    dpi = int(RENDER_DPI * math.sqrt(budget / pixels))
+    if dpi >= MIN_RENDER_DPI:
+        plan["dpi"] = dpi
+        plan["scale"] = min(1.0, OCR_SCALE * RENDER_DPI / dpi)
+        plan["limit"] = f"halaman {page_no} di-downscale ke {dpi} DPI ({pixels / 1e6:.0f} MP > {budget / 1e6:.0f} MP)"
+        return plan
+
+    # Tile di MIN_RENDER_DPI; tiap tile maks. `budget` piksel, dengan overlap
+    # supaya baris teks di perbatasan tetap utuh di salah satu tile
+    dpi = MIN_RENDER_DPI
+    width_px = int(width_pts * dpi / 72)
+    height_px = int(height_pts * dpi / 72)
+    tile_px = int(math.sqrt(budget))
+    overlap = int(dpi * 0.3)
+    step = max(1, tile_px - overlap)
+    tiles = []
+    for y in range(0, height_px, step):
+        for x in range(0, width_px, step):
+            tiles.append((x, y, min(tile_px, width_px - x), min(tile_px, height_px - y)))
+            if x + tile_px >= width_px:
+                break
+        if y + tile_px >= height_px:
+            break
+    plan["dpi"] = dpi
+    plan["scale"] = min(1.0, OCR_SCALE * RENDER_DPI / dpi)
+    plan["tiles"] = tiles
+    plan["limit"] = (
+        f"halaman {page_no} dipecah menjadi {len(tiles)} tile pada {dpi} DPI "
+        f"({pixels / 1e6:.0f} MP > {budget / 1e6:.0f} MP)"
+    )
+    return plan
+
+
+def plan_image_frame(page_no, width, height, kind, budget):
+    pixels = width * height
+    scale = max(OCR_SCALE, min(1.0, IMAGE_MIN_OCR_SIDE / max(width, height)))
+    # decode_scale: resolusi terbesar yang muat anggaran (untuk OCR dua resolusi)
+    plan = {
+        "page": page_no, "scale": scale, "decode_scale": min(1.0, math.sqrt(budget / pixels)),
+        "tiles": None, "limit": None, "skip": False,
+    }
+    if kind != "jpeg" and pixels > budget * IMAGE_DECODE_HEADROOM:
+        plan["skip"] = True
+        plan["limit"] = f"gambar {page_no} dilewati ({pixels / 1e6:.0f} MP terlalu besar untuk didekode)"
+    elif pixels * scale * scale > budget:
+        plan["scale"] = math.sqrt(budget / pixels)
+        plan["limit"] = f"gambar {page_no} di-downscale ke {plan['scale']:.2f}x ({pixels / 1e6:.0f} MP)"
+    return plan
+
+
+def _plan_image(doc_bytes, kind, budget):
+    with Image.open(BytesIO(doc_bytes)) as image:
+        frame_count = getattr(image, "n_frames", 1)
+        pages = []
+        for frame in range(min(frame_count, MAX_PAGES)):
+            image.seek(frame)
+            pages.append(plan_image_frame(frame + 1, image.width, image.height, kind, budget))
+    return frame_count, pages
+
+
+def plan_document(doc_bytes):
+    kind = detect_kind(doc_bytes)
+    if kind is None:
+        raise DocumentBudgetError("Format file tidak didukung (hanya PDF, JPEG, PNG, TIFF).")
+    budget = page_pixel_budget()
+    with metrics.timed("preflight"):
+        if kind == "pdf":
+            page_count, sizes = inspect_pdf(doc_bytes, last_page=MAX_PAGES)
+            if not sizes:
+                raise DocumentBudgetError("PDF tidak bisa dibaca (ukuran halaman tidak ditemukan).")
+            pages = [plan_page(i + 1, w, h, budget) for i, (w, h) in enumerate(sizes)]
+        else:
+            page_count, pages = _plan_image(doc_bytes, kind, budget)
+    limits = [page["limit"] for page in pages if page["limit"]]
+    if page_count > MAX_PAGES:
+        limits.insert(0, f"hanya {MAX_PAGES} dari {page_count} halaman yang diproses (MAX_PAGES)")
+    if limits:
+        metrics.inc("documents_limited")
+    return {"kind": kind, "page_count": page_count, "pages": pages, "limits": limits}
+
+
+def count_pages(doc_bytes):
+    kind = detect_kind(doc_bytes)
+    if kind == "pdf":
+        with poppler_deadline():
+            return pdfinfo_from_bytes(doc_bytes, timeout=poppler_timeout())["Pages"]
+    with Image.open(BytesIO(doc_bytes)) as image:
+        return getattr(image, "n_frames", 1)
+
+
+# --- Render ---
+def _read_ppm_header(stream):
+    # Header P6: "P6 <lebar> <tinggi> <maxval>" dipisah satu whitespace
+    tokens, token = [], b""
+    while len(tokens) < 4:
+        char = stream.read(1)
+        if not char:
+            raise RuntimeError("Output pdftoppm terpotong (header PPM tidak lengkap).")
+        if char.isspace():
+            if token:
+                tokens.append(token)
+                token = b""
+        else:
+            token += char
+    if tokens[0] != b"P6" or tokens[3] != b"255":
+        raise RuntimeError(f"Format PPM tidak didukung: {b' '.join(tokens).decode('ascii', 'ignore')}")
+    return int(tokens[1]), int(tokens[2])
+
+
+def render_region(pdf_bytes, page_no, dpi, region=None):
+    # Render satu halaman/tile ke array RGB (tinggi, lebar, 3) uint8. Piksel
+    # dibaca dari pipe langsung ke memori array (readinto), tanpa salinan antara.
+    cmd = ["pdftoppm", "-r", str(dpi), "-f", str(page_no), "-l", str(page_no)]
+    if region:
+        x, y, w, h = region
+        cmd += ["-x", str(x), "-y", str(y), "-W", str(w), "-H", str(h)]
+    timeout = poppler_timeout()
+    token = current_token()
+    proc = subprocess.Popen(cmd + ["-"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    done = threading.Event()
+
+    def watchdog():
+        # readinto di bawah memblokir tanpa timeout: pdftoppm dimatikan dari sini
+        # bila token dibatalkan, deadline lewat, atau POPPLER_TIMEOUT habis
+        give_up_at = time.monotonic() + timeout
+        while not done.wait(POPPLER_WATCHDOG_INTERVAL):
+            try:
+                if token is not None:
+                    token.check()
+            except Cancelled:
+                break
+            if time.monotonic() >= give_up_at:
+                break
+        else:
+            return
+        metrics.inc("render_killed")
+        proc.kill()
+
+    def feed():
+        try:
+            proc.stdin.write(pdf_bytes)
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    writer = threading.Thread(target=feed, daemon=True)
+    writer.start()
+    threading.Thread(target=watchdog, daemon=True, name="pdftoppm-watchdog").start()
+    try:
+        width, height = _read_ppm_header(proc.stdout)
+        page = np.empty((height, width, 3), dtype=np.uint8)
+        view = memoryview(page).cast("B")
+        filled = 0
+        while filled < len(view):
+            count = proc.stdout.readinto(view[filled:])
+            if not count:
+                raise RuntimeError(f"Output pdftoppm terpotong pada halaman {page_no}.")
+            filled += count
+        metrics.inc("page_bytes_read", filled)
+    except RuntimeError as e:
+        done.set()
+        proc.kill()
+        proc.wait()
+        # Dimatikan watchdog karena pembatalan/deadline: laporkan sebagai itu
+        check_cancelled()
+        stderr = proc.stderr.read().decode("utf-8", "ignore")
+        raise RuntimeError(f"pdftoppm gagal pada halaman {page_no}: {stderr or e}")
+    finally:
+        done.set()
+        writer.join()
+    proc.stdout.close()
+    stderr = proc.stderr.read()
+    proc.stderr.close()
+    if proc.wait(timeout=POPPLER_TIMEOUT) != 0:
+        raise RuntimeError(f"pdftoppm gagal pada halaman {page_no}: {stderr.decode('utf-8', 'ignore')}")
+    return page
+
+
+class ResizeBuffer:
+    # Buffer keluaran resize yang dipakai ulang antar halaman; hanya dialokasi
+    # ulang bila halaman berikutnya lebih besar. Array hasil resize() hanya
+    # valid sampai pemanggilan resize() berikutnya.
+    def __init__(self):
+        self._buffer = np.empty(0, dtype=np.uint8)
+
+    @property
+    def nbytes(self):
+        return self._buffer.nbytes
+
+    def resize(self, page, scale):
+        if scale >= 1:
+            return page
+        height, width = page.shape[:2]
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        needed = size[0] * size[1] * 3
+        if self._buffer.size < needed:
+            self._buffer = np.empty(needed, dtype=np.uint8)
+            metrics.inc("resize_buffer_allocs")
+        out = self._buffer[:needed].reshape(size[1], size[0], 3)
+        cv2.resize(page, size, dst=out, interpolation=cv2.INTER_AREA)
+        return out
+
+
+def find_content_region(page):
+    # (x0, y0, x1, y1) area berisi tinta dalam koordinat halaman, atau None bila kosong
+    height, width = page.shape[:2]
+    factor = min(1.0, PAGE_THUMBNAIL_SIDE / max(height, width))
+    thumb = page
+    if factor < 1:
+        thumb = cv2.resize(page, (max(1, round(width * factor)), max(1, round(height * factor))), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(thumb, cv2.COLOR_RGB2GRAY) if thumb.ndim == 3 else thumb
+    median = int(np.median(gray))
+    if median < PAGE_DARK_MEDIAN:
+        metrics.inc("pages_dark")
+        return 0, 0, width, height
+    ink = gray < median - PAGE_INK_DELTA
+    if ink.mean() < PAGE_BLANK_INK:
+        return None
+    # Baris/kolom dengan satu titik tinta saja dianggap noise scan
+    rows = np.flatnonzero(ink.sum(axis=1) >= 2)
+    cols = np.flatnonzero(ink.sum(axis=0) >= 2)
+    if not rows.size or not cols.size:
+        return 0, 0, width, height
+    return (
+        max(0, int(cols[0] / factor) - CONTENT_MARGIN_PX),
+        max(0, int(rows[0] / factor) - CONTENT_MARGIN_PX),
+        min(width, math.ceil((cols[-1] + 1) / factor) + CONTENT_MARGIN_PX),
+        min(height, math.ceil((rows[-1] + 1) / factor) + CONTENT_MARGIN_PX),
+    )
+
+
+def shift_lines(lines, dx, dy, factor=1.0):
+    # Pindahkan box hasil OCR dari frame crop (diskalakan `factor`) ke frame halaman
+    if not dx and not dy and factor == 1:
+        return lines
+    return [[[[x * factor + dx, y * factor + dy] for x, y in box], text_score] for box, text_score in lines]
+
+
+def decode_image_frame(image, frame, scale):
+    # Dekode satu frame; JPEG memakai draft mode (skala 1/2, 1/4, 1/8 di decoder).
+    # Kembalikan (gambar RGB, sisa skala yang masih perlu di-resize)
+    image.seek(frame)
+    full_width = image.width
+    if image.format == "JPEG" and scale < 1:
+        image.draft("RGB", (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+        metrics.inc("jpeg_draft_decodes")
+    decoded = ImageOps.exif_transpose(image.convert("RGB"))
+    remaining = scale * full_width / image.width
+    return decoded, remaining
+
+
+def iter_page_images(doc_bytes, plan, full_resolution=False):
+    # Yield (nomor_halaman, array RGB, skala_OCR, tile) satu per satu; halaman
+    # ber-tile menghasilkan beberapa gambar (tile = (x, y, w, h) piksel render).
+    # full_resolution: gambar didekode sebesar anggaran, bukan sebesar skala OCR
+    if plan.get("kind", "pdf") != "pdf":
+        with Image.open(BytesIO(doc_bytes)) as image:
+            for page in plan["pages"]:
+                if page["skip"]:
+                    continue
+                decode_scale = page["decode_scale"] if full_resolution else page["scale"]
+                with metrics.timed("rasterize"):
+                    decoded, remaining = decode_image_frame(image, page["page"] - 1, decode_scale)
+                    array = np.asarray(decoded)
+                yield page["page"], array, min(1.0, remaining * page["scale"] / decode_scale), None
+        return
+
+    for page in plan["pages"]:
+        for tile in page["tiles"] or [None]:
+            with metrics.timed("rasterize"):
+                array = render_region(doc_bytes, page["page"], page["dpi"], tile)
+            yield page["page"], array, page["scale"], tile
+
+
+def iter_thumbnails(doc_bytes, dpi):
+    # Thumbnail grayscale murah per halaman (untuk hash duplikat)
+    if detect_kind(doc_bytes) == "pdf":
+        with poppler_deadline():
+            thumbnails = convert_from_bytes(doc_bytes, dpi=dpi, grayscale=True, last_page=MAX_PAGES, timeout=poppler_timeout())
+        yield from thumbnails
+        return
+    with Image.open(BytesIO(doc_bytes)) as image:
+        for frame in range(min(getattr(image, "n_frames", 1), MAX_PAGES)):
+            image.seek(frame)
+            # Sisi terpanjang ~ A4 pada `dpi`
+            target = dpi * 11.7 / max(image.size)
+            if image.format == "JPEG" and target < 1:
+                image.draft("L", (math.ceil(image.width * target), math.ceil(image.height * target)))
+            thumbnail = ImageOps.exif_transpose(image.convert("L"))
+            thumbnail.thumbnail((int(dpi * 11.7), int(dpi * 11.7)))
+            yield thumbnail
@@ -0,0 +1,186 @@
+import os
+import uuid
+import atexit
+import threading
+from collections import OrderedDict
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+import metrics
+
+# Transport halaman antar proses lewat shared memory: pengirim (client OCR,
+# rasterizer) menyalin halaman ke segmen dari pool yang dipakai ulang dan hanya
+# mengirim deskriptor kecil {"shm", "shape", "dtype"}; penerima memetakan
+# segmen yang sama tanpa menyalin byte lewat socket/pipe.
+#
+# Segmen dimiliki proses pengirim. Setiap halaman dipinjam dengan reference
+# count dan kembali ke pool begitu semua pemegang memanggil release(); bila
+# proses penerima crash, pengirim melihat koneksi putus dan tetap me-release.
+# Saat proses pengirim keluar semua segmen di-unlink (atexit + resource_tracker).
+
+PAGE_SHM_SEGMENTS = int(os.getenv("PAGE_SHM_SEGMENTS", "8"))
+PAGE_SHM_MIN_MB = float(os.getenv("PAGE_SHM_MIN_MB", "8"))
+
+
+class SharedPage:
+    # Satu halaman di segmen shared memory; kembali ke pool saat refcount 0
+    def __init__(self, pool, segment, shape, dtype):
+        self._pool = pool
+        self._segment = segment
+        self._refs = 1
+        self._lock = threading.Lock()
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def descriptor(self):
+        return {"shm": self._segment.name, "shape": list(self.shape), "dtype": self.dtype.str}
+
+    @property
+    def array(self):
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=self._segment.buf)
+
+    def retain(self):
+        with self._lock:
+            if self._refs <= 0:
+                raise RuntimeError("Halaman shared memory sudah dilepas.")
+            self._refs += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            self._refs -= 1
+            done = self._refs == 0
+        if done:
+            self._pool._return(self._segment)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class SharedPagePool:
+    # Maks. max_segments segmen; segmen bebas dipakai ulang bila cukup besar,
+    # segmen terkecil diganti bila halaman lebih besar dari semua segmen bebas
+    def __init__(self, max_segments=PAGE_SHM_SEGMENTS, min_bytes=int(PAGE_SHM_MIN_MB * 1024 * 1024)):
+        self.max_segments = max(1, max_segments)
+        self.min_bytes = min_bytes
+        self._free = []
+        self._in_use = set()
+        self._cond = threading.Condition()
+        self._closed = False
+        metrics.set_gauge("page_shm_segments", lambda: len(self._free) + len(self._in_use))
+        metrics.set_gauge("page_shm_in_use", lambda: len(self._in_use))
+        atexit.register(self.close)
+
+    def _create(self, nbytes):
+        size = max(nbytes, self.min_bytes)
+        metrics.inc("page_shm_created")
+        return shared_memory.SharedMemory(name=f"ocrpage_{uuid.uuid4().hex[:16]}", create=True, size=size)
+
+    @staticmethod
+    def _destroy(segment):
+        segment.close()
+        segment.unlink()
+
+    def _take(self, nbytes):
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Pool shared memory sudah ditutup.")
+                fitting = [segment for segment in self._free if segment.size >= nbytes]
+                if fitting:
+                    segment = min(fitting, key=lambda s: s.size)
+                    self._free.remove(segment)
+                    break
+                if len(self._free) + len(self._in_use) < self.max_segments:
+                    segment = self._create(nbytes)
+                    break
+                if self._free:
+                    # Semua segmen bebas terlalu kecil: ganti yang terkecil
+                    self._destroy(self._free.pop(self._free.index(min(self._free, key=lambda s: s.size))))
+                    segment = self._create(nbytes)
+                    break
+                metrics.inc("page_shm_waits")
+                self._cond.wait()
+            self._in_use.add(segment)
+            return segment
+
+    def put(self, array):
+        # Salin halaman ke segmen pool (satu salinan memori, tanpa serialisasi)
+        array = np.ascontiguousarray(array)
+        segment = self._take(array.nbytes)
+        page = SharedPage(self, segment, array.shape, array.dtype)
+        page.array[...] = array
+        metrics.inc("page_shm_bytes", array.nbytes)
+        return page
+
+    def _return(self, segment):
+        with self._cond:
+            self._in_use.discard(segment)
+            if self._closed:
+                self._destroy(segment)
+            else:
+                self._free.append(segment)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            for segment in self._free:
+                self._destroy(segment)
+            self._free = []
+            self._cond.notify_all()
+
+
+def _attach(name):
+    segment = shared_memory.SharedMemory(name=name)
+    # Python < 3.13 mendaftarkan segmen yang hanya di-attach ke resource_tracker,
+    # yang lalu meng-unlink segmen milik pengirim saat penerima keluar
+    try:
+        resource_tracker.unregister(segment._name, "shared_memory")
+    except Exception:
+        pass
+    return segment
+
+
+class PageAttachments:
+    # Cache segmen yang sudah dipetakan penerima (per koneksi), supaya segmen
+    # pool yang dipakai ulang tidak di-attach ulang per halaman
+    def __init__(self, max_segments=PAGE_SHM_SEGMENTS * 2):
+        self.max_segments = max_segments
+        self._segments = OrderedDict()
+
+    def view(self, descriptor):
+        name = descriptor["shm"]
+        segment = self._segments.pop(name, None) or _attach(name)
+        self._segments[name] = segment
+        while len(self._segments) > self.max_segments:
+            self._close(self._segments.popitem(last=False)[1])
+        return np.ndarray(descriptor["shape"], dtype=np.dtype(descriptor["dtype"]), buffer=segment.buf)
+
+    @staticmethod
+    def _close(segment):
+        try:
+            segment.close()
+        except BufferError:
+            # Masih ada view numpy yang hidup; mapping dilepas saat view di-GC
+            pass
+
+    def close(self):
+        for segment in self._segments.values():
+            self._close(segment)
+        self._segments.clear()
+
+
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+
+def get_page_pool():
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            _page_pool = SharedPagePool()
+        return _page_pool
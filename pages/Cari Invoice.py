@@ -0,0 +1,62 @@
+import streamlit as st
+from datetime import datetime
+from results_store import get_results_store
+from invoice_pipeline import save_to_excel
+
+st.title("🔎 Cari Invoice yang Sudah Diproses")
+
+store = get_results_store()
+
+col1, col2, col3 = st.columns(3)
+invoice_no = col1.text_input("Nomor Invoice")
+seller = col2.text_input("Nama Seller (awalan)")
+npwp = col3.text_input("NPWP Seller")
+
+col4, col5 = st.columns(2)
+date_from = col4.date_input("Tanggal invoice dari", value=None)
+date_to = col5.date_input("Tanggal invoice sampai", value=None)
+
+invoices = store.search(
+    invoice_no=invoice_no,
+    seller=seller,
+    npwp=npwp,
+    date_from=date_from.isoformat() if date_from else None,
+    date_to=date_to.isoformat() if date_to else None,
+)
+
+if not invoices:
+    st.info("Tidak ada invoice yang cocok.")
+else:
+    st.caption(f"{len(invoices)} invoice ditemukan")
+    st.dataframe(
+        [
+            {
+                "ID": inv["id"],
+                "No. Invoice": (inv["data"].get("invoice_details") or {}).get("invoice_no"),
+                "Seller": (inv["data"].get("seller_identity") or {}).get("company_name"),
+                "NPWP": (inv["data"].get("seller_identity") or {}).get("company_npwp_tin"),
+                "Tanggal": inv["invoice_date"],
+                "Total": inv["data"].get("invoice_total"),
+                "File": inv["file_name"],
+                "Diproses": datetime.fromtimestamp(inv["created_at"]).strftime("%Y-%m-%d %H:%M"),
+            }
+            for inv in invoices
+        ],
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    # --- Detail satu invoice ---
+    selected_id = st.selectbox("Lihat detail invoice (ID)", [inv["id"] for inv in invoices])
+    selected = next(inv for inv in invoices if inv["id"] == selected_id)
+    st.subheader("🧾 Hasil JSON Terstruktur:")
+    st.json(selected["data"])
+    st.subheader("🧮 Perhitungan Tambahan")
+    st.json(selected["calculation"])
+    st.download_button(
+        label="📥 Download File Excel",
+        data=save_to_excel(selected["data"], selected["calculation"]),
+        file_name=f"invoice_data_{selected_id}.xlsx",
+        mime="application/vnd.ms-excel",
+        key=f"download_search_{selected_id}"
+    )
@@ -1,328 +1,309 @@
 import streamlit as st
-from paddleocr import PaddleOCR, draw_ocr
-from pdf2image import convert_from_bytes
-from PIL import Image
-import numpy as np
-import os
-import json
-import pandas as pd
+import math
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
 from io import BytesIO
-from dotenv import load_dotenv
-from openai import OpenAI
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-
-# Load .env (for OpenAI API key)
-load_dotenv()
-
-# Konfigurasi path
-POPPLER_PATH = r"C:\Program Files\poppler-24.07.0\Library\bin"
-# FONT_PATH = "C:/Windows/Fonts/arial.ttf"
-FONT_PATH = os.path.join(os.path.dirname(__file__), "..", "fonts", "arial.ttf")
-
-
-# OpenAI API Key
-api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=api_key) if api_key else None
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from archive_ingest import count_uploaded_documents, iter_uploaded_documents
+from cancellation import CancelToken, Cancelled, DeadlineExceeded
+from invoice_pipeline import (
+    excel_file_name, get_ocr_pool, model_status, process_invoice, save_to_excel, start_model_warmup, write_excel_zip
+)
+import metrics
+from profiling import profile_run
 
 # --- Optimasi PaddleOCR ---
+# Pool model dibagi dengan semua sesi (dan dengan api_server.py bila satu proses).
+# Model dimuat di thread background supaya UI langsung tampil.
 @st.cache_resource
 def load_ocr_model():
-    return PaddleOCR(
-        use_angle_cls=False,
-        det_model_dir='models/en_PP-OCRv3_det_infer',
-        rec_model_dir='models/en_PP-OCRv3_rec_infer',
-        use_gpu=False,
-        lang='en'
-    )
+    return start_model_warmup()
 
-# cls_model_dir='models/ch_ppocr_mobile_v2.0_cls_infer',
-
-ocr = load_ocr_model()
-
-def resize_image(image_pil, scale=0.5):
-    w, h = image_pil.size
-    return image_pil.resize((int(w * scale), int(h * scale)))
-
-@st.cache_data(show_spinner="🔍 Menjalankan OCR...")
-def run_ocr_cached(image_np):
-    return ocr.ocr(image_np, cls=False)
+load_ocr_model()
 
-def extract_text_with_paddleocr(pdf_file):
-    images = convert_from_bytes(pdf_file.read())
-    extracted_text = ""
-    for image in images:
-        image = resize_image(image, scale=0.5)
-        image_np = np.array(image)
-        result = run_ocr_cached(image_np)
+# Endpoint /metrics untuk proses Streamlit (aktif bila METRICS_PORT di-set)
+@st.cache_resource
+def start_metrics_server():
+    return metrics.start_metrics_server()
 
-        boxes = [line[0] for line in result[0]]
-        txts = [line[1][0] for line in result[0]]
-        scores = [line[1][1] for line in result[0]]
+start_metrics_server()
 
-        annotated_image = draw_ocr(image_np, boxes, txts, scores, font_path=FONT_PATH)
-        extracted_text += "\n".join(txts) + "\n"
+_ocr_cache_state = threading.local()
 
-    return extracted_text
+@st.cache_data(show_spinner="🔍 Menjalankan OCR...")
+def run_ocr_cached(image_np, det_scale=1.0):
+    _ocr_cache_state.miss = True
+    return get_ocr_pool().ocr(image_np, det_scale=det_scale)
+
+def summary_row(result):
+    data = result["data"]
+    calculation = result.get("calculation") or {}
+    invoice_details = data.get("invoice_details") or {}
+    return {
+        "Invoice": result["idx"],
+        "File": result["file_name"],
+        "Seller": (data.get("seller_identity") or {}).get("company_name", ""),
+        "Invoice No": invoice_details.get("invoice_no", ""),
+        "Invoice Date": invoice_details.get("invoice_date", ""),
+        "Invoice Total": data.get("invoice_total", ""),
+        "Currency": data.get("currency", ""),
+        "DPP": calculation.get("dpp", ""),
+        "PPN 11%": calculation.get("ppn_11_persen", ""),
+        "Status": data.get("error", "OK"),
+    }
+
+def build_excel_zip(results):
+    # st.download_button butuh bytes utuh, jadi ZIP memang dibangun di memori;
+    # yang dihemat hanya workbook: ditulis ke arsip satu per satu (write_excel_zip)
+    return write_excel_zip(results, BytesIO()).getvalue()
+
+def run_document(work, token, progress, value, text, profiler=None):
+    # OCR + LLM berjalan di thread pekerja; thread script hanya memperbarui progress.
+    # Rerun (klik ulang, daftar upload berubah) atau tab ditutup menghentikan thread
+    # script di pemanggilan st.* berikutnya -> token dibatalkan, pekerja berhenti
+    # di titik aman berikutnya (antar halaman / sebelum LLM).
+    script_ctx = get_script_run_ctx()
+    context = contextvars.copy_context()
+
+    def target():
+        add_script_run_ctx(threading.current_thread(), script_ctx)
+        if profiler:
+            profiler.add_thread()
+        return context.run(work)
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="invoice-doc")
+    future = executor.submit(target)
+    start = time.monotonic()
+    try:
+        while not wait([future], timeout=0.5).done:
+            progress.progress(value, text=f"{text} ({time.monotonic() - start:.0f} dtk)")
+    except BaseException:
+        token.cancel("Run dihentikan (rerun atau sesi ditutup).")
+        raise
+    finally:
+        executor.shutdown(wait=False)
+    return future.result()
+
+def run_ocr_page(image_np, det_scale=1.0):
+    _ocr_cache_state.miss = False
+    result = run_ocr_cached(image_np, det_scale)
+    metrics.inc("ocr_cache_misses" if _ocr_cache_state.miss else "ocr_cache_hits")
+    return result
+
+# Ringkasan hasil ditampilkan per halaman tabel; detail & Excel hanya untuk invoice yang dipilih
+RESULTS_PAGE_SIZE = 25
+
+DUPLICATE_KINDS = {
+    "exact": "file persis sama",
+    "near": "scan ulang",
+    "invoice": "nomor invoice & seller sama",
+    "possible_invoice": "nomor invoice & seller muncul di teks (belum pasti)",
+}
 
 
 # Streamlit UI
 st.title("🔍 Smart Invoice OCR - PaddleOCR + OpenAI")
-uploaded_file = st.file_uploader("📄 Upload file PDF Invoice", type="pdf", accept_multiple_files=True)
-
-# --- Fungsi Ekstraksi Teks dari PaddleOCR ---
-# def extract_text_with_paddleocr(pdf_file):
-#     images = convert_from_bytes(pdf_file.read())
-#     extracted_text = ""
-#     for idx, image in enumerate(images):
-#         # st.subheader(f"🖼️ Halaman {idx + 1}")
-#         # st.image(image, caption="Gambar Asli", use_container_width=True)
-#         image_np = np.array(image)
-#         result = ocr.ocr(image_np, cls=True)
-
-#         boxes = [line[0] for line in result[0]]
-#         txts = [line[1][0] for line in result[0]]
-#         scores = [line[1][1] for line in result[0]]
-
-#         annotated_image = draw_ocr(image_np, boxes, txts, scores, font_path=FONT_PATH)
-#         annotated_image = Image.fromarray(annotated_image)
-#         # st.image(annotated_image, caption="🔎 Hasil Deteksi OCR")
-
-#         extracted_text += "\n".join(txts) + "\n"
-
-#     return extracted_text
-
-# --- Fungsi Strukturkan JSON dari OpenAI ---
-def structure_invoice_data(extracted_text):
-    if not client:
-        return {"error": "OpenAI API key belum dikonfigurasi."}
-
-    prompt = f"""
-    You are a financial assistant. Based on the following extracted invoice text, convert it into a clean and structured JSON format.
-    Extract structured data from the invoice document using the following rules and output it strictly in the provided JSON format.
-
-    RULES:
-    - Fields marked as "mandatory" must always be filled based on the content found in the invoice.
-    - Fields marked as "not mandatory" must ONLY be filled if the exact information is found in the document. If not available, set them to `null`.
-    - DO NOT guess, infer, or hallucinate values that are not explicitly stated in the document.
-    - Use proper data types: strings for text, integers for amounts, ISO 8601 format (YYYY-MM-DD) for dates.
-    - Show all readable items
-    - Return ONLY a valid JSON object, no explanation or surrounding text.
-
-    JSON FORMAT:
-    {{
-    "seller_identity": {{
-        "company_name": "...",
-        "address": "...",
-        "email_address": "...",
-        "phone": "... or null",
-        "company_npwp_tin": "... or null"
-    }},
-    "buyer_identity": {{
-        "company_name": "...",
-        "address": "...",
-        "email_address": "...",
-        "phone": "... or null",
-        "company_npwp_tin": "... or null",
-        "attention": "... or null"
-    }},
-    "invoice_details": {{
-        "invoice_no": "...",
-        "invoice_date": "...",
-        "order_po_number": "... or null",
-        "term_of_payment_due_date": "... or null"
-    }},
-    "item_details": [
-        {{
-        "item_description": "...",
-        "quantity": ...,
-        "unit_price": ...,
-        "amount": ...
-        }}
-    ],
-    "subtotal_invoice": ...,
-    "discount": ... or null,
-    "vat": ... or null,
-    "invoice_total": ...,
-    "bank_details": {{
-        "account_no": "...",
-        "account_name": "...",
-        "beneficiary_bank": "...",
-        "branch": "... or null",
-        "swift_code": "... or null"
-    }},
-    "currency": "IDR"
-    }}
-
-    Invoice Text:
-    \"\"\"{extracted_text}\"\"\"
-    """
-
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are an assistant that extracts information from Invoice."},
-            {"role": "user", "content": prompt}
-        ]
-    )
-
-    structured_data = response.choices[0].message.content.strip()
-    try:
-        return json.loads(structured_data)
-    except json.JSONDecodeError:
-        return {"error": "❌ Gagal parsing JSON dari LLM."}
-
-# --- Fungsi Perhitungan Tambahan (DPP, VAT) ---
-def calculate_invoice_fields(data):
-    try:
-        subtotal = data.get("subtotal_invoice", 0)
-        vat = data.get("vat", None)
-        # discount = data.get("discount", 0)
-
-        # Jika discount tidak valid (misalnya None), jadikan 0
-        # if discount is None:
-        #     discount = 0
-
-        # Hitung subtotal setelah diskon
-        after_discount = subtotal
-        # after_discount = max(after_discount, 0)  # Hindari negatif
-        dpp = round((100 / 111) * after_discount, 2)
-        calculated_vat = round(0.11 * dpp, 2)
-
-        return {
-            "subtotal_sebelum_diskon": subtotal,
-            # "diskon": discount,
-            # "subtotal_setelah_diskon": after_discount,
-            "dpp": dpp,
-            "ppn_11_persen": calculated_vat
-        }
-    except Exception as e:
-        return {"error": f"Gagal menghitung: {str(e)}"}
-
-
-def save_to_excel(structured_invoice_data, calculated_fields):
-    output = BytesIO()
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Invoice"
-
-    seller_identity = structured_invoice_data.get("seller_identity", {})
-    buyer_identity = structured_invoice_data.get("buyer_identity", {})
-    invoice_details = structured_invoice_data.get("invoice_details", {})
-    item_details = structured_invoice_data.get("item_details", [])
-    subtotal_invoice = structured_invoice_data.get("subtotal_invoice", "")
-    discount = structured_invoice_data.get("discount", "")
-    vat = structured_invoice_data.get("vat", "")
-    invoice_total = structured_invoice_data.get("invoice_total", "")
-    currency = structured_invoice_data.get("currency", "")
-    bank_details = structured_invoice_data.get("bank_details", {})
-    
-
-    ws.append(["Seller Identity"])
-    ws.append(["Company Name", seller_identity.get("company_name", "")])
-    ws.append(["Address", seller_identity.get("address", "")])
-    ws.append(["Email Address", seller_identity.get("email_address", "")])
-    ws.append(["Phone", seller_identity.get("phone", "")])
-    ws.append(["Company NPWP/TIN", seller_identity.get("company_npwp_tin", "")])
-    ws.append([])
-
-    ws.append(["Buyer Identity"])
-    ws.append(["Company Name", buyer_identity.get("company_name", "")])
-    ws.append(["Address", buyer_identity.get("address", "")])
-    ws.append(["Email Address", buyer_identity.get("email_address", "")])
-    ws.append(["Phone", buyer_identity.get("phone", "")])
-    ws.append(["Company NPWP/TIN", buyer_identity.get("company_npwp_tin", "")])
-    ws.append(["Attention", buyer_identity.get("attention", "")])
-    ws.append([])
-
-    ws.append(["Invoice Details"])
-    ws.append(["Invoice No", invoice_details.get("invoice_no", "")])
-    ws.append(["Invoice Date", invoice_details.get("invoice_date", "")])
-    ws.append(["Order/PO Number", invoice_details.get("order_po_number", "")])
-    ws.append(["Term of Payment/Due Date", invoice_details.get("term_of_payment_due_date", "")])
-    ws.append([])
-
-    if item_details:
-        ws.append(["item_details"])
-        item_df = pd.DataFrame(item_details)
-        for row in dataframe_to_rows(item_df, index=False, header=True):
-            ws.append(row)
-        ws.append([])
-
-    ws.append(["Subtotal Invoice", subtotal_invoice])
-    ws.append(["Discount", discount])
-    ws.append(["VAT", vat])
-    ws.append(["Invoice Total", invoice_total])
-    ws.append(["Currency", currency])
-
-    ws.append(["Bank Details"])
-    ws.append(["Account No", bank_details.get("account_no", "")])
-    ws.append(["Account Name", bank_details.get("account_name", "")])
-    ws.append(["Benecifiary Bank", bank_details.get("beneficiary_bank", "")])
-    ws.append(["Branch", bank_details.get("branch", "")])
-    ws.append(["SWIFT Code", bank_details.get("swift_code", "")])
-    ws.append([])
-
-    
-
-    wb.save(output)
-    output.seek(0)
-    return output
+status = model_status()
+if status["status"] == "ready":
+    st.caption(f"🟢 Model OCR siap (muat {status['load_seconds']:.1f} dtk, warm-up {status['warmup_seconds']:.1f} dtk)")
+elif status["status"] == "error":
+    st.error(f"🔴 Model OCR gagal dimuat: {status['error']}")
+else:
+    st.caption("🟡 Model OCR sedang dimuat di background; OCR pertama akan menunggu sampai model siap.")
+uploaded_file = st.file_uploader(
+    "📄 Upload file Invoice (PDF, foto/scan JPEG, PNG, TIFF, atau arsip ZIP berisi file tersebut)",
+    type=["pdf", "jpg", "jpeg", "png", "tif", "tiff", "zip"],
+    accept_multiple_files=True
+)
+reprocess_duplicates = st.checkbox("♻️ Proses ulang dokumen duplikat", value=False)
+enable_profiling = st.checkbox(
+    "🧪 Profil run ini (CPU + alokasi memori)",
+    value=False,
+    help="Run menjadi lebih lambat. Bila OCR memakai model server, waktu OCR terlihat sebagai menunggu socket."
+)
 
 # --- Streamlit Logic ---
 if uploaded_file:
     if st.button("🚀 Jalankan OCR"):
+        # Run sebelumnya (bila masih berjalan di thread pekerja) dihentikan
+        if st.session_state.get("cancel_token"):
+            st.session_state.cancel_token.cancel("Diganti run baru.")
+        cancel_token = st.session_state.cancel_token = CancelToken()
         st.session_state.results = []
+        st.session_state.timed_out = []
+        st.session_state.errors = []
+        st.session_state.duplicates = []
+        st.session_state.limited = []
+        st.session_state.excel_zip = None
+        run_metrics = metrics.RunMetrics()
+        # Arsip ZIP dibuka per entri; hanya satu dokumen yang ada di memori sekaligus
+        total = count_uploaded_documents(uploaded_file)
+        progress = st.progress(0.0, text=f"Memproses 0/{total} invoice...")
+
+        with profile_run(enable_profiling) as profiler:
+            idx = 0
+            for file_name, doc_bytes, skip_reason in iter_uploaded_documents(uploaded_file):
+                if skip_reason:
+                    st.session_state.limited.append({"Invoice": None, "File": file_name, "Alasan": f"dilewati: {skip_reason}"})
+                    continue
+                progress_text = f"Memproses {idx + 1}/{total}: {file_name}"
+                progress.progress(min(idx / total, 1.0), text=progress_text)
+
+                # 1-4. Cek duplikat, OCR, strukturkan via OpenAI, hitung DPP/VAT
+                try:
+                    with metrics.track_run(run_metrics):
+                        result = run_document(
+                            lambda: process_invoice(
+                                doc_bytes,
+                                run_ocr=run_ocr_page,
+                                file_name=file_name,
+                                skip_duplicates=not reprocess_duplicates,
+                                cancel_token=cancel_token,
+                                # Eskalasi baris (rekognisi crop) tidak lewat cache halaman
+                                recognize=get_ocr_pool().recognize
+                            ),
+                            cancel_token, progress, min(idx / total, 1.0), progress_text, profiler
+                        )
+                except DeadlineExceeded as e:
+                    # Dokumen yang macet dilaporkan, sisa batch tetap diproses
+                    st.session_state.timed_out.append({"Invoice": idx + 1, "File": file_name, "Tahap": e.stage or "dokumen", "Alasan": str(e)})
+                    idx += 1
+                    continue
+                except Cancelled:
+                    # Run dibatalkan/diganti: sisa batch tidak diteruskan
+                    raise
+                except Exception as e:
+                    # Dokumen rusak (mis. entri ZIP berisi PDF korup, melebihi anggaran
+                    # halaman) dicatat per dokumen, bukan menghentikan seluruh run
+                    st.session_state.errors.append({"Invoice": idx + 1, "File": file_name, "Error": type(e).__name__, "Alasan": str(e)})
+                    idx += 1
+                    continue
+                structured_data = result["data"]
+                calculated_fields = result["calculation"]
+
+                # 5. Tampilkan hasil
+                # st.subheader("📋 Teks Hasil Ekstraksi:")
+                # st.text(result["text"])
+
+                duplicate_of = result["duplicate_of"]
+                if duplicate_of:
+                    st.session_state.duplicates.append({
+                        "Invoice": idx + 1,
+                        "File": file_name,
+                        "Duplikat dari": duplicate_of["file_name"],
+                        "Jenis": DUPLICATE_KINDS[duplicate_of["kind"]],
+                        "Diproses pada": datetime.fromtimestamp(duplicate_of["created_at"]).strftime("%Y-%m-%d %H:%M"),
+                        "Hasil dipakai ulang": result["reused"],
+                    })
+                    if result["reused"]:
+                        st.info(f"♻️ {file_name} adalah duplikat dari {duplicate_of['file_name']}, memakai hasil sebelumnya.")
+                    else:
+                        st.warning(f"🔍 {file_name} mungkin duplikat dari {duplicate_of['file_name']} "
+                                   f"({DUPLICATE_KINDS[duplicate_of['kind']]}), diproses ulang - mohon dicek.")
+
+                if result["limits"]:
+                    st.warning(f"📏 {file_name} dibatasi: " + "; ".join(result["limits"]))
+                    for reason in result["limits"]:
+                        st.session_state.limited.append({"Invoice": idx + 1, "File": file_name, "Alasan": reason})
+
+                st.session_state.results.append({
+                    "idx": idx + 1,
+                    "file_name": file_name,
+                    "data": structured_data,
+                    "calculation": calculated_fields,
+                    # Saat profiling, export Excel ikut diukur di dalam run
+                    "excel": save_to_excel(structured_data, calculated_fields).getvalue() if profiler else None
+                })
+                idx += 1
+
+        progress.empty()
+        st.session_state.run_metrics = run_metrics
+        st.session_state.profile_zip = profiler.to_zip() if profiler else None
+
+if "run_metrics" in st.session_state:
+    run_metrics = st.session_state.run_metrics
+    with st.expander("⏱️ Rincian Waktu Proses"):
+        st.dataframe(run_metrics.breakdown(), use_container_width=True, hide_index=True)
+        st.write({name: int(value) for name, value in sorted(run_metrics.counters.items())})
+        cascade_lines = run_metrics.counters.get("ocr_cascade_lines", 0)
+        if cascade_lines:
+            escalated = run_metrics.counters.get("ocr_cascade_escalated", 0)
+            replaced = run_metrics.counters.get("ocr_cascade_replaced", 0)
+            st.caption(
+                f"Cascade rekognisi: {100 * (1 - escalated / cascade_lines):.1f}% baris selesai di model ringan, "
+                f"{int(escalated)} baris ke model berat, {int(replaced)} hasil diganti."
+            )
+
+if st.session_state.get("profile_zip"):
+    st.download_button(
+        label="🧪 Download Hasil Profiling",
+        data=st.session_state.profile_zip,
+        file_name=f"invoice_profile_{datetime.now():%Y%m%d_%H%M%S}.zip",
+        mime="application/zip",
+        key="download_profile"
+    )
 
-        for idx, uploaded in enumerate(uploaded_file):
-            pdf_bytes = uploaded.getvalue()
-
-            # 1. Ekstrak teks dari OCR
-            extracted_text = extract_text_with_paddleocr(uploaded)
-
-            # 2. Strukturkan data via OpenAI
-            structured_data = structure_invoice_data(extracted_text)
-
-            # 3. Hitung nilai tambahan
-            calculated_fields = calculate_invoice_fields(structured_data)
-
-            # 4. Isi nilai VAT jika kosong dari hasil perhitungan
-            # if structured_data.get("vat") is None and "ppn_11_persen" in calculated_fields:
-            #     structured_data["vat"] = calculated_fields["ppn_11_persen"]
-
-            # 4. Periksa apakah invoice menyebutkan "Price including VAT"
-            if "price including vat" in extracted_text.lower():
-                structured_data["vat"] = calculated_fields.get("ppn_11_persen", None)
-
-
-            # 5. Tampilkan hasil
-            # st.subheader("📋 Teks Hasil Ekstraksi:")
-            # st.text(extracted_text)
-
-            st.subheader("🧾 Hasil JSON Terstruktur:")
-            st.json(structured_data)
-
-            st.subheader(f"🧮 Perhitungan Tambahan - Invoice {idx+1}")
-            st.json(calculated_fields)
-
-            st.session_state.results.append({
-                "idx": idx + 1,
-                "image": pdf_bytes,
-                "data": structured_data,
-                "calculation": calculated_fields
-            })
-
-if "results" in st.session_state:
-    for result in st.session_state.results:
-        idx = result["idx"]
-        structured_invoice_data = result["data"]
-        calculated_fields = result.get("calculation", None)
-
-        excel_file = save_to_excel(structured_invoice_data, calculated_fields)
+if st.session_state.get("timed_out"):
+    st.subheader("⏱️ Dokumen Melewati Batas Waktu")
+    st.dataframe(st.session_state.timed_out, use_container_width=True, hide_index=True)
+
+if st.session_state.get("errors"):
+    st.subheader("❌ Dokumen Gagal Diproses")
+    st.dataframe(st.session_state.errors, use_container_width=True, hide_index=True)
+
+if st.session_state.get("limited"):
+    st.subheader("📏 Dokumen yang Dibatasi")
+    st.dataframe(st.session_state.limited, use_container_width=True, hide_index=True)
+
+if st.session_state.get("duplicates"):
+    st.subheader("♻️ Laporan Duplikat")
+    st.dataframe(st.session_state.duplicates, use_container_width=True)
+
+if st.session_state.get("results"):
+    results = st.session_state.results
+    st.subheader(f"🧾 Ringkasan Hasil ({len(results)} invoice)")
+    page_count = math.ceil(len(results) / RESULTS_PAGE_SIZE)
+    page = st.number_input("Halaman", min_value=1, max_value=page_count, value=1, step=1) if page_count > 1 else 1
+    page_results = results[(page - 1) * RESULTS_PAGE_SIZE:page * RESULTS_PAGE_SIZE]
+    st.dataframe([summary_row(result) for result in page_results], use_container_width=True, hide_index=True)
+
+    # ZIP semua Excel baru dibuat saat diminta, sekali per run
+    if st.session_state.get("excel_zip") is None:
+        if st.button(f"📦 Siapkan ZIP semua Excel ({len(results)} file)"):
+            with st.spinner("Membuat file Excel..."):
+                st.session_state.excel_zip = build_excel_zip(results)
+            st.rerun()
+    else:
         st.download_button(
-            label=f"📥 Download File Excel untuk Invoice {idx}",
-            data=excel_file,
-            file_name=f"invoice_data_{idx}.xlsx",
-            mime="application/vnd.ms-excel",
-            key=f"download_result_{idx}"
+            label="📥 Download Semua Excel (ZIP)",
+            data=st.session_state.excel_zip,
+            file_name=f"invoice_data_{datetime.now():%Y%m%d_%H%M%S}.zip",
+            mime="application/zip",
+            key="download_all_results"
         )
+
+    # Detail satu invoice
+    selected = st.selectbox(
+        "🔎 Detail invoice",
+        range(len(results)),
+        index=(page - 1) * RESULTS_PAGE_SIZE,
+        format_func=lambda i: f"Invoice {results[i]['idx']} - {results[i]['file_name']}"
+    )
+    result = results[selected]
+    idx = result["idx"]
+    st.subheader("🧾 Hasil JSON Terstruktur:")
+    st.json(result["data"])
+    st.subheader(f"🧮 Perhitungan Tambahan - Invoice {idx}")
+    st.json(result.get("calculation"))
+
+    excel_file = result.get("excel") or save_to_excel(result["data"], result.get("calculation"))
+    st.download_button(
+        label=f"📥 Download File Excel untuk Invoice {idx}",
+        data=excel_file,
+        file_name=excel_file_name(idx),
+        mime="application/vnd.ms-excel",
+        key=f"download_result_{idx}"
+    )
@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import time
+import zipfile
+import threading
+import tracemalloc
+from io import BytesIO
+from collections import Counter
+from contextlib import contextmanager
+import metrics
+
+# Profiling opt-in untuk satu run (halaman invoice, job API, benchmark).
+# - CPU: sampling stack thread yang diprofil setiap PROFILE_INTERVAL_MS,
+#   disimpan sebagai folded stacks (flamegraph.pl / speedscope) dan speedscope JSON
+# - Memori: tracemalloc (alokasi Python) per tahap + RSS proses per tahap
+#   (alokasi native Paddle/poppler hanya terlihat lewat RSS)
+# Tanpa profile_run() tidak ada thread, hook maupun tracing yang aktif.
+
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_STAGES = ("rasterize", "resize", "ocr", "llm", "excel", "dedup", "document")
+PROFILE_TOP_ALLOCATIONS = 25
+
+# tracemalloc berlaku untuk seluruh proses: run yang diprofil bersamaan berbagi
+# satu sesi tracing, yang baru dihentikan oleh run terakhir yang selesai (dan
+# tidak pernah bila tracing sudah aktif dari luar, mis. PYTHONTRACEMALLOC)
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_started = False
+
+
+def _acquire_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            _tracemalloc_started = True
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_started:
+            tracemalloc.stop()
+            _tracemalloc_started = False
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class RunProfiler:
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS, trace_allocations=True):
+        self.interval = interval_ms / 1000
+        self.trace_allocations = trace_allocations
+        self.samples = Counter()
+        self.sample_count = 0
+        self.stage_memory = {}
+        self.started_at = None
+        self.duration = 0.0
+        self._thread_ids = set()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._start_snapshot = None
+        self._end_snapshot = None
+        self._tracing = False
+
+    # --- CPU sampling ---
+    def add_thread(self, thread_id=None):
+        self._thread_ids.add(thread_id or threading.get_ident())
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self._thread_ids):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+                self.sample_count += 1
+
+    # --- Memori per tahap ---
+    def _on_stage(self, stage, seconds):
+        if stage not in PROFILE_STAGES:
+            return
+        entry = self.stage_memory.setdefault(stage, {"count": 0, "seconds": 0.0, "py_peak_mb": 0.0, "rss_max_mb": 0.0})
+        entry["count"] += 1
+        entry["seconds"] += seconds
+        if tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            entry["py_peak_mb"] = max(entry["py_peak_mb"], peak / 1024 / 1024)
+            tracemalloc.reset_peak()
+        rss = _rss_mb()
+        if rss is not None:
+            entry["rss_max_mb"] = max(entry["rss_max_mb"], rss)
+
+    def start(self):
+        self.started_at = time.time()
+        self.add_thread()
+        if self.trace_allocations:
+            _acquire_tracemalloc()
+            self._tracing = True
+            self._start_snapshot = tracemalloc.take_snapshot()
+        self._sampler = threading.Thread(target=self._sample, daemon=True, name="run-profiler")
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        self.duration = time.time() - self.started_at
+        if self._tracing:
+            self._end_snapshot = tracemalloc.take_snapshot()
+            self._tracing = False
+            _release_tracemalloc()
+
+    # --- Output ---
+    def folded_stacks(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+    def speedscope(self):
+        frame_index, frames, samples, weights = {}, [], [], []
+        for stack, count in self.samples.items():
+            ids = []
+            for label in stack.split(";"):
+                if label not in frame_index:
+                    frame_index[label] = len(frames)
+                    frames.append({"name": label})
+                ids.append(frame_index[label])
+            samples.append(ids)
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": "invoice run",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+    def allocation_report(self):
+        if self._start_snapshot is None or self._end_snapshot is None:
+            return "Alokasi tidak direkam.\n"
+        lines = [f"Top {PROFILE_TOP_ALLOCATIONS} alokasi Python yang bertambah selama run:"]
+        stats = self._end_snapshot.compare_to(self._start_snapshot, "traceback")
+        for stat in stats[:PROFILE_TOP_ALLOCATIONS]:
+            lines.append(f"\n{stat.size_diff / 1024:+.1f} KiB, {stat.count_diff:+d} blok")
+            lines.extend(f"    {line}" for line in stat.traceback.format())
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "duration_seconds": round(self.duration, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": self.sample_count,
+            "stages": {
+                stage: {key: round(value, 3) for key, value in entry.items()}
+                for stage, entry in self.stage_memory.items()
+            },
+        }
+
+    def to_zip(self):
+        out = BytesIO()
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("summary.json", json.dumps(self.summary(), indent=2))
+            zf.writestr("cpu.folded", self.folded_stacks())
+            zf.writestr("cpu.speedscope.json", json.dumps(self.speedscope()))
+            zf.writestr("allocations.txt", self.allocation_report())
+        return out.getvalue()
+
+
+@contextmanager
+def profile_run(enabled=True, **kwargs):
+    # `with profile_run(toggle) as profiler:` -> profiler None bila toggle mati
+    if not enabled:
+        yield None
+        return
+    profiler = RunProfiler(**kwargs)
+    token = metrics.stage_listener.set(profiler._on_stage)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        metrics.stage_listener.reset(token)
@@ -0,0 +1,97 @@
+import os
+import sys
+import random
+import argparse
+import cv2
+import numpy as np
+from invoice_pipeline import DET_MODEL_DIR, REC_MODEL_DIR
+from ocr_backends import onnx_model_path, tier_model_dir
+
+# Buat tier model INT8 (OCR_MODEL_TIER=int8) dari model ONNX fp32 hasil
+# export_onnx.py, memakai onnxruntime.quantization:
+#   det  kuantisasi statis (QDQ, per-channel) dengan kalibrasi dari halaman
+#        invoice sintetis, karena didominasi konvolusi
+#   rec  kuantisasi dinamis (bobot INT8, aktivasi dihitung saat inference)
+# Hasil ditulis ke models/<nama>_int8/inference.onnx.
+#
+#   python export_onnx.py && python quantize_models.py --calibration-pages 32
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+# Pre-processing deteksi PaddleOCR (DetResizeForTest limit 960 'max' + NormalizeImage)
+DET_LIMIT_SIDE_LEN = 960
+DET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+DET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+def det_input(image_np):
+    height, width = image_np.shape[:2]
+    ratio = min(1.0, DET_LIMIT_SIDE_LEN / max(height, width))
+    size = (max(32, int(round(width * ratio / 32)) * 32), max(32, int(round(height * ratio / 32)) * 32))
+    resized = cv2.resize(image_np, size).astype(np.float32) / 255
+    return ((resized - DET_MEAN) / DET_STD).transpose(2, 0, 1)[np.newaxis]
+
+
+def quantize_det(source, target, pages):
+    from onnxruntime import InferenceSession
+    from onnxruntime.quantization import (
+        CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType, quantize_static,
+    )
+
+    input_name = InferenceSession(source, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class InvoicePages(CalibrationDataReader):
+        def __init__(self):
+            self._inputs = iter([{input_name: det_input(image)} for image, _ in pages])
+
+        def get_next(self):
+            return next(self._inputs, None)
+
+    quantize_static(
+        source, target, InvoicePages(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+    )
+
+
+def quantize_rec(source, target):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(source, target, weight_type=QuantType.QInt8, per_channel=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kuantisasi model det/rec ke INT8 (ONNX Runtime)")
+    parser.add_argument("--calibration-pages", type=int, default=32)
+    parser.add_argument("--dpi", type=int, default=100, help="setara skala OCR 0.5 pada render 200 DPI")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        import onnxruntime.quantization  # noqa: F401
+    except ImportError:
+        sys.exit("Butuh onnxruntime: pip install onnxruntime")
+    from synth_invoice import page_images
+
+    for model_dir in (DET_MODEL_DIR, REC_MODEL_DIR):
+        if not os.path.exists(onnx_model_path(model_dir)):
+            sys.exit(f"{onnx_model_path(model_dir)} tidak ditemukan, jalankan export_onnx.py terlebih dahulu.")
+
+    for model_dir, quantize in ((DET_MODEL_DIR, "det"), (REC_MODEL_DIR, "rec")):
+        target_dir = tier_model_dir(model_dir, "int8")
+        os.makedirs(target_dir, exist_ok=True)
+        source, target = onnx_model_path(model_dir), onnx_model_path(target_dir)
+        if quantize == "det":
+            pages = page_images(random.Random(args.seed), args.calibration_pages, dpi=args.dpi)
+            quantize_det(source, target, pages)
+        else:
+            quantize_rec(source, target)
+        before, after = os.path.getsize(source) / 1e6, os.path.getsize(target) / 1e6
+        print(f"{source} ({before:.1f} MB) -> {target} ({after:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from datetime import date
+from invoice_dedup import RESULTS_DB_PATH
+
+# Penyimpanan hasil terstruktur per invoice (SQLite, satu file dengan indeks
+# duplikat). Kolom pencarian diambil dari JSON hasil LLM dan diindeks supaya
+# pertanyaan "invoice X dari seller Y sudah pernah diproses?" terjawab dalam
+# milidetik tanpa membuka file Excel.
+
+SEARCH_LIMIT = 200
+
+
+# --- Normalisasi Kunci ---
+def normalize_invoice_no(value):
+    if not value:
+        return None
+    return re.sub(r"\s+", "", str(value)).upper() or None
+
+
+def normalize_npwp(value):
+    # NPWP ditulis dengan titik/strip yang beragam, cukup simpan digitnya
+    digits = re.sub(r"\D", "", str(value or ""))
+    return digits or None
+
+
+def normalize_name(value):
+    if not value:
+        return None
+    return re.sub(r"\s+", " ", str(value)).strip().lower() or None
+
+
+def _invoice_keys(structured_data):
+    seller = structured_data.get("seller_identity") or {}
+    details = structured_data.get("invoice_details") or {}
+    return {
+        "invoice_no": normalize_invoice_no(details.get("invoice_no")),
+        "seller_name": normalize_name(seller.get("company_name")),
+        "seller_npwp": normalize_npwp(seller.get("company_npwp_tin")),
+        "invoice_date": details.get("invoice_date") or None,
+    }
+
+
+# --- Pencocokan dengan Teks OCR ---
+# Nomor invoice dianggap ada di teks hanya bila berdiri tepat sesudah label
+# nomor invoice ("Invoice No:", "No. Faktur", "Nomor Invoice #", ...), bukan
+# sekadar token yang kebetulan sama (nomor PO, kode barang, nomor telepon)
+INVOICE_NO_LABEL_PATTERN = re.compile(
+    r"(?:(?:invoice|inv|faktur|tagihan)\s*(?:no\b\.?|nomor|number|num\b\.?|#)"
+    r"|(?:no\b\.?|nomor|number)\s*(?:invoice|inv\b\.?|faktur|tagihan))"
+    r"\s*[:#.]?\s*([A-Za-z0-9][A-Za-z0-9./\-_]*)",
+    re.IGNORECASE,
+)
+AMOUNT_PATTERN = re.compile(r"\d[\d.,]*")
+
+
+def labeled_invoice_numbers(text):
+    numbers = {normalize_invoice_no(m.group(1).rstrip(".,")) for m in INVOICE_NO_LABEL_PATTERN.finditer(text or "")}
+    numbers.discard(None)
+    return numbers
+
+
+def _amount_readings(raw):
+    # "1.234.567,89", "1,234,567.89" dan "1234567" -> nilai yang mungkin (pemisah ribuan tidak pasti)
+    raw = raw.strip().rstrip(".,")
+    digits = re.sub(r"\D", "", raw)
+    if not digits:
+        return set()
+    # Grup 1-2 digit di akhir selalu desimal ("1.00" bukan 100, "15.000,00" bukan
+    # 1.500.000); hanya tanpa grup desimal semua pemisah dianggap pemisah ribuan
+    decimal = re.fullmatch(r"(.*?)[.,](\d{1,2})", raw)
+    if decimal:
+        return {round(float(re.sub(r"\D", "", decimal.group(1)) or 0) + float(f"0.{decimal.group(2)}"), 2)}
+    return {round(float(digits), 2)}
+
+
+def _total_readings(total):
+    if isinstance(total, (int, float)) and not isinstance(total, bool):
+        return {round(float(total), 2)}
+    readings = set()
+    for raw in AMOUNT_PATTERN.findall(str(total or "")):
+        readings |= _amount_readings(raw)
+    return readings
+
+
+def total_in_text(total, text):
+    totals = _total_readings(total)
+    if not totals:
+        return False
+    return any(_amount_readings(raw) & totals for raw in AMOUNT_PATTERN.findall(text or ""))
+
+
+# Tanggal dibandingkan sebagai (tahun, bulan, hari): tanggal tersimpan (biasanya
+# ISO dari LLM) vs teks OCR ("12/03/2025", "12-03-25", "12 Maret 2025", "Mar 12, 2025")
+MONTHS = {
+    "jan": 1, "feb": 2, "peb": 2, "mar": 3, "apr": 4, "mei": 5, "may": 5, "jun": 6, "jul": 7,
+    "agu": 8, "agt": 8, "aug": 8, "sep": 9, "okt": 10, "oct": 10, "nov": 11, "des": 12, "dec": 12,
+}
+NUMERIC_DATE_PATTERN = re.compile(r"(?<!\d)(\d{1,4})[/.\-](\d{1,2})[/.\-](\d{2,4})(?!\d)")
+DAY_MONTH_DATE_PATTERN = re.compile(r"(?<!\d)(\d{1,2})[\s\-]*([A-Za-z]{3,9})\.?[\s\-,]*(\d{4})(?!\d)")
+MONTH_DAY_DATE_PATTERN = re.compile(r"\b([A-Za-z]{3,9})\.?\s+(\d{1,2}),?\s*(\d{4})(?!\d)")
+
+
+def _valid_date(year, month, day):
+    if year < 100:
+        year += 2000
+    try:
+        return date(year, month, day).timetuple()[:3]
+    except ValueError:
+        return None
+
+
+def dates_in_text(text):
+    found = set()
+    for a, b, c in NUMERIC_DATE_PATTERN.findall(text or ""):
+        if len(a) == 4:
+            found.add(_valid_date(int(a), int(b), int(c)))
+        elif len(a) <= 2:
+            # dd/mm/yyyy lazim di Indonesia, mm/dd/yyyy tetap dicoba untuk invoice asing
+            found.add(_valid_date(int(c), int(b), int(a)))
+            found.add(_valid_date(int(c), int(a), int(b)))
+    for day, month, year in DAY_MONTH_DATE_PATTERN.findall(text or ""):
+        if month[:3].lower() in MONTHS:
+            found.add(_valid_date(int(year), MONTHS[month[:3].lower()], int(day)))
+    for month, day, year in MONTH_DAY_DATE_PATTERN.findall(text or ""):
+        if month[:3].lower() in MONTHS:
+            found.add(_valid_date(int(year), MONTHS[month[:3].lower()], int(day)))
+    found.discard(None)
+    return found
+
+
+def seller_in_text(seller_npwp, seller_name, text):
+    if seller_npwp and seller_npwp in re.sub(r"\D", "", text or ""):
+        return True
+    return bool(seller_name and seller_name in (normalize_name(text) or ""))
+
+
+def invoice_matches_text(structured_data, text):
+    # Konfirmasi bahwa hasil tersimpan memang invoice yang sama dengan teks OCR:
+    # nomor invoice berlabel, seller dan total harus cocok semuanya
+    keys = _invoice_keys(structured_data)
+    return bool(
+        keys["invoice_no"]
+        and keys["invoice_no"] in labeled_invoice_numbers(text)
+        and seller_in_text(keys["seller_npwp"], keys["seller_name"], text)
+        and total_in_text(structured_data.get("invoice_total"), text)
+    )
+
+
+# --- Store ---
+class ResultsStore:
+    def __init__(self, db_path=RESULTS_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS invoices (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                invoice_no TEXT,
+                seller_name TEXT,
+                seller_npwp TEXT,
+                invoice_date TEXT,
+                file_name TEXT,
+                content_hash TEXT,
+                data TEXT NOT NULL,
+                calculation TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_invoices_invoice_no ON invoices (invoice_no);
+            CREATE INDEX IF NOT EXISTS idx_invoices_seller_name ON invoices (seller_name);
+            CREATE INDEX IF NOT EXISTS idx_invoices_seller_npwp ON invoices (seller_npwp);
+            CREATE INDEX IF NOT EXISTS idx_invoices_invoice_date ON invoices (invoice_date);
+        """)
+        self._conn.commit()
+
+    def save(self, structured_data, calculated_fields, file_name=None, content_hash=None):
+        keys = _invoice_keys(structured_data)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO invoices (invoice_no, seller_name, seller_npwp, invoice_date, file_name, "
+                "content_hash, data, calculation, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    keys["invoice_no"], keys["seller_name"], keys["seller_npwp"], keys["invoice_date"],
+                    file_name, content_hash, json.dumps(structured_data), json.dumps(calculated_fields),
+                    time.time(),
+                ),
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def _rows_to_records(self, rows):
+        records = []
+        for row in rows:
+            record = dict(row)
+            record["data"] = json.loads(record["data"])
+            record["calculation"] = json.loads(record["calculation"]) if record["calculation"] else None
+            records.append(record)
+        return records
+
+    def get(self, invoice_id):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM invoices WHERE id = ?", (invoice_id,)).fetchall()
+        records = self._rows_to_records(rows)
+        return records[0] if records else None
+
+    def search(self, invoice_no=None, seller=None, npwp=None, date_from=None, date_to=None, limit=SEARCH_LIMIT):
+        # Nomor invoice & NPWP: cocok persis; nama seller: awalan (tetap memakai indeks)
+        clauses, params = [], []
+        if normalize_invoice_no(invoice_no):
+            clauses.append("invoice_no = ?")
+            params.append(normalize_invoice_no(invoice_no))
+        if normalize_name(seller):
+            clauses.append("seller_name >= ? AND seller_name < ?")
+            prefix = normalize_name(seller)
+            params.extend([prefix, prefix + "\uffff"])
+        if normalize_npwp(npwp):
+            clauses.append("seller_npwp = ?")
+            params.append(normalize_npwp(npwp))
+        if date_from:
+            clauses.append("invoice_date >= ?")
+            params.append(str(date_from))
+        if date_to:
+            clauses.append("invoice_date <= ?")
+            params.append(str(date_to))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM invoices {where} ORDER BY created_at DESC LIMIT ?",
+                (*params, int(limit)),
+            ).fetchall()
+        return self._rows_to_records(rows)
+
+    def find_known_invoice(self, extracted_text):
+        # Dipanggil setelah OCR dan sebelum LLM: cari nomor invoice yang sudah
+        # tersimpan di teks OCR dengan seller (NPWP atau nama) yang sama. Hasil
+        # hanya boleh dipakai ulang ("confirmed") bila nomornya berdiri di samping
+        # label nomor invoice, atau tanggal dan total invoice juga cocok; selain itu
+        # dokumen hanya ditandai sebagai kemungkinan duplikat.
+        tokens = {normalize_invoice_no(t) for t in re.findall(r"[A-Za-z0-9][A-Za-z0-9./\-_]{2,}", extracted_text)}
+        tokens.discard(None)
+        if not tokens:
+            return None
+        labeled = labeled_invoice_numbers(extracted_text)
+        text_dates = dates_in_text(extracted_text)
+        tokens = list(tokens)
+        candidates = []
+        with self._lock:
+            # Batas parameter SQLite, jadi token dikirim bertahap
+            for i in range(0, len(tokens), 500):
+                chunk = tokens[i:i + 500]
+                candidates.extend(self._conn.execute(
+                    f"SELECT * FROM invoices WHERE invoice_no IN ({','.join('?' * len(chunk))}) "
+                    "ORDER BY created_at DESC",
+                    chunk,
+                ).fetchall())
+        possible = None
+        for record in self._rows_to_records(candidates):
+            if not seller_in_text(record["seller_npwp"], record["seller_name"], extracted_text):
+                continue
+            confirmed = record["invoice_no"] in labeled or bool(
+                dates_in_text(record["invoice_date"]) & text_dates
+                and total_in_text(record["data"].get("invoice_total"), extracted_text)
+            )
+            if confirmed:
+                record["confirmed"] = True
+                return record
+            if possible is None:
+                record["confirmed"] = False
+                possible = record
+        return possible
+
+
+_results_store = None
+_results_store_lock = threading.Lock()
+
+
+def get_results_store():
+    global _results_store
+    with _results_store_lock:
+        if _results_store is None:
+            _results_store = ResultsStore()
+        return _results_store
@@ -0,0 +1,340 @@
+import os
+import gc
+import sys
+import json
+import time
+import hashlib
+import argparse
+import platform
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Kalibrasi thread CPU untuk inferensi OCR. Kombinasi jumlah thread per model
+# (cpu_threads / intra-op ONNX), MKL-DNN on/off dan jumlah model paralel
+# (OCR_POOL_SIZE) di-benchmark pada halaman contoh di host ini; konfigurasi
+# dengan halaman/detik tertinggi disimpan di OCR_TUNING_FILE per sidik jari
+# hardware (model CPU, jumlah core yang boleh dipakai, arsitektur) + backend/tier.
+# Saat model dimuat, konfigurasi untuk host ini dipakai; bila belum ada (host
+# baru atau hardware berubah) model memakai default. Kalibrasi adalah langkah
+# eksplisit saat deploy (di luar proses yang dilayani pm2):
+#
+#   python thread_tuning.py                 # kalibrasi (lewati bila sudah lengkap)
+#   python thread_tuning.py --force --sample halaman.png
+#
+# Dengan OCR_AUTOTUNE=1 proses yang memuat pool menjalankan CLI ini sebagai
+# subprocess dan menunggu hasilnya sebelum pool dibuat. Hasil disimpan setelah
+# setiap konfigurasi, jadi kalibrasi yang terhenti (mis. OOM) tetap meninggalkan
+# hasil sementara dan tidak diulang otomatis. Model tambahan tidak dimuat bila
+# RSS kalibrasi akan melewati OCR_TUNING_MAX_RSS_MB.
+# Env / opsi eksplisit selalu menang atas hasil kalibrasi:
+#   OCR_POOL_SIZE, OCR_CPU_THREADS, OCR_ENABLE_MKLDNN, ORT_INTRA_OP_THREADS,
+#   opsi thread yang diberikan ke ocr_backends.create_model (mis. benchmark)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OCR_TUNING_FILE = os.getenv("OCR_TUNING_FILE", os.path.join(BASE_DIR, "models", "ocr_tuning.json"))
+OCR_AUTOTUNE = os.getenv("OCR_AUTOTUNE", "0") == "1"
+# Halaman yang diukur per model untuk setiap konfigurasi (sesudah 1 halaman warm-up)
+OCR_TUNING_PAGES = int(os.getenv("OCR_TUNING_PAGES", "3"))
+# Batas jumlah model paralel yang dicoba (tiap model = satu set bobot di memori,
+# jaga di bawah max_memory_restart pm2)
+OCR_TUNING_MAX_WORKERS = int(os.getenv("OCR_TUNING_MAX_WORKERS", "4"))
+OCR_TUNING_MAX_RSS_MB = int(os.getenv("OCR_TUNING_MAX_RSS_MB", "900"))
+OCR_TUNING_TIMEOUT = float(os.getenv("OCR_TUNING_TIMEOUT_SECONDS", "1800"))
+
+_tuning = {}
+_tuning_lock = threading.Lock()
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _cpu_model():
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or "unknown"
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def hardware_info():
+    return {"cpu": _cpu_model(), "cpus": available_cpus(), "machine": platform.machine()}
+
+
+def tuning_key(backend, tier):
+    digest = hashlib.sha1(json.dumps(hardware_info(), sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return f"{digest}:{backend}:{tier}"
+
+
+def _read_tuning_file():
+    try:
+        with open(OCR_TUNING_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_tuning(key, entry):
+    # Entri host lain di file yang sama (mis. folder models/ dibagi) dipertahankan
+    entries = _read_tuning_file()
+    entries[key] = entry
+    tmp_path = f"{OCR_TUNING_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(entries, f, indent=2)
+    os.replace(tmp_path, OCR_TUNING_FILE)
+
+
+def _resolve(backend=None, tier=None):
+    from ocr_backends import OCR_BACKEND, OCR_MODEL_TIER
+
+    tier = tier or OCR_MODEL_TIER
+    return ("onnx" if tier == "int8" else backend or OCR_BACKEND), tier
+
+
+def get_tuning(backend=None, tier=None):
+    backend, tier = _resolve(backend, tier)
+    key = tuning_key(backend, tier)
+    with _tuning_lock:
+        if key not in _tuning:
+            _tuning[key] = _read_tuning_file().get(key)
+        return _tuning[key]
+
+
+def tuned_options(backend=None, tier=None):
+    # Opsi model untuk ocr_backends.create_model: hasil kalibrasi, ditimpa env eksplisit
+    backend, tier = _resolve(backend, tier)
+    entry = get_tuning(backend, tier) or {}
+    options = {}
+    if entry.get("cpu_threads"):
+        options["cpu_threads"] = entry["cpu_threads"]
+    if entry.get("enable_mkldnn") is not None:
+        options["enable_mkldnn"] = entry["enable_mkldnn"]
+    if os.getenv("OCR_CPU_THREADS"):
+        options["cpu_threads"] = int(os.getenv("OCR_CPU_THREADS"))
+    if os.getenv("OCR_ENABLE_MKLDNN"):
+        options["enable_mkldnn"] = os.getenv("OCR_ENABLE_MKLDNN") == "1"
+    if backend == "onnx":
+        import ocr_backends
+
+        options.pop("enable_mkldnn", None)
+        # Nilai modul (env, atau di-set benchmark) menang atas hasil kalibrasi
+        if ocr_backends.ORT_INTRA_OP_THREADS:
+            options.pop("cpu_threads", None)
+    return options
+
+
+def tuned_pool_size():
+    if os.getenv("OCR_POOL_SIZE"):
+        return max(1, int(os.getenv("OCR_POOL_SIZE")))
+    entry = get_tuning() or {}
+    return entry.get("workers", 1)
+
+
+# --- Kalibrasi ---
+def sample_page():
+    # Halaman invoice sintetis kira-kira seukuran halaman A4 pada skala OCR
+    import cv2
+
+    page = np.full((1170, 827, 3), 255, dtype=np.uint8)
+    rng = np.random.default_rng(0)
+    y = 60
+    while y < 1120:
+        words = [f"{rng.integers(1, 99999):05d}" if rng.random() < 0.3 else "INVOICE ITEM" for _ in range(3)]
+        cv2.putText(page, "  ".join(words), (40, y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+        y += int(rng.integers(28, 48))
+    return page
+
+
+def _thread_counts(cpus):
+    counts = {cpus}
+    count = 1
+    while count < cpus:
+        counts.add(count)
+        count *= 2
+    return sorted(counts)
+
+
+def candidate_configs(backend, cpus):
+    mkldnn_options = [False, True] if backend == "paddle" else [None]
+    for cpu_threads in _thread_counts(cpus):
+        for enable_mkldnn in mkldnn_options:
+            workers = [w for w in _thread_counts(cpus) if w * cpu_threads <= cpus and w <= OCR_TUNING_MAX_WORKERS]
+            yield cpu_threads, enable_mkldnn, workers
+
+
+def _measure(models, page, pages_per_model):
+    from ocr_engine import run_ocr_batch
+
+    def run(model, count):
+        for _ in range(count):
+            run_ocr_batch(model, [page])
+
+    with ThreadPoolExecutor(max_workers=len(models)) as executor:
+        # Warm-up: alokasi arena/graph pertama tidak ikut diukur
+        list(executor.map(lambda model: run(model, 1), models))
+        start = time.perf_counter()
+        list(executor.map(lambda model: run(model, pages_per_model), models))
+        elapsed = time.perf_counter() - start
+    return len(models) * pages_per_model / elapsed, elapsed / pages_per_model
+
+
+def _tuning_entry(backend, tier, results, complete):
+    entry = {
+        "hardware": hardware_info(),
+        "backend": backend,
+        "tier": tier,
+        "complete": complete,
+        "calibrated_at": time.time(),
+        "results": results,
+    }
+    if results:
+        best = max(results, key=lambda r: r["pages_per_second"])
+        entry.update(
+            cpu_threads=best["cpu_threads"],
+            enable_mkldnn=best.get("enable_mkldnn"),
+            workers=best["workers"],
+            pages_per_second=best["pages_per_second"],
+        )
+    return entry
+
+
+def _save_entry(key, entry):
+    _write_tuning(key, entry)
+    with _tuning_lock:
+        _tuning[key] = entry
+
+
+def calibrate(backend=None, tier=None, page=None, pages_per_model=OCR_TUNING_PAGES, max_rss_mb=OCR_TUNING_MAX_RSS_MB, verbose=True):
+    from invoice_pipeline import DET_MODEL_DIR, REC_MODEL_DIR
+    from ocr_backends import create_model
+
+    backend, tier = _resolve(backend, tier)
+    key = tuning_key(backend, tier)
+    page = sample_page() if page is None else page
+    cpus = available_cpus()
+    results = []
+    model_mb = None
+    # Penanda "sedang/terhenti" ditulis sebelum model pertama dimuat
+    _save_entry(key, _tuning_entry(backend, tier, results, complete=False))
+    for cpu_threads, enable_mkldnn, worker_counts in candidate_configs(backend, cpus):
+        options = {"cpu_threads": cpu_threads}
+        if enable_mkldnn is not None:
+            options["enable_mkldnn"] = enable_mkldnn
+        # Model dimuat sekali per (thread, mkldnn); jumlah worker diukur dengan subset model
+        models = []
+        for workers in worker_counts:
+            while len(models) < workers:
+                # Perkiraan memori per model dari model pertama; berhenti sebelum melewati batas RSS
+                if model_mb is not None and _rss_mb() + model_mb > max_rss_mb:
+                    break
+                before = _rss_mb()
+                models.append(create_model(DET_MODEL_DIR, REC_MODEL_DIR, backend=backend, tier=tier, **options))
+                if model_mb is None:
+                    model_mb = max(_rss_mb() - before, 1.0)
+            if len(models) < workers:
+                if verbose:
+                    print(f"  threads={cpu_threads:<3} mkldnn={str(enable_mkldnn):<5} workers={workers:<3} "
+                          f"dilewati: RSS akan melewati {max_rss_mb} MB")
+                break
+            pages_per_second, page_seconds = _measure(models[:workers], page, pages_per_model)
+            result = dict(options, workers=workers, pages_per_second=round(pages_per_second, 3),
+                          page_seconds=round(page_seconds, 3), rss_mb=round(_rss_mb(), 1))
+            results.append(result)
+            if verbose:
+                print(f"  threads={cpu_threads:<3} mkldnn={str(enable_mkldnn):<5} workers={workers:<3} "
+                      f"{pages_per_second:7.2f} halaman/dtk  {page_seconds:6.2f} dtk/halaman/model  RSS {result['rss_mb']:.0f} MB")
+            # Hasil sementara disimpan tiap konfigurasi
+            _save_entry(key, _tuning_entry(backend, tier, results, complete=False))
+        del models
+        gc.collect()
+
+    if not results:
+        raise RuntimeError(f"Tidak ada konfigurasi yang muat dalam {max_rss_mb} MB")
+    entry = _tuning_entry(backend, tier, results, complete=True)
+    _save_entry(key, entry)
+    return entry
+
+
+def ensure_tuning(backend=None, tier=None):
+    # Dipanggil sebelum pool model dibuat. Kalibrasi (bila OCR_AUTOTUNE=1 dan host
+    # ini belum punya entri, lengkap maupun sementara) berjalan di subprocess
+    if not OCR_AUTOTUNE or get_tuning(backend, tier) is not None:
+        return get_tuning(backend, tier)
+    backend, tier = _resolve(backend, tier)
+    lock_file = open(f"{OCR_TUNING_FILE}.lock", "a")
+    try:
+        try:
+            import fcntl
+            # Proses lain (Streamlit, api_server, ocr_server) menunggu hasil kalibrasi yang sama
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        except ImportError:
+            pass
+        with _tuning_lock:
+            _tuning.pop(tuning_key(backend, tier), None)
+        if get_tuning(backend, tier) is not None:
+            return get_tuning(backend, tier)
+        print(f"Kalibrasi thread OCR untuk host ini ({hardware_info()['cpu']}, {available_cpus()} CPU, {backend}/{tier})...")
+        try:
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--backend", backend, "--tier", tier],
+                cwd=BASE_DIR, check=True, timeout=OCR_TUNING_TIMEOUT,
+            )
+        except (subprocess.SubprocessError, OSError) as e:
+            print(f"Kalibrasi thread OCR gagal, memakai hasil sementara/default: {e}")
+        with _tuning_lock:
+            _tuning.pop(tuning_key(backend, tier), None)
+        entry = get_tuning(backend, tier)
+        if entry and entry.get("workers"):
+            print(f"Kalibrasi selesai: cpu_threads={entry['cpu_threads']} mkldnn={entry['enable_mkldnn']} "
+                  f"workers={entry['workers']} ({entry['pages_per_second']} halaman/dtk)")
+        return entry
+    finally:
+        lock_file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kalibrasi thread CPU / MKL-DNN / jumlah worker OCR untuk host ini")
+    parser.add_argument("--backend", choices=["paddle", "onnx"])
+    parser.add_argument("--tier", choices=["fp32", "int8"])
+    parser.add_argument("--sample", help="gambar halaman contoh (PNG/JPEG); default halaman sintetis")
+    parser.add_argument("--pages", type=int, default=OCR_TUNING_PAGES, help="halaman terukur per model per konfigurasi")
+    parser.add_argument("--max-rss-mb", type=int, default=OCR_TUNING_MAX_RSS_MB, help="batas RSS proses kalibrasi")
+    parser.add_argument("--force", action="store_true", help="kalibrasi ulang walau host ini sudah punya entri lengkap")
+    args = parser.parse_args()
+
+    existing = get_tuning(args.backend, args.tier)
+    if existing and existing.get("complete", True) and not args.force:
+        print(f"Host ini sudah dikalibrasi: cpu_threads={existing['cpu_threads']} mkldnn={existing['enable_mkldnn']} "
+              f"workers={existing['workers']} (pakai --force untuk mengulang)")
+        return
+    page = None
+    if args.sample:
+        import cv2
+        page = cv2.imread(args.sample)
+        if page is None:
+            parser.error(f"Tidak bisa membaca {args.sample}")
+    entry = calibrate(args.backend, args.tier, page=page, pages_per_model=args.pages, max_rss_mb=args.max_rss_mb)
+    print(f"Terbaik: cpu_threads={entry['cpu_threads']} mkldnn={entry['enable_mkldnn']} workers={entry['workers']} "
+          f"({entry['pages_per_second']} halaman/dtk) -> {OCR_TUNING_FILE}")
+
+
+if __name__ == "__main__":
+    main()